@@ -16,7 +16,21 @@ def create_app():
     app.config['SPOTIFY_CLIENT_ID'] = os.getenv('SPOTIFY_CLIENT_ID')
     app.config['SPOTIFY_CLIENT_SECRET'] = os.getenv('SPOTIFY_CLIENT_SECRET')
     app.config['SPOTIFY_REDIRECT_URI'] = os.getenv('SPOTIFY_REDIRECT_URI')
+    app.config['SPOTIFY_SCOPE'] = "user-read-currently-playing user-read-playback-state"
     app.config['GENIUS_ACCESS_TOKEN'] = os.getenv('GENIUS_ACCESS_TOKEN')
+    app.config['GENIUS_API_URL'] = os.getenv('GENIUS_API_URL', 'https://api.genius.com')
+    app.config['GENIUS_REQUESTS_PER_MINUTE'] = int(os.getenv('GENIUS_REQUESTS_PER_MINUTE', 10))
+    app.config['PLAYBACK_POLLER_ENABLED'] = os.getenv('PLAYBACK_POLLER_ENABLED', 'True').lower() == 'true'
+    app.config['LYRICS_PREFETCH_DEPTH'] = int(os.getenv('LYRICS_PREFETCH_DEPTH', 3))
+    app.config['AUDIO_ANALYSIS_ENABLED'] = os.getenv('AUDIO_ANALYSIS_ENABLED', 'False').lower() == 'true'
+
+    # Opt-in cache warm-up from the user's top and recently played tracks after login
+    app.config['CACHE_WARMUP_ON_LOGIN'] = os.getenv('CACHE_WARMUP_ON_LOGIN', 'False').lower() == 'true'
+    app.config['CACHE_WARMUP_TRACKS'] = int(os.getenv('CACHE_WARMUP_TRACKS', 30))
+    app.config['CACHE_WARMUP_LYRICS'] = int(os.getenv('CACHE_WARMUP_LYRICS', 5))
+    if app.config['CACHE_WARMUP_ON_LOGIN']:
+        # Reading top and recently played tracks needs extra scopes
+        app.config['SPOTIFY_SCOPE'] += " user-read-recently-played user-top-read"
 
     # Session configuration for proper cookie handling
     app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
@@ -63,10 +77,26 @@ def create_app():
     from .routes.genius import genius_bp
     from .routes.lyrics import lyrics_bp
     from .routes.ratings import ratings_bp
+    from .routes.dashboard import dashboard_bp
 
     # Make limiter available to blueprints
     app.limiter = limiter
 
+    # Open the shared on-disk stores of scraped lyrics and their tokens
+    from .services.lyrics_store import lyrics_store, token_store, DEFAULT_STORE_PATH
+    lyrics_store.open(os.getenv('LYRICS_STORE_PATH', DEFAULT_STORE_PATH))
+    token_store.open(os.getenv('LYRICS_STORE_PATH', DEFAULT_STORE_PATH))
+
+    # Pre-populated lyrics from the offline ingest CLI (backend/ingest.py)
+    from .services.lyrics_cache import lyrics_cache, DEFAULT_CATALOG_PATH
+    lyrics_cache.load_catalog(os.getenv('LYRICS_CATALOG_PATH', DEFAULT_CATALOG_PATH))
+
+    # Background workers (threads start on first use)
+    from .services.playback_poller import playback_poller
+    from .services.lyrics_prefetcher import lyrics_prefetcher
+    playback_poller.init_app(app)
+    lyrics_prefetcher.init_app(app)
+
     # Health check endpoint (no prefix, no rate limit)
     app.register_blueprint(health_bp)
 
@@ -75,5 +105,6 @@ def create_app():
     app.register_blueprint(genius_bp, url_prefix='/genius')
     app.register_blueprint(lyrics_bp, url_prefix='/lyrics')
     app.register_blueprint(ratings_bp, url_prefix='/ratings')
+    app.register_blueprint(dashboard_bp, url_prefix='/dashboard')
 
     return app
\ No newline at end of file
@@ -4,6 +4,9 @@ from spotipy.oauth2 import SpotifyOAuth
 import uuid
 import logging
 import time
+from ..services.playback_poller import playback_poller
+from ..services.lyrics_prefetcher import lyrics_prefetcher
+from .spotify import get_user_id_from_session
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -13,7 +16,7 @@ def get_spotify_oauth():
         client_id=current_app.config['SPOTIFY_CLIENT_ID'],
         client_secret=current_app.config['SPOTIFY_CLIENT_SECRET'],
         redirect_uri=current_app.config['SPOTIFY_REDIRECT_URI'],
-        scope="user-read-currently-playing user-read-playback-state",
+        scope=current_app.config['SPOTIFY_SCOPE'],
         cache_handler=None  # We'll handle tokens manually
     )
 
@@ -134,6 +137,10 @@ def spotify_callback():
 
         # Also store in regular session for immediate use (browser context)
         session['spotify_token'] = token_info
+        session.pop('session_user_id', None)
+
+        # Opt-in: start warming lyrics caches from the user's library
+        lyrics_prefetcher.schedule_login_warmup(token_info)
 
         current_app.logger.info(f"Stored auth in global cache with state: {state}")
 
@@ -231,6 +238,10 @@ def spotify_exchange():
 
         # Store token info in session (now that we're back in Electron's context)
         session['spotify_token'] = token_info
+        session.pop('session_user_id', None)
+
+        # Opt-in: start warming lyrics caches from the user's library
+        lyrics_prefetcher.schedule_login_warmup(token_info)
 
         current_app.logger.info("Successfully exchanged code for tokens and stored in session")
 
@@ -285,6 +296,7 @@ def spotify_claim():
 
         # Move the token to this session
         session['spotify_token'] = auth_data['spotify_token']
+        session.pop('session_user_id', None)
 
         # Clean up the temporary auth cache
         del current_app._auth_cache[state]
@@ -369,7 +381,11 @@ def spotify_status():
 @auth_bp.route('/spotify/logout')
 def spotify_logout():
     """Logout from Spotify"""
+    # Stop server-side polling for this session before dropping the token
+    playback_poller.unregister(get_user_id_from_session())
+
     session.pop('spotify_token', None)
+    session.pop('session_user_id', None)
     session.pop('oauth_state', None)
 
     return jsonify({
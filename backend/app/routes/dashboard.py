@@ -0,0 +1,69 @@
+from flask import Blueprint, request, jsonify
+import spotipy
+from ..services.ratings_storage import get_ratings_storage
+from .spotify import get_current_track_snapshot
+from .lyrics import get_lyrics_for_track
+from .ratings import _get_user_id
+import logging
+
+logger = logging.getLogger(__name__)
+dashboard_bp = Blueprint('dashboard', __name__)
+
+@dashboard_bp.route('/current')
+def get_current_dashboard():
+    """
+    Get everything the dashboard shows for the current track in one response
+
+    Playback state, lyrics bundle, the user's rating of the track and their
+    rating stats, all built from one current-track snapshot. Pass
+    known_track=<spotify id> to skip the lyrics when the client already has
+    them for that track.
+    """
+    try:
+        force_refresh = request.args.get('force_refresh', 'false').lower() == 'true'
+        known_track = request.args.get('known_track')
+
+        snapshot = get_current_track_snapshot(force_refresh)
+        if snapshot is None:
+            return jsonify({
+                'success': False,
+                'error': 'Not authenticated with Spotify'
+            }), 401
+
+        user_id = _get_user_id()
+        storage = get_ratings_storage()
+        track = snapshot.get('track') if snapshot.get('playing') else None
+
+        lyrics = None
+        rating = None
+        if track:
+            if track['id'] != known_track:
+                lyrics, _ = get_lyrics_for_track(track)
+            rating = storage.get_rating(user_id, track['id'])
+
+        return jsonify({
+            'success': True,
+            'playback': snapshot,
+            'lyrics': lyrics,
+            'lyrics_unchanged': bool(track) and track['id'] == known_track,
+            'rating': rating,
+            'stats': storage.get_stats(user_id)
+        })
+
+    except spotipy.exceptions.SpotifyException as e:
+        rate_limited = getattr(e, 'http_status', None) == 429
+        if rate_limited:
+            logger.warning("Rate limit hit for dashboard endpoint")
+
+        return jsonify({
+            'success': False,
+            'error': f'Spotify API error: {str(e)}',
+            'rate_limited': rate_limited
+        }), 429 if rate_limited else 400
+
+    except Exception as e:
+        logger.error(f"Error in get_current_dashboard: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
@@ -1,180 +1,142 @@
 from flask import Blueprint, request, jsonify, session
 from ..services.genius_client import get_genius_client
-from .spotify import get_spotify_client
+from ..services.lyrics_cache import lyrics_cache
+from ..services.lyrics_analytics import lyrics_analytics
+from ..services.lyrics_phrases import repeated_phrases
+from ..services.lyrics_mood import lyrics_mood
+from ..services.lyrics_timing import lyrics_timing
+from ..services.lyrics_search import lyrics_search
+from ..services.lyrics_similarity import lyrics_similarity, MIN_SIMILARITY
+from ..services.lyrics_document import lyrics_documents
+from .spotify import get_current_track_snapshot
 import logging
 import time
-import re
 
 logger = logging.getLogger(__name__)
 lyrics_bp = Blueprint('lyrics', __name__)
 
-def _extract_lyrics_from_annotations(annotations):
-    """Extract lyrics from annotation fragments as a fallback when full lyrics aren't available"""
-    if not annotations:
-        return None
-
-    # Collect all unique fragments
-    fragments = []
-    seen = set()
+# Local full-text search limits
+MAX_FIND_RESULTS = 50
+MAX_FIND_QUERY = 200
+MAX_SIMILAR_RESULTS = 50
 
-    for annotation in annotations:
-        fragment = annotation.get('fragment', '').strip()
-        if fragment and fragment not in seen:
-            fragments.append(fragment)
-            seen.add(fragment)
+# Lyrics response formats: lyrics text plus a flat annotations list, or a
+# document of pre-split lines with annotation ids per line
+LYRICS_FORMATS = ('text', 'structured')
 
-    if not fragments:
+def lyrics_format_error():
+    """400 response if the format parameter is unknown, else None"""
+    if request.args.get('format', 'text') in LYRICS_FORMATS:
         return None
-
-    # Join fragments with newlines
-    return '\n'.join(fragments)
-
-def _calculate_line_numbers(annotations, lyrics):
-    """Calculate which line number each annotation corresponds to in the lyrics"""
-    if not lyrics or not annotations:
-        return annotations
-
-    # Split lyrics into lines for line-by-line matching
-    lyrics_lines = [line.strip() for line in lyrics.split('\n') if line.strip()]
-    lyrics_lines_lower = [line.lower() for line in lyrics_lines]
-
-    logger.info(f"Calculating line numbers for {len(annotations)} annotations against {len(lyrics_lines)} lyric lines")
-
-    for annotation in annotations:
-        line_number = -1
-
-        # Get the annotation text to match (prefer range.content over fragment)
-        annotation_text = None
-        if 'range' in annotation and annotation['range'] and 'content' in annotation['range']:
-            annotation_text = annotation['range']['content'].strip()
-        elif annotation.get('fragment'):
-            annotation_text = annotation['fragment'].strip()
-
-        if not annotation_text:
-            annotation['lyrics_line_number'] = -1
-            annotation['line_match_method'] = 'no_text'
-            continue
-
-        # Normalize for matching
-        annotation_text_lower = annotation_text.lower().strip()
-
-        # Strategy 1: Find exact line match
-        for i, line in enumerate(lyrics_lines_lower):
-            if line == annotation_text_lower:
-                line_number = i + 1  # 1-based line numbers
-                break
-
-        # Strategy 2: Find line that contains the annotation text
-        if line_number == -1:
-            for i, line in enumerate(lyrics_lines_lower):
-                if annotation_text_lower in line and len(annotation_text_lower) > 5:
-                    line_number = i + 1
-                    break
-
-        # Strategy 3: Find line where annotation text contains the line (for longer annotations)
-        if line_number == -1:
-            for i, line in enumerate(lyrics_lines_lower):
-                if line in annotation_text_lower and len(line) > 5:
-                    line_number = i + 1
-                    break
-
-        annotation['lyrics_line_number'] = line_number
-        annotation['line_match_method'] = 'matched' if line_number != -1 else 'failed'
-
-        if line_number != -1:
-            logger.debug(f"Matched annotation to line {line_number}: '{annotation_text[:50]}...'")
-
-    return annotations
+    return jsonify({
+        'success': False,
+        'error': f"format must be one of: {', '.join(LYRICS_FORMATS)}"
+    }), 400
+
+def lyrics_fields(song_id: int, bundle: dict, structured: bool = False) -> dict:
+    """Lyrics and annotation fields of a response, as text or as a structured document"""
+    annotations = bundle.get('annotations', [])
+    if structured:
+        return {
+            'document': lyrics_documents.get(song_id, bundle.get('lyrics'), annotations),
+            'annotation_count': len(annotations)
+        }
+    return {
+        'lyrics': bundle.get('lyrics') or "Lyrics not available",
+        'annotations': annotations,
+        'annotation_count': len(annotations)
+    }
+
+def get_lyrics_for_track(track: dict, structured: bool = False):
+    """
+    Build the lyrics response for a track from a current-track snapshot
+
+    Returns (response dict, HTTP status). Shared by /lyrics/current and the
+    dashboard endpoint so both go through the same caches.
+    """
+    artists = track['artists']
+
+    # Get Genius client
+    genius_client = get_genius_client()
+    if not genius_client:
+        return {
+            'success': False,
+            'error': 'Genius client not configured'
+        }, 500
+
+    # Find matching song on Genius
+    spotify_track_data = {
+        'name': track['name'],
+        'artists': artists,
+        'album': {'name': track['album']['name']}
+    }
+
+    genius_match = lyrics_cache.find_match(genius_client, spotify_track_data)
+    if not genius_match:
+        return {
+            'success': False,
+            'error': 'No matching song found on Genius',
+            'spotify_track': {
+                'name': track['name'],
+                'artists': artists,
+                'album': track['album']['name']
+            }
+        }, 404
+
+    # Get detailed song information, lyrics and annotations
+    bundle = lyrics_cache.get_bundle(
+        genius_client,
+        genius_match['id'],
+        artists[0],
+        track['name'],
+        song_url=genius_match.get('url')
+    ) or {}
+    timing = lyrics_timing.get_index(genius_match['id'], bundle.get('lyrics'), track['duration_ms'], track['id'])
+
+    return {
+        'success': True,
+        'spotify_track': {
+            'id': track['id'],
+            'name': track['name'],
+            'artists': artists,
+            'album': track['album']['name'],
+            'progress_ms': track.get('progress_ms', 0),
+            'duration_ms': track['duration_ms'],
+            'is_playing': track.get('is_playing', False)
+        },
+        'genius_match': genius_match,
+        'song_details': bundle.get('song_details'),
+        'analytics': lyrics_analytics.get(genius_match['id'], bundle.get('lyrics')),
+        'repeated_phrases': repeated_phrases.get(genius_match['id'], bundle.get('lyrics')),
+        'mood_timeline': lyrics_mood.timeline(genius_match['id'], bundle.get('lyrics'), timing),
+        'line_timing': timing.to_dict() if timing else None,
+        **lyrics_fields(genius_match['id'], bundle, structured)
+    }, 200
 
 @lyrics_bp.route('/current')
 def get_current_lyrics():
     """Get lyrics and annotations for currently playing Spotify track"""
     try:
-        # Get Spotify client
-        sp = get_spotify_client()
-        if not sp:
+        format_error = lyrics_format_error()
+        if format_error:
+            return format_error
+
+        # Get currently playing track (shared snapshot, usually warm from the poller)
+        snapshot = get_current_track_snapshot()
+        if snapshot is None:
             return jsonify({
                 'success': False,
                 'error': 'Not authenticated with Spotify'
             }), 401
 
-        # Get currently playing track
-        current_track = sp.current_user_playing_track()
-        if not current_track or not current_track.get('item'):
+        if not snapshot.get('playing'):
             return jsonify({
                 'success': False,
                 'error': 'No track currently playing'
             }), 404
 
-        track = current_track['item']
-        artists = [artist['name'] for artist in track['artists']]
-
-        # Get Genius client
-        genius_client = get_genius_client()
-        if not genius_client:
-            return jsonify({
-                'success': False,
-                'error': 'Genius client not configured'
-            }), 500
-
-        # Find matching song on Genius
-        spotify_track_data = {
-            'name': track['name'],
-            'artists': artists,
-            'album': {'name': track['album']['name']}
-        }
-
-        genius_match = genius_client.find_best_match(spotify_track_data)
-        if not genius_match:
-            return jsonify({
-                'success': False,
-                'error': 'No matching song found on Genius',
-                'spotify_track': {
-                    'name': track['name'],
-                    'artists': artists,
-                    'album': track['album']['name']
-                }
-            }), 404
-
-        # Get detailed song information, lyrics and annotations
-        song_details = genius_client.get_song_details(genius_match['id'])
-
-        # Get lyrics using LyricsGenius scraping - pass the matched song URL for reliability
-        lyrics = genius_client.get_lyrics_with_lyricsgenius(
-            artists[0],
-            track['name'],
-            song_url=genius_match.get('url')
-        )
-        annotations = genius_client.get_song_annotations(genius_match['id'])
-
-        # Fallback: if lyrics failed but we have annotations, extract from fragments
-        if not lyrics and annotations:
-            logger.info("Full lyrics not available, extracting from annotation fragments")
-            lyrics = _extract_lyrics_from_annotations(annotations)
-            if lyrics:
-                logger.info(f"Extracted {len(lyrics)} characters from {len(annotations)} annotations")
-
-        # Calculate line numbers for annotations
-        if lyrics and annotations:
-            annotations = _calculate_line_numbers(annotations, lyrics)
-
-        return jsonify({
-            'success': True,
-            'spotify_track': {
-                'id': track['id'],
-                'name': track['name'],
-                'artists': artists,
-                'album': track['album']['name'],
-                'progress_ms': current_track.get('progress_ms', 0),
-                'duration_ms': track['duration_ms'],
-                'is_playing': current_track.get('is_playing', False)
-            },
-            'genius_match': genius_match,
-            'song_details': song_details,
-            'lyrics': lyrics if lyrics else "Lyrics not available",
-            'annotations': annotations,
-            'annotation_count': len(annotations)
-        })
+        response_data, status = get_lyrics_for_track(snapshot['track'], request.args.get('format') == 'structured')
+        return jsonify(response_data), status
 
     except Exception as e:
         logger.error(f"Error in get_current_lyrics: {str(e)}")
@@ -196,6 +158,10 @@ def search_and_get_lyrics():
                 'error': 'Both artist and title parameters required'
             }), 400
 
+        format_error = lyrics_format_error()
+        if format_error:
+            return format_error
+
         genius_client = get_genius_client()
         if not genius_client:
             return jsonify({
@@ -209,7 +175,7 @@ def search_and_get_lyrics():
             'artists': [artist]
         }
 
-        genius_match = genius_client.find_best_match(spotify_track_data)
+        genius_match = lyrics_cache.find_match(genius_client, spotify_track_data)
         if not genius_match:
             return jsonify({
                 'success': False,
@@ -217,26 +183,13 @@ def search_and_get_lyrics():
             }), 404
 
         # Get detailed song information, lyrics and annotations
-        song_details = genius_client.get_song_details(genius_match['id'])
-
-        # Get lyrics using LyricsGenius scraping - pass the matched song URL for reliability
-        lyrics = genius_client.get_lyrics_with_lyricsgenius(
+        bundle = lyrics_cache.get_bundle(
+            genius_client,
+            genius_match['id'],
             artist,
             title,
             song_url=genius_match.get('url')
-        )
-        annotations = genius_client.get_song_annotations(genius_match['id'])
-
-        # Fallback: if lyrics failed but we have annotations, extract from fragments
-        if not lyrics and annotations:
-            logger.info("Full lyrics not available, extracting from annotation fragments")
-            lyrics = _extract_lyrics_from_annotations(annotations)
-            if lyrics:
-                logger.info(f"Extracted {len(lyrics)} characters from {len(annotations)} annotations")
-
-        # Calculate line numbers for annotations
-        if lyrics and annotations:
-            annotations = _calculate_line_numbers(annotations, lyrics)
+        ) or {}
 
         return jsonify({
             'success': True,
@@ -245,10 +198,10 @@ def search_and_get_lyrics():
                 'title': title
             },
             'genius_match': genius_match,
-            'song_details': song_details,
-            'lyrics': lyrics if lyrics else "Lyrics not available",
-            'annotations': annotations,
-            'annotation_count': len(annotations)
+            'song_details': bundle.get('song_details'),
+            'analytics': lyrics_analytics.get(genius_match['id'], bundle.get('lyrics')),
+            'repeated_phrases': repeated_phrases.get(genius_match['id'], bundle.get('lyrics')),
+            **lyrics_fields(genius_match['id'], bundle, request.args.get('format') == 'structured')
         })
 
     except Exception as e:
@@ -262,6 +215,10 @@ def search_and_get_lyrics():
 def get_lyrics_by_genius_id(genius_song_id):
     """Get lyrics and annotations for a specific Genius song ID"""
     try:
+        format_error = lyrics_format_error()
+        if format_error:
+            return format_error
+
         genius_client = get_genius_client()
         if not genius_client:
             return jsonify({
@@ -269,45 +226,111 @@ def get_lyrics_by_genius_id(genius_song_id):
                 'error': 'Genius client not configured'
             }), 500
 
-        # Get song details
-        song_details = genius_client.get_song_details(genius_song_id)
-        if not song_details:
+        # Get song details, lyrics and annotations
+        bundle = lyrics_cache.get_bundle(genius_client, genius_song_id)
+        if not bundle or not bundle.get('song_details'):
             return jsonify({
                 'success': False,
                 'error': 'Song not found'
             }), 404
 
-        # Get lyrics using LyricsGenius scraping - pass the song URL for reliability
-        lyrics = genius_client.get_lyrics_with_lyricsgenius(
-            song_details['artist'],
-            song_details['title'],
-            song_url=song_details.get('url')
-        )
+        return jsonify({
+            'success': True,
+            'song': bundle['song_details'],
+            'analytics': lyrics_analytics.get(genius_song_id, bundle.get('lyrics')),
+            'repeated_phrases': repeated_phrases.get(genius_song_id, bundle.get('lyrics')),
+            **lyrics_fields(genius_song_id, bundle, request.args.get('format') == 'structured')
+        })
 
-        # Get annotations
-        annotations = genius_client.get_song_annotations(genius_song_id)
+    except Exception as e:
+        logger.error(f"Error in get_lyrics_by_genius_id: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
 
-        # Fallback: if lyrics failed but we have annotations, extract from fragments
-        if not lyrics and annotations:
-            logger.info("Full lyrics not available, extracting from annotation fragments")
-            lyrics = _extract_lyrics_from_annotations(annotations)
-            if lyrics:
-                logger.info(f"Extracted {len(lyrics)} characters from {len(annotations)} annotations")
+@lyrics_bp.route('/find')
+def find_lyrics():
+    """Find songs by a line of their lyrics, answered from the local index without calling Genius"""
+    try:
+        query = (request.args.get('q') or '').strip()
+        if not query:
+            return jsonify({
+                'success': False,
+                'error': 'q parameter required'
+            }), 400
 
-        # Calculate line numbers for annotations
-        if lyrics and annotations:
-            annotations = _calculate_line_numbers(annotations, lyrics)
+        if len(query) > MAX_FIND_QUERY:
+            return jsonify({
+                'success': False,
+                'error': f'q must be at most {MAX_FIND_QUERY} characters'
+            }), 400
+
+        try:
+            limit = min(max(int(request.args.get('limit', 20)), 1), MAX_FIND_RESULTS)
+        except ValueError:
+            return jsonify({
+                'success': False,
+                'error': 'limit must be an integer'
+            }), 400
+
+        results = lyrics_search.search(query, limit)
+
+        # Show the matched line when the lyrics are still at hand
+        for result in results:
+            lyrics = lyrics_cache.get_cached_lyrics(result['genius_id'])
+            lines = [line.strip() for line in lyrics.split('\n') if line.strip()] if lyrics else []
+            line = result['line']
+            result['line_text'] = lines[line - 1] if line and line <= len(lines) else None
 
         return jsonify({
             'success': True,
-            'song': song_details,
-            'lyrics': lyrics if lyrics else "Lyrics not available",
-            'annotations': annotations,
-            'annotation_count': len(annotations)
+            'query': query,
+            'results': results,
+            'indexed_songs': len(lyrics_search)
         })
 
     except Exception as e:
-        logger.error(f"Error in get_lyrics_by_genius_id: {str(e)}")
+        logger.error(f"Error in find_lyrics: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@lyrics_bp.route('/similar/<int:genius_song_id>')
+def get_similar_lyrics(genius_song_id):
+    """Songs with similar lyrics to a Genius song, including other versions of it, from the local index"""
+    try:
+        try:
+            limit = min(max(int(request.args.get('limit', 20)), 1), MAX_SIMILAR_RESULTS)
+            min_similarity = min(max(float(request.args.get('min_similarity', MIN_SIMILARITY)), 0.0), 1.0)
+        except ValueError:
+            return jsonify({
+                'success': False,
+                'error': 'limit and min_similarity must be numbers'
+            }), 400
+
+        similar = lyrics_similarity.similar(genius_song_id, limit, min_similarity)
+        if similar is None:
+            # Index lyrics that are cached but were stored before the index existed
+            lyrics_similarity.add(genius_song_id, lyrics_cache.get_cached_lyrics(genius_song_id))
+            similar = lyrics_similarity.similar(genius_song_id, limit, min_similarity)
+        if similar is None:
+            return jsonify({
+                'success': False,
+                'error': 'Lyrics for this song are not cached'
+            }), 404
+
+        return jsonify({
+            'success': True,
+            'genius_id': genius_song_id,
+            'similar': similar,
+            'near_duplicates': lyrics_similarity.near_duplicates(genius_song_id),
+            'indexed_songs': len(lyrics_similarity)
+        })
+
+    except Exception as e:
+        logger.error(f"Error in get_similar_lyrics: {str(e)}")
         return jsonify({
             'success': False,
             'error': str(e)
@@ -317,16 +340,27 @@ def get_lyrics_by_genius_id(genius_song_id):
 def sync_current_track():
     """Get synchronized lyrics with playback position for current track"""
     try:
-        # Get current track lyrics and annotations
-        current_lyrics_response = get_current_lyrics()
+        format_error = lyrics_format_error()
+        if format_error:
+            return format_error
 
-        if current_lyrics_response.status_code != 200:
-            return current_lyrics_response
+        # Get current track lyrics and annotations
+        snapshot = get_current_track_snapshot()
+        if snapshot is None:
+            return jsonify({
+                'success': False,
+                'error': 'Not authenticated with Spotify'
+            }), 401
 
-        data = current_lyrics_response.get_json()
+        if not snapshot.get('playing'):
+            return jsonify({
+                'success': False,
+                'error': 'No track currently playing'
+            }), 404
 
+        data, status = get_lyrics_for_track(snapshot['track'], request.args.get('format') == 'structured')
         if not data.get('success'):
-            return current_lyrics_response
+            return jsonify(data), status
 
         # Add playback synchronization info
         spotify_track = data['spotify_track']
@@ -345,6 +379,16 @@ def sync_current_track():
             'timestamp': int(time.time() * 1000)  # Current timestamp in ms
         }
 
+        # Line timing was built when the lyrics were loaded, this is a binary search
+        if data.get('line_timing'):
+            current_line, next_line_at_ms = lyrics_timing.position(data['genius_match']['id'], duration_ms, progress_ms)
+            data['sync_info']['current_line'] = current_line
+            data['sync_info']['next_line_at_ms'] = next_line_at_ms
+
+            # Lines were scored when the lyrics were loaded, the mood is that of the current line
+            if data.get('mood_timeline'):
+                data['sync_info']['mood'] = lyrics_mood.mood_at(data['genius_match']['id'], current_line)
+
         return jsonify(data)
 
     except Exception as e:
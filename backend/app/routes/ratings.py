@@ -1,10 +1,19 @@
-from flask import Blueprint, request, jsonify, session
+from flask import Blueprint, Response, current_app, request, jsonify, session, stream_with_context
 from ..services.ratings_storage import get_ratings_storage
+import io
+import hmac
+import hashlib
 import logging
 
 logger = logging.getLogger(__name__)
 ratings_bp = Blueprint('ratings', __name__)
 
+MAX_RATINGS_PAGE = 200
+MAX_TOP_SONGS = 100
+MAX_TASTE_RESULTS = 50
+MAX_SEARCH_RESULTS = 100
+MAX_THEME_TERMS = 50
+
 def _get_user_id():
     """Get user ID from session (using Spotify user ID if available)"""
     # For now, use a simple session-based user ID
@@ -54,7 +63,13 @@ def rate_song():
         user_id = _get_user_id()
         storage = get_ratings_storage()
 
-        rating_entry = storage.add_rating(user_id, song_data, rating)
+        try:
+            rating_entry = storage.add_rating(user_id, song_data, rating)
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
 
         return jsonify({
             'success': True,
@@ -80,15 +95,33 @@ def get_my_ratings():
         if sort_by not in valid_sorts:
             sort_by = 'title'
 
+        # Without a limit every rating is returned in one response
+        limit = request.args.get('limit', type=int)
+        if limit is not None and not 1 <= limit <= MAX_RATINGS_PAGE:
+            return jsonify({
+                'success': False,
+                'error': f'limit must be between 1 and {MAX_RATINGS_PAGE}'
+            }), 400
+
         storage = get_ratings_storage()
-        ratings = storage.get_all_ratings(user_id, sort_by)
+        # Taken before reading, so a write racing the read shows up in the next change feed
+        sync_token = storage.get_sync_token(user_id)
+        try:
+            ratings, next_cursor = storage.get_ratings_page(user_id, sort_by, limit, request.args.get('cursor'))
+        except ValueError:
+            return jsonify({
+                'success': False,
+                'error': 'Invalid cursor'
+            }), 400
         stats = storage.get_stats(user_id)
 
         return jsonify({
             'success': True,
             'ratings': ratings,
             'stats': stats,
-            'sort_by': sort_by
+            'sort_by': sort_by,
+            'next_cursor': next_cursor,
+            'sync_token': sync_token
         })
 
     except Exception as e:
@@ -98,6 +131,36 @@ def get_my_ratings():
             'error': str(e)
         }), 500
 
+@ratings_bp.route('/search', methods=['GET'])
+def search_my_ratings():
+    """Search the current user's rated songs"""
+    try:
+        query = request.args.get('q', '')
+        if not query.strip():
+            return jsonify({
+                'success': False,
+                'error': 'Query parameter required'
+            }), 400
+
+        limit = request.args.get('limit', 20, type=int)
+        limit = max(1, min(limit, MAX_SEARCH_RESULTS))
+
+        user_id = _get_user_id()
+        storage = get_ratings_storage()
+
+        return jsonify({
+            'success': True,
+            'query': query,
+            'ratings': storage.search_ratings(user_id, query, limit)
+        })
+
+    except Exception as e:
+        logger.error(f"Error searching ratings: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @ratings_bp.route('/rating/<song_id>', methods=['GET'])
 def get_song_rating(song_id):
     """Get rating for a specific song"""
@@ -110,7 +173,8 @@ def get_song_rating(song_id):
         if rating:
             return jsonify({
                 'success': True,
-                'rating': rating
+                'rating': rating,
+                'percentile': storage.get_percentile_rank(user_id, rating['rating'])
             })
         else:
             return jsonify({
@@ -172,3 +236,239 @@ def get_rating_stats():
             'success': False,
             'error': str(e)
         }), 500
+
+@ratings_bp.route('/distribution', methods=['GET'])
+def get_rating_distribution():
+    """Get the rating histogram for the current user"""
+    try:
+        # Bin size in rating points, must be a multiple of 0.1 that fits in 0.0-10.0
+        try:
+            bin_size = float(request.args.get('bin_size', 1.0))
+        except ValueError:
+            bin_size = 0
+        bin_width = int(round(bin_size * 10))
+        if not 1 <= bin_width <= 100 or abs(bin_width - bin_size * 10) > 1e-6:
+            return jsonify({
+                'success': False,
+                'error': 'bin_size must be a multiple of 0.1 between 0.1 and 10.0'
+            }), 400
+
+        user_id = _get_user_id()
+        storage = get_ratings_storage()
+
+        return jsonify({
+            'success': True,
+            'distribution': storage.get_distribution(user_id, bin_width),
+            'bin_size': bin_width / 10,
+            'stats': storage.get_stats(user_id)
+        })
+
+    except Exception as e:
+        logger.error(f"Error getting rating distribution: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@ratings_bp.route('/changes', methods=['GET'])
+def get_rating_changes():
+    """Get the current user's rating changes since a sync token"""
+    try:
+        user_id = _get_user_id()
+        storage = get_ratings_storage()
+
+        try:
+            changes = storage.get_changes(user_id, request.args.get('since'))
+        except ValueError:
+            return jsonify({
+                'success': False,
+                'error': 'Invalid sync token'
+            }), 400
+
+        return jsonify({
+            'success': True,
+            **changes,
+            'stats': storage.get_stats(user_id)
+        })
+
+    except Exception as e:
+        logger.error(f"Error getting rating changes: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@ratings_bp.route('/song/<spotify_id>/summary', methods=['GET'])
+def get_song_summary(spotify_id):
+    """Get how all listeners rated a song"""
+    try:
+        storage = get_ratings_storage()
+        summary = storage.get_song_summary(spotify_id)
+
+        if not summary:
+            return jsonify({
+                'success': False,
+                'error': 'No ratings found for this song'
+            }), 404
+
+        return jsonify({
+            'success': True,
+            'summary': summary
+        })
+
+    except Exception as e:
+        logger.error(f"Error getting song summary: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@ratings_bp.route('/top', methods=['GET'])
+def get_top_songs():
+    """Get the top rated songs across all listeners"""
+    try:
+        limit = request.args.get('limit', 10, type=int)
+        limit = max(1, min(limit, MAX_TOP_SONGS))
+
+        storage = get_ratings_storage()
+
+        return jsonify({
+            'success': True,
+            'songs': storage.get_top_songs(limit)
+        })
+
+    except Exception as e:
+        logger.error(f"Error getting top songs: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+def _listener_id(user_id: str) -> str:
+    """Opaque, stable id of another listener, so internal user ids never reach clients"""
+    secret = current_app.config['SECRET_KEY'].encode('utf-8')
+    return hmac.new(secret, user_id.encode('utf-8'), hashlib.sha256).hexdigest()[:16]
+
+@ratings_bp.route('/similar-listeners', methods=['GET'])
+def get_similar_listeners():
+    """Get listeners whose ratings are most similar to the current user's"""
+    try:
+        limit = request.args.get('limit', 10, type=int)
+        limit = max(1, min(limit, MAX_TASTE_RESULTS))
+
+        user_id = _get_user_id()
+        storage = get_ratings_storage()
+
+        listeners = [
+            {
+                'listener_id': _listener_id(listener['user_id']),
+                'similarity': listener['similarity'],
+                'shared_ratings': listener['shared_ratings']
+            }
+            for listener in storage.get_similar_users(user_id, limit)
+        ]
+
+        return jsonify({
+            'success': True,
+            'listeners': listeners
+        })
+
+    except Exception as e:
+        logger.error(f"Error getting similar listeners: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@ratings_bp.route('/recommendations', methods=['GET'])
+def get_recommendations():
+    """Get songs the current user would probably rate highly"""
+    try:
+        limit = request.args.get('limit', 20, type=int)
+        limit = max(1, min(limit, MAX_TASTE_RESULTS))
+
+        user_id = _get_user_id()
+        storage = get_ratings_storage()
+
+        return jsonify({
+            'success': True,
+            'recommendations': storage.get_recommendations(user_id, limit)
+        })
+
+    except Exception as e:
+        logger.error(f"Error getting recommendations: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@ratings_bp.route('/themes', methods=['GET'])
+def get_rating_themes():
+    """Get the words and phrases that stand out in the lyrics of the current user's rated songs"""
+    try:
+        limit = request.args.get('limit', 20, type=int)
+        limit = max(1, min(limit, MAX_THEME_TERMS))
+
+        user_id = _get_user_id()
+        storage = get_ratings_storage()
+        profile = storage.get_theme_profile(user_id)
+
+        return jsonify({
+            'success': True,
+            'terms': profile['terms'][:limit],
+            'phrases': profile['phrases'][:limit],
+            'songs_analyzed': profile['songs_analyzed'],
+            'songs_without_lyrics': profile['songs_without_lyrics']
+        })
+
+    except Exception as e:
+        logger.error(f"Error getting rating themes: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@ratings_bp.route('/export', methods=['GET'])
+def export_ratings():
+    """Stream the current user's ratings as NDJSON"""
+    try:
+        user_id = _get_user_id()
+        sort_by = request.args.get('sort', 'date')
+        storage = get_ratings_storage()
+
+        return Response(
+            stream_with_context(storage.export_ratings(user_id, sort_by)),
+            mimetype='application/x-ndjson',
+            headers={'Content-Disposition': 'attachment; filename=ratings.ndjson'}
+        )
+
+    except Exception as e:
+        logger.error(f"Error exporting ratings: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@ratings_bp.route('/import', methods=['POST'])
+def import_ratings():
+    """Import ratings for the current user from an NDJSON body (the export format)"""
+    try:
+        user_id = _get_user_id()
+        storage = get_ratings_storage()
+
+        # Read the body line by line instead of loading it whole; the raw
+        # stream reads lines one byte at a time, so buffer it
+        result = storage.import_ratings(user_id, io.BufferedReader(request.stream, 1 << 16))
+
+        return jsonify({
+            'success': True,
+            **result,
+            'stats': storage.get_stats(user_id)
+        })
+
+    except Exception as e:
+        logger.error(f"Error importing ratings: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
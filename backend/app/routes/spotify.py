@@ -4,12 +4,20 @@ from spotipy.oauth2 import SpotifyOAuth
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 import time
+import json
+import base64
+import secrets
 import logging
-from app.services.spotify_cache import spotify_cache
+from app.services.spotify_cache import spotify_cache, spotify_search_cache
+from app.services.playback_poller import playback_poller, format_current_track
 
 logger = logging.getLogger(__name__)
 spotify_bp = Blueprint('spotify', __name__)
 
+# Spotify search API limits
+SEARCH_MAX_LIMIT = 50
+SEARCH_MAX_OFFSET = 1000
+
 def handle_spotify_request(sp, request_func, *args, **kwargs):
     """Handle Spotify API requests with rate limiting and retry logic"""
     max_retries = 2
@@ -36,11 +44,14 @@ def handle_spotify_request(sp, request_func, *args, **kwargs):
     return None
 
 def get_user_id_from_session():
-    """Get user ID from session for caching"""
+    """Get user ID from session for caching and the playback poller"""
     token_info = session.get('spotify_token')
     if token_info:
-        # Use a hash of the access token as user identifier for caching
-        return str(hash(token_info.get('access_token', '')))
+        # A random id per login; the access token changes on every refresh, which
+        # would orphan the user's cache entries and poller schedule
+        if 'session_user_id' not in session:
+            session['session_user_id'] = secrets.token_hex(16)
+        return session['session_user_id']
     return 'anonymous'
 
 def get_spotify_client():
@@ -54,7 +65,7 @@ def get_spotify_client():
         client_id=current_app.config['SPOTIFY_CLIENT_ID'],
         client_secret=current_app.config['SPOTIFY_CLIENT_SECRET'],
         redirect_uri=current_app.config['SPOTIFY_REDIRECT_URI'],
-        scope="user-read-currently-playing user-read-playback-state"
+        scope=current_app.config['SPOTIFY_SCOPE']
     )
 
     if sp_oauth.is_token_expired(token_info):
@@ -63,69 +74,67 @@ def get_spotify_client():
 
     return spotipy.Spotify(auth=token_info['access_token'])
 
+def get_current_track_snapshot(force_refresh: bool = False):
+    """
+    Get the current-track response for this session, shared by every endpoint
+
+    Served from the cache (kept warm by the playback poller) unless a refresh
+    is forced. Progress of a playing track is advanced by the time elapsed
+    since it was fetched. Returns None when not authenticated with Spotify.
+    """
+    user_id = get_user_id_from_session()
+    token_info = session.get('spotify_token')
+
+    # Keep this user on the server-side poller while their client is active
+    if token_info:
+        playback_poller.register(user_id, token_info)
+
+    # Check cache first (unless force refresh)
+    if not force_refresh:
+        should_skip, cached_data = spotify_cache.should_skip_request(user_id, 'current-track')
+        if should_skip and cached_data:
+            logger.debug("Returning cached current track data")
+            return _with_estimated_progress(cached_data)
+
+    sp = get_spotify_client()
+    if not sp:
+        return None
+
+    # Get currently playing track with rate limit handling
+    current_track = handle_spotify_request(sp, sp.current_user_playing_track)
+    response_data = format_current_track(current_track)
+
+    # Cache the response (including "no track playing")
+    spotify_cache.cache_response(user_id, 'current-track', response_data)
+    return response_data
+
+def _with_estimated_progress(response_data: dict) -> dict:
+    """Advance progress_ms of a cached playing track by the time since it was fetched"""
+    track = response_data.get('track')
+    fetched_at = response_data.get('fetched_at')
+    if not track or not fetched_at or not track.get('is_playing'):
+        return response_data
+
+    elapsed_ms = max(int(time.time() * 1000) - fetched_at, 0)
+    estimated = dict(response_data)
+    estimated['track'] = dict(track)
+    estimated['track']['progress_ms'] = min(track['progress_ms'] + elapsed_ms, track['duration_ms'])
+    return estimated
+
 @spotify_bp.route('/current-track')
 def get_current_track():
     """Get currently playing track with caching and rate limiting"""
     try:
-        # Get user ID for caching
-        user_id = get_user_id_from_session()
-
         # Check if force refresh is requested (bypasses cache)
         force_refresh = request.args.get('force_refresh', 'false').lower() == 'true'
 
-        # Check cache first (unless force refresh)
-        if not force_refresh:
-            should_skip, cached_data = spotify_cache.should_skip_request(user_id, 'current-track')
-            if should_skip and cached_data:
-                logger.debug("Returning cached current track data")
-                return jsonify(cached_data)
-
-        sp = get_spotify_client()
-        if not sp:
+        response_data = get_current_track_snapshot(force_refresh)
+        if response_data is None:
             return jsonify({
                 'success': False,
                 'error': 'Not authenticated with Spotify'
             }), 401
 
-        # Get currently playing track with rate limit handling
-        current_track = handle_spotify_request(sp, sp.current_user_playing_track)
-
-        if not current_track or not current_track.get('item'):
-            response_data = {
-                'success': True,
-                'playing': False,
-                'message': 'No track currently playing'
-            }
-            # Cache the "no track playing" response for a shorter time
-            spotify_cache.cache_response(user_id, 'current-track', response_data)
-            return jsonify(response_data)
-
-        track = current_track['item']
-        artists = [artist['name'] for artist in track['artists']]
-
-        response_data = {
-            'success': True,
-            'playing': True,
-            'track': {
-                'id': track['id'],
-                'name': track['name'],
-                'artists': artists,
-                'album': {
-                    'name': track['album']['name'],
-                    'images': track['album'].get('images', [])
-                },
-                'duration_ms': track['duration_ms'],
-                'progress_ms': current_track.get('progress_ms', 0),
-                'is_playing': current_track.get('is_playing', False),
-                'external_urls': track.get('external_urls', {}),
-                'preview_url': track.get('preview_url'),
-                'popularity': track.get('popularity', 0),
-                'explicit': track.get('explicit', False)
-            }
-        }
-
-        # Cache the successful response
-        spotify_cache.cache_response(user_id, 'current-track', response_data)
         return jsonify(response_data)
 
     except spotipy.exceptions.SpotifyException as e:
@@ -231,19 +240,81 @@ def get_user_profile():
             'error': str(e)
         }), 500
 
+def _encode_search_cursor(query: str, search_type: str, offset: int, limit: int) -> str:
+    """Encode search position as an opaque cursor"""
+    payload = json.dumps({'q': query, 't': search_type, 'o': offset, 'l': limit}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+def _decode_search_cursor(cursor: str) -> dict:
+    """Decode an opaque search cursor, raising ValueError if it is malformed"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+        return {
+            'query': str(payload['q']),
+            'type': str(payload['t']),
+            'offset': int(payload['o']),
+            'limit': int(payload['l'])
+        }
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+def _fetch_search_page(sp, query: str, search_type: str, offset: int, limit: int) -> dict:
+    """Run a Spotify search and format one page of track results"""
+    results = handle_spotify_request(sp, sp.search, q=query, limit=limit, offset=offset, type=search_type)
+
+    tracks = []
+    for track in results['tracks']['items']:
+        artists = [artist['name'] for artist in track['artists']]
+        tracks.append({
+            'id': track['id'],
+            'name': track['name'],
+            'artists': artists,
+            'album': track['album']['name'],
+            'duration_ms': track['duration_ms'],
+            'popularity': track.get('popularity', 0),
+            'preview_url': track.get('preview_url'),
+            'external_urls': track.get('external_urls', {})
+        })
+
+    return {
+        'tracks': tracks,
+        'total': results['tracks']['total']
+    }
+
 @spotify_bp.route('/search')
 def search_tracks():
-    """Search for tracks on Spotify"""
+    """Search for tracks on Spotify with cached, cursor-paginated results"""
     try:
-        query = request.args.get('q')
-        if not query:
-            return jsonify({
-                'success': False,
-                'error': 'Query parameter required'
-            }), 400
+        cursor = request.args.get('cursor')
+
+        if cursor:
+            try:
+                position = _decode_search_cursor(cursor)
+            except ValueError:
+                return jsonify({
+                    'success': False,
+                    'error': 'Invalid cursor'
+                }), 400
+
+            query = position['query']
+            track_type = position['type']
+            offset = position['offset']
+            limit = position['limit']
+        else:
+            query = request.args.get('q')
+            if not query:
+                return jsonify({
+                    'success': False,
+                    'error': 'Query parameter required'
+                }), 400
+
+            track_type = request.args.get('type', 'track')
+            offset = max(request.args.get('offset', 0, type=int), 0)
+            limit = request.args.get('limit', 10, type=int)
 
-        limit = min(int(request.args.get('limit', 10)), 50)
-        track_type = request.args.get('type', 'track')
+        limit = max(min(limit, SEARCH_MAX_LIMIT), 1)
+        offset = max(min(offset, SEARCH_MAX_OFFSET - limit), 0)
 
         sp = get_spotify_client()
         if not sp:
@@ -252,26 +323,29 @@ def search_tracks():
                 'error': 'Not authenticated with Spotify'
             }), 401
 
-        results = sp.search(q=query, limit=limit, type=track_type)
-
-        tracks = []
-        for track in results['tracks']['items']:
-            artists = [artist['name'] for artist in track['artists']]
-            tracks.append({
-                'id': track['id'],
-                'name': track['name'],
-                'artists': artists,
-                'album': track['album']['name'],
-                'duration_ms': track['duration_ms'],
-                'popularity': track.get('popularity', 0),
-                'preview_url': track.get('preview_url'),
-                'external_urls': track.get('external_urls', {})
-            })
+        page, cached = spotify_search_cache.get_or_fetch(
+            lambda: _fetch_search_page(sp, query, track_type, offset, limit),
+            query, track_type, offset, limit
+        )
+
+        # Pre-fetch the next page in the background while the user reads this one
+        next_offset = offset + limit
+        next_cursor = None
+        if next_offset < page['total'] and next_offset + limit <= SEARCH_MAX_OFFSET:
+            next_cursor = _encode_search_cursor(query, track_type, next_offset, limit)
+            spotify_search_cache.prefetch(
+                lambda: _fetch_search_page(sp, query, track_type, next_offset, limit),
+                query, track_type, next_offset, limit
+            )
 
         return jsonify({
             'success': True,
-            'tracks': tracks,
-            'total': results['tracks']['total']
+            'tracks': page['tracks'],
+            'total': page['total'],
+            'offset': offset,
+            'limit': limit,
+            'next_cursor': next_cursor,
+            'cached': cached
         })
 
     except spotipy.exceptions.SpotifyException as e:
@@ -283,4 +357,4 @@ def search_tracks():
         return jsonify({
             'success': False,
             'error': str(e)
-        }), 500
\ No newline at end of file
+        }), 500
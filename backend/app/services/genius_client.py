@@ -1,18 +1,137 @@
 import requests
 import time
+import threading
 import lyricsgenius
 import re
-from typing import Dict, List, Optional, Any
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Any, Tuple
 from flask import current_app
 from bs4 import BeautifulSoup
 import logging
 
 logger = logging.getLogger(__name__)
 
+def parse_lyrics_html(content: bytes, url: str = '') -> Optional[str]:
+    """Extract and clean lyrics from a Genius song page
+
+    Module-level (no client state) so bulk jobs can run it in worker processes.
+    """
+    try:
+        soup = BeautifulSoup(content, 'html.parser')
+
+        # Genius uses data-lyrics-container attribute for lyrics divs
+        lyrics_divs = soup.find_all('div', {'data-lyrics-container': 'true'})
+
+        if not lyrics_divs:
+            logger.warning(f"No lyrics containers found on page: {url}")
+            return None
+
+        # Extract text from all lyrics containers
+        lyrics_parts = []
+        for div in lyrics_divs:
+            # Get text but preserve line breaks
+            text = div.get_text(separator='\n', strip=True)
+            if text:
+                lyrics_parts.append(text)
+
+        if not lyrics_parts:
+            return None
+
+        lyrics = '\n\n'.join(lyrics_parts)
+
+        # Clean the scraped lyrics
+        lyrics = clean_scraped_lyrics(lyrics)
+
+        return lyrics if lyrics else None
+
+    except Exception as e:
+        logger.error(f"Error parsing lyrics from {url}: {e}")
+        return None
+
+
+def clean_scraped_lyrics(lyrics: str) -> str:
+    """Clean scraped lyrics to remove Genius metadata and extra content"""
+    if not lyrics:
+        return lyrics
+
+    # Split into lines for processing
+    lines = lyrics.split('\n')
+    cleaned_lines = []
+
+    # Patterns to skip (case insensitive)
+    skip_patterns = [
+        r'^\d+\s*contributors?',  # "184 Contributors"
+        r'^translations?',  # "Translations"
+        r'^(polish|русский|français|türkçe|español|português|italiano|deutsch)',  # Language names
+        r'^\(russian\)',  # Language names in parentheses
+        r'^less i know the better lyrics',  # Song title headers
+        r'^".*" describes',  # Description text like '"The Less I Know the Better" describes'
+        r'^\.\.\.\s*read more',  # "... Read More"
+        r'^read more$',  # "Read More"
+        r'^embed$',  # "Embed"
+        r'^you might also like$',  # "You might also like"
+    ]
+
+    # Track if we've found the start of actual lyrics
+    lyrics_started = False
+    description_section = False
+
+    for line in lines:
+        line_stripped = line.strip()
+        line_lower = line_stripped.lower()
+
+        # Skip empty lines before lyrics start
+        if not lyrics_started and not line_stripped:
+            continue
+
+        # Check if this line should be skipped
+        should_skip = False
+        for pattern in skip_patterns:
+            if re.match(pattern, line_lower):
+                should_skip = True
+                break
+
+        if should_skip:
+            continue
+
+        # Detect and skip description sections
+        if '"' in line_stripped and 'describes' in line_lower:
+            description_section = True
+            continue
+
+        # Skip lines that are part of description section
+        if description_section:
+            # End description section when we hit "Read More" or a bracket (song section)
+            if 'read more' in line_lower or line_stripped.startswith('['):
+                description_section = False
+                if line_stripped.startswith('['):
+                    # This is a song section, include it
+                    lyrics_started = True
+                    cleaned_lines.append(line)
+            continue
+
+        # If we see a bracket section header, lyrics have started
+        if line_stripped.startswith('[') and line_stripped.endswith(']'):
+            lyrics_started = True
+            cleaned_lines.append(line)
+            continue
+
+        # Once lyrics have started, keep all lines
+        if lyrics_started:
+            cleaned_lines.append(line)
+        # If line has substantial content and isn't metadata, assume lyrics started
+        elif len(line_stripped) > 0 and not any(c.isdigit() for c in line_stripped[:10]):
+            lyrics_started = True
+            cleaned_lines.append(line)
+
+    return '\n'.join(cleaned_lines).strip()
+
+
 class RateLimitedGeniusClient:
     """Rate-limited Genius API client with caching"""
 
-    def __init__(self, access_token: str):
+    def __init__(self, access_token: str, requests_per_minute: int = 10,
+                 base_url: str = "https://api.genius.com"):
         self.access_token = access_token
         self.genius = lyricsgenius.Genius(
             access_token,
@@ -47,14 +166,23 @@ class RateLimitedGeniusClient:
             logger.warning(f"Could not set custom headers: {e}")
             # Continue without custom headers
 
-        # Rate limiting - Genius allows 1000 requests per day
-        self.requests_per_minute = 10
+        # Rate limiting - Genius allows 1000 requests per day; at the default
+        # 10 per minute sustained background use takes well over an hour to
+        # reach that. The budget is shared by every request and background
+        # worker in the process.
+        self.requests_per_minute = requests_per_minute
         self.last_request_time = 0
         self.request_count = 0
         self.minute_start = time.time()
+        # The client is shared by request threads and background workers
+        self.rate_lock = threading.Lock()
+        # Background work (prefetch, warm-up) may only use this share of the
+        # per-minute budget so interactive requests always find a free slot
+        self.background_share = 0.5
+        self._priority = threading.local()
 
-        # Base API URL
-        self.base_url = "https://api.genius.com"
+        # Base API URL (overridable to point at a local stub server)
+        self.base_url = base_url.rstrip('/')
 
         # Headers for direct API calls
         self.headers = {
@@ -64,6 +192,29 @@ class RateLimitedGeniusClient:
 
     def _wait_if_needed(self):
         """Implement rate limiting"""
+        if getattr(self._priority, 'background', False):
+            # Background work (prefetch, warm-up) stays within its share of the budget
+            self._wait_for_slot(max(1, int(self.requests_per_minute * self.background_share)))
+        else:
+            self._wait_for_slot(self.requests_per_minute)
+
+    @contextmanager
+    def background(self):
+        """Run Genius calls made inside this block at background priority"""
+        previous = getattr(self._priority, 'background', False)
+        self._priority.background = True
+        try:
+            yield self
+        finally:
+            self._priority.background = previous
+
+    def _reserve_slot(self, limit: int) -> Tuple[bool, float]:
+        """
+        Take a request slot if fewer than limit were used this minute (caller holds rate_lock)
+
+        Returns (reserved, seconds to sleep before the request, or before
+        trying again when no slot was free).
+        """
         current_time = time.time()
 
         # Reset counter every minute
@@ -71,22 +222,28 @@ class RateLimitedGeniusClient:
             self.request_count = 0
             self.minute_start = current_time
 
-        # Check if we've hit the rate limit
-        if self.request_count >= self.requests_per_minute:
-            sleep_time = 60 - (current_time - self.minute_start)
-            if sleep_time > 0:
-                logger.info(f"Rate limit reached, sleeping for {sleep_time:.2f} seconds")
-                time.sleep(sleep_time)
-                self.request_count = 0
-                self.minute_start = time.time()
+        if self.request_count >= limit:
+            return False, 60 - (current_time - self.minute_start)
 
         # Ensure minimum delay between requests
-        time_since_last = current_time - self.last_request_time
-        if time_since_last < 0.1:  # 100ms minimum between requests
-            time.sleep(0.1 - time_since_last)
-
+        start = max(current_time, self.last_request_time + 0.1)  # 100ms minimum between requests
         self.request_count += 1
-        self.last_request_time = time.time()
+        self.last_request_time = start
+        return True, start - current_time
+
+    def _wait_for_slot(self, limit: int):
+        """Block until a request slot is available, sleeping outside rate_lock so other callers aren't held up"""
+        while True:
+            with self.rate_lock:
+                reserved, sleep_time = self._reserve_slot(limit)
+
+            if reserved:
+                if sleep_time > 0:
+                    time.sleep(sleep_time)
+                return
+
+            logger.info(f"Rate limit reached, sleeping for {sleep_time:.2f} seconds")
+            time.sleep(max(sleep_time, 0.1))
 
     def search_songs(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
         """Search for songs on Genius"""
@@ -302,12 +459,13 @@ class RateLimitedGeniusClient:
             logger.error(f"Error getting lyrics: {str(e)}", exc_info=True)
             return None
 
-    def _scrape_lyrics_from_url(self, url: str) -> Optional[str]:
-        """Scrape lyrics directly from a Genius song URL using BeautifulSoup
+    def fetch_song_page(self, url: str) -> Optional[bytes]:
+        """Fetch the HTML of a Genius song page under the rate limiter"""
+        self._wait_if_needed()
+        return self._fetch_song_page(url)
 
-        This is more reliable than lyricsgenius library because we're getting
-        the exact song page, not searching.
-        """
+    def _fetch_song_page(self, url: str) -> Optional[bytes]:
+        """Fetch the HTML of a Genius song page"""
         try:
             # Use session with appropriate headers
             headers = {
@@ -318,117 +476,27 @@ class RateLimitedGeniusClient:
 
             response = requests.get(url, headers=headers, timeout=10)
             response.raise_for_status()
-
-            soup = BeautifulSoup(response.content, 'html.parser')
-
-            # Genius uses data-lyrics-container attribute for lyrics divs
-            lyrics_divs = soup.find_all('div', {'data-lyrics-container': 'true'})
-
-            if not lyrics_divs:
-                logger.warning(f"No lyrics containers found on page: {url}")
-                return None
-
-            # Extract text from all lyrics containers
-            lyrics_parts = []
-            for div in lyrics_divs:
-                # Get text but preserve line breaks
-                text = div.get_text(separator='\n', strip=True)
-                if text:
-                    lyrics_parts.append(text)
-
-            if not lyrics_parts:
-                return None
-
-            lyrics = '\n\n'.join(lyrics_parts)
-
-            # Clean the scraped lyrics
-            lyrics = self._clean_scraped_lyrics(lyrics)
-
-            return lyrics if lyrics else None
+            return response.content
 
         except requests.exceptions.RequestException as e:
             logger.error(f"HTTP error scraping {url}: {e}")
             return None
-        except Exception as e:
-            logger.error(f"Error parsing lyrics from {url}: {e}")
-            return None
-
-    def _clean_scraped_lyrics(self, lyrics: str) -> str:
-        """Clean scraped lyrics to remove Genius metadata and extra content"""
-        if not lyrics:
-            return lyrics
-
-        # Split into lines for processing
-        lines = lyrics.split('\n')
-        cleaned_lines = []
-
-        # Patterns to skip (case insensitive)
-        skip_patterns = [
-            r'^\d+\s*contributors?',  # "184 Contributors"
-            r'^translations?',  # "Translations"
-            r'^(polish|русский|français|türkçe|español|português|italiano|deutsch)',  # Language names
-            r'^\(russian\)',  # Language names in parentheses
-            r'^less i know the better lyrics',  # Song title headers
-            r'^".*" describes',  # Description text like '"The Less I Know the Better" describes'
-            r'^\.\.\.\s*read more',  # "... Read More"
-            r'^read more$',  # "Read More"
-            r'^embed$',  # "Embed"
-            r'^you might also like$',  # "You might also like"
-        ]
-
-        # Track if we've found the start of actual lyrics
-        lyrics_started = False
-        description_section = False
-
-        for line in lines:
-            line_stripped = line.strip()
-            line_lower = line_stripped.lower()
-
-            # Skip empty lines before lyrics start
-            if not lyrics_started and not line_stripped:
-                continue
 
-            # Check if this line should be skipped
-            should_skip = False
-            for pattern in skip_patterns:
-                if re.match(pattern, line_lower):
-                    should_skip = True
-                    break
-
-            if should_skip:
-                continue
-
-            # Detect and skip description sections
-            if '"' in line_stripped and 'describes' in line_lower:
-                description_section = True
-                continue
-
-            # Skip lines that are part of description section
-            if description_section:
-                # End description section when we hit "Read More" or a bracket (song section)
-                if 'read more' in line_lower or line_stripped.startswith('['):
-                    description_section = False
-                    if line_stripped.startswith('['):
-                        # This is a song section, include it
-                        lyrics_started = True
-                        cleaned_lines.append(line)
-                continue
+    def _scrape_lyrics_from_url(self, url: str) -> Optional[str]:
+        """Scrape lyrics directly from a Genius song URL using BeautifulSoup
 
-            # If we see a bracket section header, lyrics have started
-            if line_stripped.startswith('[') and line_stripped.endswith(']'):
-                lyrics_started = True
-                cleaned_lines.append(line)
-                continue
+        This is more reliable than lyricsgenius library because we're getting
+        the exact song page, not searching.
+        """
+        content = self._fetch_song_page(url)
+        if content is None:
+            return None
 
-            # Once lyrics have started, keep all lines
-            if lyrics_started:
-                cleaned_lines.append(line)
-            # If line has substantial content and isn't metadata, assume lyrics started
-            elif len(line_stripped) > 0 and not any(c.isdigit() for c in line_stripped[:10]):
-                lyrics_started = True
-                cleaned_lines.append(line)
+        return parse_lyrics_html(content, url)
 
-        return '\n'.join(cleaned_lines).strip()
+    def _clean_scraped_lyrics(self, lyrics: str) -> str:
+        """Clean scraped lyrics to remove Genius metadata and extra content"""
+        return clean_scraped_lyrics(lyrics)
 
     def _clean_song_title(self, title: str) -> str:
         """Clean song title for better matching"""
@@ -679,11 +747,24 @@ class RateLimitedGeniusClient:
         return None
 
 
+# Shared clients so the rate limit applies across requests and background workers
+_genius_clients: Dict[str, RateLimitedGeniusClient] = {}
+_genius_clients_lock = threading.Lock()
+
 def get_genius_client() -> Optional[RateLimitedGeniusClient]:
-    """Get a configured Genius client"""
+    """Get the shared Genius client for the configured access token"""
     access_token = current_app.config.get('GENIUS_ACCESS_TOKEN')
     if not access_token:
         logger.error("No Genius access token configured")
         return None
 
-    return RateLimitedGeniusClient(access_token)
\ No newline at end of file
+    with _genius_clients_lock:
+        client = _genius_clients.get(access_token)
+        if client is None:
+            client = RateLimitedGeniusClient(
+                access_token,
+                requests_per_minute=current_app.config.get('GENIUS_REQUESTS_PER_MINUTE', 10),
+                base_url=current_app.config.get('GENIUS_API_URL', "https://api.genius.com")
+            )
+            _genius_clients[access_token] = client
+        return client
@@ -0,0 +1,105 @@
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .lyrics_tokens import TokenizedLyrics, lyrics_tokens, vocabulary
+
+logger = logging.getLogger(__name__)
+
+
+class LyricsAnalytics:
+    """Per-song lyric metrics computed in batches and cached per Genius song
+
+    Songs come tokenized, with words as global vocabulary ids and lines as
+    normalized line hashes, so the counting for a whole batch of songs runs
+    as a few NumPy passes over flat integer arrays tagged with their song's
+    position in the batch.
+    """
+
+    def __init__(self, max_entries: int = 5000):
+        self.cache = OrderedDict()  # song_id -> (lyrics hash, metrics)
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+
+    def analyze_batch(self, docs: List[TokenizedLyrics]) -> List[Dict]:
+        """Compute the metrics of many tokenized songs in one pass"""
+        documents = len(docs)
+        word_counts = np.array([len(doc) for doc in docs], dtype=np.int64)
+        line_counts = np.array([doc.line_count for doc in docs], dtype=np.int64)
+        tokens = np.concatenate([np.empty(0, dtype=np.uint32)] + [doc.token_array() for doc in docs])
+        line_hashes = np.concatenate([np.empty(0, dtype=np.uint32)] +
+                                     [np.frombuffer(doc.line_hashes, dtype=np.uint32) for doc in docs])
+        all_sections = [doc.sections() for doc in docs]
+
+        unique_words = self._unique_per_document(tokens, word_counts, len(vocabulary))
+        unique_lines = self._unique_per_document(line_hashes, line_counts, 1 << 32)
+
+        type_token_ratio = np.divide(unique_words, word_counts, out=np.zeros(documents), where=word_counts > 0)
+        words_per_line = np.divide(word_counts, line_counts, out=np.zeros(documents), where=line_counts > 0)
+        # Share of lines that repeat an earlier line of the same song
+        repetition_ratio = np.divide(line_counts - unique_lines, line_counts,
+                                     out=np.zeros(documents), where=line_counts > 0)
+
+        results = []
+        for i, sections in enumerate(all_sections):
+            section_counts = {}
+            for section in sections:
+                section_counts[section['type']] = section_counts.get(section['type'], 0) + 1
+
+            results.append({
+                'word_count': int(word_counts[i]),
+                'unique_words': int(unique_words[i]),
+                'type_token_ratio': round(float(type_token_ratio[i]), 3),
+                'line_count': int(line_counts[i]),
+                'words_per_line': round(float(words_per_line[i]), 2),
+                'repetition_ratio': round(float(repetition_ratio[i]), 3),
+                'sections': sections,
+                'section_counts': section_counts
+            })
+        return results
+
+    @staticmethod
+    def _unique_per_document(ids: np.ndarray, counts: np.ndarray, vocabulary_size: int) -> np.ndarray:
+        """Number of distinct ids in each document's run of a flat id array"""
+        documents = np.repeat(np.arange(len(counts), dtype=np.int64), counts)
+        keys = np.unique(documents * max(vocabulary_size, 1) + ids.astype(np.int64))
+        return np.bincount(keys // max(vocabulary_size, 1), minlength=len(counts))
+
+    def get(self, song_id: int, lyrics: Optional[str]) -> Optional[Dict]:
+        """Metrics of one song's lyrics, computed on a cache miss"""
+        if not lyrics:
+            return None
+        return self.get_many({song_id: lyrics})[song_id]
+
+    def get_many(self, songs: Dict[int, str]) -> Dict[int, Dict]:
+        """Metrics of many songs (song_id -> lyrics), computing all misses in one batch"""
+        results, missing = {}, {}
+        with self.lock:
+            for song_id, lyrics in songs.items():
+                cached = self.cache.get(song_id)
+                # Lyrics of a song can change, e.g. when a scrape replaces annotation fragments
+                if cached and cached[0] == hash(lyrics):
+                    self.cache.move_to_end(song_id)
+                    results[song_id] = cached[1]
+                else:
+                    missing[song_id] = lyrics
+
+        if missing:
+            computed = self.analyze_batch([lyrics_tokens.get(song_id, lyrics) or TokenizedLyrics()
+                                           for song_id, lyrics in missing.items()])
+            with self.lock:
+                for (song_id, lyrics), metrics in zip(missing.items(), computed):
+                    self.cache[song_id] = (hash(lyrics), metrics)
+                    self.cache.move_to_end(song_id)
+                    results[song_id] = metrics
+                while len(self.cache) > self.max_entries:
+                    self.cache.popitem(last=False)
+
+        return results
+
+
+# Global analytics instance
+lyrics_analytics = LyricsAnalytics()
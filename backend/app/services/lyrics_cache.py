@@ -0,0 +1,391 @@
+import os
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Optional, Dict, Any, List, Callable, Tuple
+
+from .lyrics_store import lyrics_store
+from .lyrics_tokens import WORD_PATTERN, TokenizedLyrics, line_hash, lyrics_tokens, tokenize
+from .lyrics_search import lyrics_search
+from .lyrics_similarity import lyrics_similarity
+from .lyrics_themes import lyrics_themes
+
+logger = logging.getLogger(__name__)
+
+# Default location of the catalog written by ingest.py
+DEFAULT_CATALOG_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'data', 'lyrics_catalog.ndjson'
+)
+
+
+def extract_lyrics_from_annotations(annotations: List[Dict[str, Any]]) -> Optional[str]:
+    """Extract lyrics from annotation fragments as a fallback when full lyrics aren't available"""
+    if not annotations:
+        return None
+
+    # Collect all unique fragments
+    fragments = []
+    seen = set()
+
+    for annotation in annotations:
+        fragment = annotation.get('fragment', '').strip()
+        if fragment and fragment not in seen:
+            fragments.append(fragment)
+            seen.add(fragment)
+
+    if not fragments:
+        return None
+
+    # Join fragments with newlines
+    return '\n'.join(fragments)
+
+def calculate_line_numbers(annotations: List[Dict[str, Any]], lyrics: str,
+                           tokens: Optional[TokenizedLyrics] = None) -> List[Dict[str, Any]]:
+    """Calculate which line number each annotation corresponds to in the lyrics"""
+    if not lyrics or not annotations:
+        return annotations
+
+    # Split lyrics into lines for line-by-line matching
+    lyrics_lines = [line.strip() for line in lyrics.split('\n') if line.strip()]
+    lyrics_lines_lower = [line.lower() for line in lyrics_lines]
+
+    # Normalized lines are already hashed in the tokens, so exact matches are a dict lookup
+    tokens = tokens or tokenize(lyrics)
+    lines_by_hash = {}
+    for number, hashed in zip(tokens.line_numbers, tokens.line_hashes):
+        lines_by_hash.setdefault(hashed, []).append(number)
+
+    logger.info(f"Calculating line numbers for {len(annotations)} annotations against {len(lyrics_lines)} lyric lines")
+
+    for annotation in annotations:
+        line_number = -1
+
+        # Get the annotation text to match (prefer range.content over fragment)
+        annotation_text = None
+        if 'range' in annotation and annotation['range'] and 'content' in annotation['range']:
+            annotation_text = annotation['range']['content'].strip()
+        elif annotation.get('fragment'):
+            annotation_text = annotation['fragment'].strip()
+
+        if not annotation_text:
+            annotation['lyrics_line_number'] = -1
+            annotation['line_match_method'] = 'no_text'
+            continue
+
+        # Normalize for matching
+        annotation_text_lower = annotation_text.lower().strip()
+
+        # Strategy 1: Find exact line match. Lines with the same words hash alike,
+        # the text comparison confirms the match
+        annotation_words = WORD_PATTERN.findall(annotation_text_lower)
+        if annotation_words:
+            for number in lines_by_hash.get(line_hash(annotation_words), ()):
+                if lyrics_lines_lower[number - 1] == annotation_text_lower:
+                    line_number = number
+                    break
+
+        # Strategy 2: Find line that contains the annotation text
+        if line_number == -1:
+            for i, line in enumerate(lyrics_lines_lower):
+                if annotation_text_lower in line and len(annotation_text_lower) > 5:
+                    line_number = i + 1
+                    break
+
+        # Strategy 3: Find line where annotation text contains the line (for longer annotations)
+        if line_number == -1:
+            for i, line in enumerate(lyrics_lines_lower):
+                if line in annotation_text_lower and len(line) > 5:
+                    line_number = i + 1
+                    break
+
+        annotation['lyrics_line_number'] = line_number
+        annotation['line_match_method'] = 'matched' if line_number != -1 else 'failed'
+
+        if line_number != -1:
+            logger.debug(f"Matched annotation to line {line_number}: '{annotation_text[:50]}...'")
+
+    return annotations
+
+
+class LyricsCacheService:
+    """In-memory cache of Genius matches and lyrics bundles
+
+    A bundle is everything the lyrics endpoints need for one Genius song:
+    song details, scraped lyrics and annotations with line numbers. Bundles
+    are shared by request handlers and background warmers, and concurrent
+    loads of the same key are collapsed into a single Genius round-trip.
+    """
+
+    def __init__(self, max_bundles: int = 500, max_matches: int = 5000):
+        self.bundles = OrderedDict()
+        self.matches = OrderedDict()
+        self.max_bundles = max_bundles
+        self.max_matches = max_matches
+        self.bundle_duration = 6 * 60 * 60  # Lyrics rarely change, keep for 6 hours
+        self.match_duration = 24 * 60 * 60
+        self.miss_duration = 10 * 60  # Retry failed matches after 10 minutes
+        self.inflight = {}
+        self.lock = threading.Lock()
+
+        # Read-only tier loaded from an offline catalog (see ingest.py), never evicted
+        self.catalog_matches = {}
+        self.catalog_bundles = {}
+
+    @staticmethod
+    def _get_match_key(artist: str, title: str) -> Tuple[str, str]:
+        """Generate cache key for a Spotify artist/title pair"""
+        return (' '.join(artist.lower().split()), ' '.join(title.lower().split()))
+
+    def _get_entry(self, store: OrderedDict, key) -> Optional[Dict]:
+        """Get a valid entry from one of the LRU stores (caller holds lock)"""
+        entry = store.get(key)
+        if not entry:
+            return None
+
+        if time.time() > entry['expires_at']:
+            del store[key]
+            return None
+
+        store.move_to_end(key)
+        return entry
+
+    def _put_entry(self, store: OrderedDict, key, data: Any, duration: float, max_entries: int):
+        """Store an entry and evict least recently used ones (caller holds lock)"""
+        store[key] = {
+            'data': data,
+            'expires_at': time.time() + duration
+        }
+        store.move_to_end(key)
+
+        while len(store) > max_entries:
+            store.popitem(last=False)
+
+    def _single_flight(self, key, loader: Callable[[], Any]) -> Any:
+        """Run loader once per key, letting concurrent callers wait for the same result"""
+        with self.lock:
+            future = self.inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self.inflight[key] = future
+
+        if not owner:
+            return future.result()
+
+        try:
+            result = loader()
+            future.set_result(result)
+            return result
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self.lock:
+                self.inflight.pop(key, None)
+
+    def load_catalog(self, path: str) -> int:
+        """
+        Load matches and bundles from an NDJSON catalog written by ingest.py
+
+        Later records win, so a catalog appended to by resumed runs loads fine.
+        Returns the number of records loaded.
+        """
+        if not os.path.exists(path):
+            return 0
+
+        loaded = 0
+        with open(path, 'r', encoding='utf-8') as f:
+            for line_number, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # A killed ingest run can leave a partial last line
+                    logger.warning(f"Skipping malformed catalog line {line_number} in {path}")
+                    continue
+
+                # Misses are not loaded so live requests can still try Genius
+                if record.get('genius_match'):
+                    key = self._get_match_key(record.get('artist') or '', record.get('title') or '')
+                    self.catalog_matches[key] = record['genius_match']
+
+                # Catalog bundles are never evicted, so one without lyrics (e.g. the
+                # page fetch was rate limited) would hide the song from live requests
+                bundle = record.get('bundle')
+                if bundle and bundle.get('lyrics'):
+                    self.catalog_bundles[bundle['genius_id']] = bundle
+                loaded += 1
+
+        self._index_bundles(self.catalog_bundles)
+
+        logger.info(f"Loaded {loaded} catalog records ({len(self.catalog_bundles)} bundles) from {path}")
+        return loaded
+
+    @staticmethod
+    def _index_bundles(bundles: Dict[int, Dict[str, Any]]):
+        """Add bundles' lyrics to the local full-text, similarity and theme indexes"""
+        songs = []
+        for song_id, bundle in bundles.items():
+            details = bundle.get('song_details') or {}
+            songs.append((song_id, bundle.get('lyrics'), details.get('title'), details.get('artist')))
+
+        for song in songs:
+            lyrics_search.add(*song)
+            lyrics_themes.add(song[0], song[1])
+        # Signatures are computed in one batch
+        lyrics_similarity.add_many(songs)
+
+    def get_cached_lyrics(self, song_id: int) -> Optional[str]:
+        """Lyrics of a Genius song from the caches or the lyrics store, without calling Genius"""
+        bundle = self.catalog_bundles.get(song_id)
+        if bundle is None:
+            with self.lock:
+                entry = self.bundles.get(song_id)
+            bundle = entry['data'] if entry else None
+
+        if bundle and bundle.get('lyrics'):
+            return bundle['lyrics']
+        return lyrics_store.get(song_id)
+
+    def has_bundle(self, song_id: int) -> bool:
+        """Check whether a bundle for the Genius song is cached"""
+        if song_id in self.catalog_bundles:
+            return True
+
+        with self.lock:
+            return self._get_entry(self.bundles, song_id) is not None
+
+    def get_cached_match(self, artist: str, title: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        """
+        Look up a cached Genius match without calling Genius
+        Returns (found, match) where match may be None for a cached miss
+        """
+        key = self._get_match_key(artist, title)
+        if key in self.catalog_matches:
+            return True, self.catalog_matches[key]
+
+        with self.lock:
+            entry = self._get_entry(self.matches, key)
+            if entry is None:
+                return False, None
+            return True, entry['data']
+
+    def find_match(self, genius_client, spotify_track: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Find the Genius match for a Spotify track, using the cache when possible"""
+        artist = (spotify_track.get('artists') or [''])[0]
+        title = spotify_track.get('name', '')
+        key = self._get_match_key(artist, title)
+
+        found, match = self.get_cached_match(artist, title)
+        if found:
+            logger.debug(f"Match cache hit for {key}")
+            return match
+
+        def load():
+            match = genius_client.find_best_match(spotify_track)
+            with self.lock:
+                duration = self.match_duration if match else self.miss_duration
+                self._put_entry(self.matches, key, match, duration, self.max_matches)
+            return match
+
+        return self._single_flight(('match',) + key, load)
+
+    def get_bundle(self, genius_client, song_id: int, artist: Optional[str] = None,
+                   title: Optional[str] = None, song_url: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Get the lyrics bundle for a Genius song, fetching it on a cache miss
+
+        Returns a dict with song_details, lyrics and annotations, or None if
+        neither details nor lyrics could be retrieved.
+        """
+        if song_id in self.catalog_bundles:
+            return self.catalog_bundles[song_id]
+
+        with self.lock:
+            entry = self._get_entry(self.bundles, song_id)
+        if entry is not None:
+            logger.debug(f"Bundle cache hit for Genius song {song_id}")
+            return entry['data']
+
+        def load():
+            bundle = self._load_bundle(genius_client, song_id, artist, title, song_url)
+            if bundle is not None:
+                self.put_bundle(song_id, bundle)
+            return bundle
+
+        return self._single_flight(('bundle', song_id), load)
+
+    def put_bundle(self, song_id: int, bundle: Dict[str, Any]):
+        """Store a lyrics bundle"""
+        with self.lock:
+            self._put_entry(self.bundles, song_id, bundle, self.bundle_duration, self.max_bundles)
+        self._index_bundles({song_id: bundle})
+
+    def _load_bundle(self, genius_client, song_id: int, artist: Optional[str],
+                     title: Optional[str], song_url: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Fetch song details, lyrics and annotations from Genius"""
+        song_details = genius_client.get_song_details(song_id)
+
+        artist = artist or (song_details or {}).get('artist')
+        title = title or (song_details or {}).get('title')
+        song_url = song_url or (song_details or {}).get('url')
+
+        if not song_details and not (artist and title):
+            return None
+
+        # Scraped lyrics are kept in the shared on-disk store, so a song is scraped once
+        lyrics = lyrics_store.get(song_id)
+        if not lyrics:
+            # Get lyrics using LyricsGenius scraping - pass the matched song URL for reliability
+            lyrics = genius_client.get_lyrics_with_lyricsgenius(artist, title, song_url=song_url)
+            if lyrics:
+                lyrics_store.put(song_id, lyrics)
+        annotations = genius_client.get_song_annotations(song_id)
+
+        # Fallback: if lyrics failed but we have annotations, extract from fragments
+        if not lyrics and annotations:
+            logger.info("Full lyrics not available, extracting from annotation fragments")
+            lyrics = extract_lyrics_from_annotations(annotations)
+            if lyrics:
+                logger.info(f"Extracted {len(lyrics)} characters from {len(annotations)} annotations")
+
+        # Tokenize once here; the tokens are stored and shared by every lyrics feature
+        tokens = lyrics_tokens.get(song_id, lyrics)
+
+        # Calculate line numbers for annotations
+        if lyrics and annotations:
+            annotations = calculate_line_numbers(annotations, lyrics, tokens)
+
+        if not song_details and not lyrics:
+            # Nothing useful came back, most likely a transient Genius failure
+            return None
+
+        return {
+            'genius_id': song_id,
+            'song_details': song_details,
+            'lyrics': lyrics,
+            'annotations': annotations
+        }
+
+    def warm(self, genius_client, spotify_track: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Resolve the Genius match for a Spotify track and load its lyrics bundle"""
+        match = self.find_match(genius_client, spotify_track)
+        if not match:
+            return None
+
+        artists = spotify_track.get('artists') or [None]
+        return self.get_bundle(
+            genius_client,
+            match['id'],
+            artists[0],
+            spotify_track.get('name'),
+            song_url=match.get('url')
+        )
+
+# Global lyrics cache instance
+lyrics_cache = LyricsCacheService()
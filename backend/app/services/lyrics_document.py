@@ -0,0 +1,100 @@
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from .lyrics_tokens import TokenizedLyrics, lyrics_tokens, section_type
+
+logger = logging.getLogger(__name__)
+
+# Annotation fields kept in the document; the range duplicates the line text
+# and the line number is implied by the line that lists the annotation
+ANNOTATION_FIELDS = ('body', 'fragment', 'url', 'verified', 'votes_total', 'authors', 'cosigned_by')
+
+
+def build_document(lyrics: Optional[str], annotations: List[Dict[str, Any]],
+                   tokens: Optional[TokenizedLyrics]) -> Dict:
+    """
+    Structured form of a bundle's lyrics and annotations
+
+    lines are the lyric lines with their line number, text and the ids of
+    the annotations matched to them. Sections point into lines by index,
+    lines before the first header belong to no section. Each annotation's
+    body and metadata appear once in the annotations map, keyed by id.
+    Annotations matched to no lyric line, or to a section header, are
+    listed in unplaced_annotation_ids.
+    """
+    tokens = tokens or TokenizedLyrics()
+    texts = [line.strip() for line in (lyrics or '').split('\n') if line.strip()]
+    lines = [{
+        'number': number,
+        'text': texts[number - 1],
+        'annotation_ids': []
+    } for number in tokens.line_numbers]
+    line_index = {number: i for i, number in enumerate(tokens.line_numbers)}
+
+    bodies, unplaced = {}, []
+    for annotation in annotations or []:
+        annotation_id = annotation.get('id')
+        if annotation_id is None:
+            continue
+        if annotation_id not in bodies:
+            bodies[annotation_id] = {field: annotation.get(field) for field in ANNOTATION_FIELDS}
+
+        index = line_index.get(annotation.get('lyrics_line_number', -1))
+        target = lines[index]['annotation_ids'] if index is not None else unplaced
+        if annotation_id not in target:
+            target.append(annotation_id)
+
+    # A placed annotation isn't also unplaced when another referent of it matched nothing
+    placed = {annotation_id for line in lines for annotation_id in line['annotation_ids']}
+    ends = list(tokens.section_starts[1:]) + [tokens.line_count]
+    return {
+        'lines': lines,
+        'sections': [{
+            'type': section_type(label),
+            'label': label,
+            'header_line': header_line,
+            'first_line': start,
+            'line_count': end - start
+        } for label, header_line, start, end in zip(tokens.section_labels, tokens.section_lines,
+                                                    tokens.section_starts, ends)],
+        'annotations': bodies,
+        'unplaced_annotation_ids': [annotation_id for annotation_id in unplaced if annotation_id not in placed]
+    }
+
+
+class LyricsDocuments:
+    """
+    Structured lyrics documents, built once per bundle and cached per Genius song
+
+    A document is rebuilt only when the bundle's lyrics or its annotations'
+    line matches change, e.g. after a scrape replaces fragment lyrics.
+    """
+
+    def __init__(self, max_entries: int = 1000):
+        self.cache = OrderedDict()  # song_id -> (bundle key, document)
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+
+    def get(self, song_id: int, lyrics: Optional[str], annotations: List[Dict[str, Any]]) -> Dict:
+        """Structured document of a song's lyrics and annotations, built on a cache miss"""
+        key = hash((lyrics, tuple((annotation.get('id'), annotation.get('lyrics_line_number'))
+                                  for annotation in annotations or [])))
+        with self.lock:
+            cached = self.cache.get(song_id)
+            if cached and cached[0] == key:
+                self.cache.move_to_end(song_id)
+                return cached[1]
+
+        document = build_document(lyrics, annotations, lyrics_tokens.get(song_id, lyrics))
+        with self.lock:
+            self.cache[song_id] = (key, document)
+            self.cache.move_to_end(song_id)
+            while len(self.cache) > self.max_entries:
+                self.cache.popitem(last=False)
+        return document
+
+
+# Global structured documents instance
+lyrics_documents = LyricsDocuments()
@@ -0,0 +1,141 @@
+import bisect
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+import numpy as np
+from scipy import sparse
+
+from .lyrics_timing import LineTimingIndex
+from .lyrics_tokens import TokenTable, TokenizedLyrics, lyrics_tokens
+from .mood_lexicon import VALENCE
+
+logger = logging.getLogger(__name__)
+
+LEXICON_INDEX = {word: i for i, word in enumerate(VALENCE)}
+LEXICON_WEIGHTS = np.array(list(VALENCE.values()), dtype=np.float32) / 3.0
+# Lexicon column of every vocabulary word, -1 for words not in the lexicon
+LEXICON_COLUMNS = TokenTable(lambda word: LEXICON_INDEX.get(word, -1), np.int64)
+
+# Lines on each side averaged into a line's smoothed mood
+SMOOTHING_WINDOW = 2
+POSITIVE_THRESHOLD = 0.12
+NEGATIVE_THRESHOLD = -0.12
+
+
+def mood_label(valence: float) -> str:
+    """Coarse mood of a valence score"""
+    if valence >= POSITIVE_THRESHOLD:
+        return 'positive'
+    if valence <= NEGATIVE_THRESHOLD:
+        return 'negative'
+    return 'neutral'
+
+def score_lines(doc: Optional[TokenizedLyrics]) -> Optional[Dict]:
+    """
+    Per-line valence of a tokenized song from the bundled lexicon
+
+    Builds a sparse line x lexicon count matrix and multiplies it by the
+    lexicon weights. A line's valence is its weight sum over the square root
+    of its word count, clipped to [-1, 1], so short lines with one strong
+    word don't dominate.
+    """
+    if not doc:
+        return None
+
+    line_numbers, rows = np.unique(doc.word_lines(), return_inverse=True)
+    columns = LEXICON_COLUMNS[doc.token_array()]
+    known = columns >= 0
+
+    counts = sparse.csr_matrix(
+        (np.ones(int(known.sum()), dtype=np.float32), (rows[known], columns[known])),
+        shape=(len(line_numbers), len(LEXICON_INDEX))
+    )
+    line_words = np.bincount(rows, minlength=len(line_numbers))
+    valence = np.clip((counts @ LEXICON_WEIGHTS) / np.sqrt(line_words), -1.0, 1.0)
+
+    # Mood changes over a few lines, not line by line. mode='same' returns
+    # max(len, kernel) values, so take the centered slice of the full convolution
+    kernel = np.ones(2 * SMOOTHING_WINDOW + 1)
+    centered = slice(SMOOTHING_WINDOW, SMOOTHING_WINDOW + len(valence))
+    smoothed = (np.convolve(valence, kernel, mode='full')[centered] /
+                np.convolve(np.ones(len(valence)), kernel, mode='full')[centered])
+
+    return {
+        'lines': line_numbers.tolist(),
+        'valence': np.round(valence, 3).tolist(),
+        'smoothed': np.round(smoothed, 3).tolist(),
+        'overall': round(float(np.average(valence, weights=line_words)), 3)
+    }
+
+
+class LyricsMood:
+    """Mood timelines of songs, scored once per Genius song and cached"""
+
+    def __init__(self, max_entries: int = 5000):
+        self.cache = OrderedDict()  # song_id -> (lyrics hash, scores)
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+
+    def _get_scores(self, song_id: int, lyrics: Optional[str] = None) -> Optional[Dict]:
+        """Cached scores of a song, scoring the lyrics (when given) on a miss"""
+        with self.lock:
+            cached = self.cache.get(song_id)
+            if cached and (lyrics is None or cached[0] == hash(lyrics)):
+                self.cache.move_to_end(song_id)
+                return cached[1]
+        if not lyrics:
+            return None
+
+        scores = score_lines(lyrics_tokens.get(song_id, lyrics))
+        with self.lock:
+            self.cache[song_id] = (hash(lyrics), scores)
+            self.cache.move_to_end(song_id)
+            while len(self.cache) > self.max_entries:
+                self.cache.popitem(last=False)
+        return scores
+
+    def timeline(self, song_id: int, lyrics: Optional[str],
+                 timing: Optional[LineTimingIndex] = None) -> Optional[Dict]:
+        """Per-line mood of a song, with each line's start time from the song's line timing index"""
+        scores = self._get_scores(song_id, lyrics)
+        if scores is None:
+            return None
+
+        starts_ms = dict(zip(timing.lines, timing.starts_ms)) if timing else {}
+        lines = []
+        for line, valence, smoothed in zip(scores['lines'], scores['valence'], scores['smoothed']):
+            entry = {'line': line, 'valence': valence, 'smoothed_valence': smoothed, 'mood': mood_label(smoothed)}
+            if line in starts_ms:
+                entry['start_ms'] = starts_ms[line]
+            lines.append(entry)
+
+        return {
+            'overall_valence': scores['overall'],
+            'overall_mood': mood_label(scores['overall']),
+            'lines': lines
+        }
+
+    def mood_at(self, song_id: int, line: Optional[int]) -> Optional[Dict]:
+        """
+        Mood at a lyric line, e.g. the line timing index's current line,
+        from an already scored song (binary search only)
+
+        Lines without scored words, like section headers, take the mood of
+        the last scored line before them, or of the first one at the top.
+        """
+        scores = self._get_scores(song_id)
+        if scores is None or line is None:
+            return None
+
+        i = max(bisect.bisect_right(scores['lines'], line) - 1, 0)
+        return {
+            'line': scores['lines'][i],
+            'valence': scores['smoothed'][i],
+            'mood': mood_label(scores['smoothed'][i])
+        }
+
+
+# Global mood instance
+lyrics_mood = LyricsMood()
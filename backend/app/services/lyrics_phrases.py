@@ -0,0 +1,193 @@
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .lyrics_tokens import TokenizedLyrics, lyrics_tokens
+
+logger = logging.getLogger(__name__)
+
+# Shorter repeats are mostly filler ("oh, oh, oh")
+MIN_PHRASE_WORDS = 4
+MAX_PHRASES = 8
+
+
+def suffix_array(tokens: np.ndarray) -> Tuple[np.ndarray, List[np.ndarray]]:
+    """
+    Suffix array of a token id sequence by prefix doubling, O(n log n) per round
+
+    Also returns the rank arrays of every round: ranks[j][i] orders the
+    2**j tokens starting at i, which lets lcp_array compare suffixes in
+    O(log n) without a sequential scan.
+    """
+    n = len(tokens)
+    rank = np.unique(tokens, return_inverse=True)[1].astype(np.int64).ravel()
+    ranks = [rank]
+
+    length = 1
+    while length < n and rank.max() < n - 1:
+        second = np.full(n, -1, dtype=np.int64)
+        second[:n - length] = rank[length:]
+        order = np.lexsort((second, rank))
+
+        first_sorted, second_sorted = rank[order], second[order]
+        boundaries = (first_sorted[1:] != first_sorted[:-1]) | (second_sorted[1:] != second_sorted[:-1])
+        rank = np.empty(n, dtype=np.int64)
+        rank[order] = np.concatenate(([0], np.cumsum(boundaries)))
+        ranks.append(rank)
+        length *= 2
+
+    return np.argsort(rank, kind='stable'), ranks
+
+def lcp_array(sa: np.ndarray, ranks: List[np.ndarray]) -> np.ndarray:
+    """lcp[i] = common prefix length of suffixes sa[i - 1] and sa[i] (lcp[0] = 0)"""
+    n = len(sa)
+    lcp = np.zeros(n, dtype=np.int64)
+    if n < 2:
+        return lcp
+
+    a, b = sa[:-1].copy(), sa[1:].copy()
+    common = np.zeros(n - 1, dtype=np.int64)
+    # Binary lifting: try to extend every pair by 2**j, largest step first
+    for j in range(len(ranks) - 1, -1, -1):
+        step = 1 << j
+        pa, pb = a + common, b + common
+        valid = (pa < n) & (pb < n)
+        same = np.zeros(n - 1, dtype=bool)
+        same[valid] = ranks[j][pa[valid]] == ranks[j][pb[valid]]
+        common[same] += step
+
+    lcp[1:] = common
+    return lcp
+
+def maximal_repeats(tokens: np.ndarray, min_length: int) -> List[Tuple[int, np.ndarray]]:
+    """
+    Maximal repeated token spans as (length, sorted start positions)
+
+    Each lcp interval of the suffix array is a repeat that can't be extended
+    to the right; it's kept if it also can't be extended to the left (the
+    occurrences aren't all preceded by the same token).
+    """
+    n = len(tokens)
+    if n < 2:
+        return []
+
+    sa, ranks = suffix_array(tokens)
+    lcp = lcp_array(sa, ranks).tolist()
+
+    repeats = []
+    stack = [(0, 0)]  # (lcp value, left boundary of the interval)
+    for i in range(1, n + 1):
+        current = lcp[i] if i < n else 0
+        left = i - 1
+        while current < stack[-1][0]:
+            length, left = stack.pop()
+            if length >= min_length:
+                starts = sa[left:i]
+                previous = tokens[starts[starts > 0] - 1]
+                if (starts == 0).any() or len(np.unique(previous)) > 1:
+                    repeats.append((length, np.sort(starts)))
+        if current > stack[-1][0]:
+            stack.append((current, left))
+
+    return repeats
+
+def _non_overlapping(starts: np.ndarray, length: int) -> List[int]:
+    """Greedy left-to-right subset of occurrences that don't overlap"""
+    kept = []
+    for start in starts.tolist():
+        if not kept or start >= kept[-1] + length:
+            kept.append(start)
+    return kept
+
+def find_repeated_phrases(doc: TokenizedLyrics, min_words: int = MIN_PHRASE_WORDS,
+                          max_phrases: int = MAX_PHRASES) -> List[Dict]:
+    """
+    Repeated phrases of a tokenized song, most prominent first
+
+    Phrases are ranked by how many words their repeats cover. A phrase that
+    mostly lies inside a higher-ranked one is dropped unless it repeats more
+    often, like a hook line sung several times per chorus. Repeats don't
+    cross section headers. A phrase spanning several lines is marked as a
+    chorus, a shorter one as a hook. Line numbers match the annotations'
+    lyrics_line_number.
+    """
+    if len(doc) < 2 * min_words:
+        return []
+
+    tokens = doc.token_array().astype(np.int64)
+    word_lines = doc.word_lines()
+
+    # A unique separator at each section header keeps repeats inside sections
+    header_lines = np.frombuffer(doc.section_lines, dtype=np.uint32).astype(np.int64)
+    separators = np.searchsorted(word_lines, header_lines)
+    separators = separators[(separators > 0) & (separators < len(tokens))]
+    sequence = np.insert(tokens, separators, -1 - np.arange(len(separators)))
+    word_index = np.insert(np.arange(len(tokens)), separators, -1)
+
+    candidates = []
+    for length, starts in maximal_repeats(sequence, min_words):
+        occurrences = _non_overlapping(word_index[starts], length)
+        if len(occurrences) > 1:
+            candidates.append((length * (len(occurrences) - 1), length, occurrences))
+    candidates.sort(key=lambda candidate: (-candidate[0], candidate[2][0]))
+
+    # Highest repeat count of an accepted phrase covering each word
+    covered = np.zeros(len(tokens), dtype=np.int64)
+    phrases = []
+    for _, length, occurrences in candidates:
+        spans = np.concatenate([np.arange(start, start + length) for start in occurrences])
+        # Part of a bigger phrase, unless it repeats more often (a hook inside the chorus)
+        if (covered[spans] > 0).mean() >= 0.5 and len(occurrences) <= covered[spans].max():
+            continue
+        covered[spans] = np.maximum(covered[spans], len(occurrences))
+
+        ranges = [
+            {'start_line': int(word_lines[start]), 'end_line': int(word_lines[start + length - 1])}
+            for start in occurrences
+        ]
+        phrases.append({
+            'text': ' '.join(doc.words(occurrences[0], occurrences[0] + length)),
+            'kind': 'chorus' if ranges[0]['end_line'] > ranges[0]['start_line'] else 'hook',
+            'word_count': length,
+            'count': len(occurrences),
+            'occurrences': ranges
+        })
+        if len(phrases) == max_phrases:
+            break
+
+    return phrases
+
+
+class RepeatedPhrases:
+    """Repeated phrases of songs, cached per Genius song"""
+
+    def __init__(self, max_entries: int = 5000):
+        self.cache = OrderedDict()  # song_id -> (lyrics hash, phrases)
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+
+    def get(self, song_id: int, lyrics: Optional[str]) -> Optional[List[Dict]]:
+        """Repeated phrases of one song's lyrics, computed on a cache miss"""
+        if not lyrics:
+            return None
+
+        with self.lock:
+            cached = self.cache.get(song_id)
+            if cached and cached[0] == hash(lyrics):
+                self.cache.move_to_end(song_id)
+                return cached[1]
+
+        phrases = find_repeated_phrases(lyrics_tokens.get(song_id, lyrics))
+        with self.lock:
+            self.cache[song_id] = (hash(lyrics), phrases)
+            self.cache.move_to_end(song_id)
+            while len(self.cache) > self.max_entries:
+                self.cache.popitem(last=False)
+        return phrases
+
+
+# Global repeated phrases instance
+repeated_phrases = RepeatedPhrases()
@@ -0,0 +1,195 @@
+import itertools
+import logging
+import queue
+import threading
+from typing import Optional, Dict, Any
+
+import spotipy
+
+from .lyrics_cache import lyrics_cache
+from .genius_client import get_genius_client
+
+logger = logging.getLogger(__name__)
+
+# Lower numbers run first
+PRIORITY_UP_NEXT = 10
+PRIORITY_WARMUP = 20
+
+
+class LyricsPrefetcher:
+    """Low-priority background worker that loads lyrics bundles ahead of time
+
+    Jobs are Spotify tracks; each one resolves the Genius match and loads the
+    lyrics bundle into the lyrics cache. Genius calls run at background
+    priority, so they only use part of the shared rate budget and never hold
+    up interactive requests.
+    """
+
+    def __init__(self, max_pending: int = 500):
+        self.app = None
+        self.jobs = queue.PriorityQueue(maxsize=max_pending)
+        self.pending = set()
+        self.lock = threading.Lock()
+        self.counter = itertools.count()
+        self.thread = None
+        self.depth = 3
+        self.warmup_tracks = 30
+        self.warmup_lyrics = 5
+
+    def init_app(self, app):
+        """Bind the prefetcher to a Flask app"""
+        self.app = app
+        self.depth = app.config.get('LYRICS_PREFETCH_DEPTH', 3)
+        self.warmup_tracks = app.config.get('CACHE_WARMUP_TRACKS', 30)
+        self.warmup_lyrics = app.config.get('CACHE_WARMUP_LYRICS', 5)
+
+    @staticmethod
+    def _get_job_key(track: Dict[str, Any], match_only: bool):
+        """Dedup key for a track job"""
+        return (track.get('id') or (tuple(track.get('artists') or []), track.get('name')), match_only)
+
+    def enqueue(self, track: Dict[str, Any], priority: int = PRIORITY_UP_NEXT, match_only: bool = False) -> bool:
+        """
+        Queue a Spotify track (name, artists, album) for prefetch
+
+        With match_only the job only resolves the Genius match; otherwise the
+        full lyrics bundle is loaded as well.
+        """
+        if self.app is None or not track.get('name') or not track.get('artists'):
+            return False
+
+        # Nothing to do if the match is already known and its bundle is cached
+        found, match = lyrics_cache.get_cached_match(track['artists'][0], track['name'])
+        if found and (match_only or match is None or lyrics_cache.has_bundle(match['id'])):
+            return False
+
+        key = self._get_job_key(track, match_only)
+        with self.lock:
+            if key in self.pending:
+                return False
+            try:
+                self.jobs.put_nowait((priority, next(self.counter), key, track))
+            except queue.Full:
+                logger.debug(f"Prefetch queue full, dropping '{track['name']}'")
+                return False
+            self.pending.add(key)
+            self._ensure_started()
+
+        return True
+
+    def enqueue_up_next(self, queue_response: Optional[Dict[str, Any]], depth: Optional[int] = None) -> int:
+        """Queue the next tracks from a spotipy queue() response, returns how many were queued"""
+        if not queue_response:
+            return 0
+
+        depth = self.depth if depth is None else depth
+        queued = 0
+        seen = set()
+
+        for item in (queue_response.get('queue') or []):
+            if len(seen) >= depth:
+                break
+            # The queue can contain podcast episodes, which have no lyrics
+            if not item or item.get('type', 'track') != 'track' or item.get('id') in seen:
+                continue
+            seen.add(item.get('id'))
+
+            if self.enqueue(spotify_item_to_track(item), PRIORITY_UP_NEXT):
+                queued += 1
+
+        return queued
+
+    def schedule_login_warmup(self, token_info: Dict[str, Any]):
+        """Warm the caches from a newly authenticated user's library without blocking the caller"""
+        if self.app is None or not token_info or not self.app.config.get('CACHE_WARMUP_ON_LOGIN'):
+            return
+
+        thread = threading.Thread(
+            target=self._warm_user_library,
+            args=(token_info['access_token'],),
+            name='login-warmup',
+            daemon=True
+        )
+        thread.start()
+
+    def _warm_user_library(self, access_token: str):
+        """
+        Queue warm-up jobs from the user's top and recently played tracks
+
+        At most CACHE_WARMUP_TRACKS tracks are warmed, top tracks first. Lyrics
+        bundles are loaded for the first CACHE_WARMUP_LYRICS of them; the
+        remaining tracks only get their Genius match resolved.
+        """
+        try:
+            sp = spotipy.Spotify(auth=access_token)
+            top_items = (sp.current_user_top_tracks(limit=50, time_range='short_term') or {}).get('items', [])
+            recent_items = [
+                entry.get('track') for entry in
+                (sp.current_user_recently_played(limit=50) or {}).get('items', [])
+            ]
+        except Exception as e:
+            logger.warning(f"Could not read library for cache warm-up: {e}")
+            return
+
+        tracks = []
+        seen = set()
+        for item in top_items + recent_items:
+            if not item or item.get('id') in seen:
+                continue
+            seen.add(item.get('id'))
+            tracks.append(spotify_item_to_track(item))
+            if len(tracks) >= self.warmup_tracks:
+                break
+
+        lyrics_queued = 0
+        matches_queued = 0
+        for i, track in enumerate(tracks):
+            if i < self.warmup_lyrics:
+                lyrics_queued += self.enqueue(track, PRIORITY_WARMUP)
+            else:
+                matches_queued += self.enqueue(track, PRIORITY_WARMUP, match_only=True)
+
+        logger.info(f"Queued login warm-up: {lyrics_queued} lyrics bundles, {matches_queued} matches")
+
+    def _ensure_started(self):
+        """Start the worker thread on first use (caller holds lock)"""
+        if self.thread and self.thread.is_alive():
+            return
+
+        self.thread = threading.Thread(target=self._run, name='lyrics-prefetch', daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        """Worker loop: prefetch one track at a time, highest priority first"""
+        while True:
+            priority, _, key, track = self.jobs.get()
+            match_only = key[1]
+            try:
+                with self.app.app_context():
+                    genius_client = get_genius_client()
+                    if genius_client:
+                        with genius_client.background():
+                            if match_only:
+                                lyrics_cache.find_match(genius_client, track)
+                            else:
+                                lyrics_cache.warm(genius_client, track)
+                logger.debug(f"Prefetched lyrics for '{track['name']}' (priority {priority})")
+            except Exception as e:
+                logger.warning(f"Lyrics prefetch failed for '{track.get('name')}': {e}")
+            finally:
+                with self.lock:
+                    self.pending.discard(key)
+                self.jobs.task_done()
+
+
+def spotify_item_to_track(item: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert a raw Spotify track object into the shape used for Genius matching"""
+    return {
+        'id': item.get('id'),
+        'name': item.get('name'),
+        'artists': [artist['name'] for artist in item.get('artists', [])],
+        'album': {'name': (item.get('album') or {}).get('name')}
+    }
+
+# Global prefetcher instance
+lyrics_prefetcher = LyricsPrefetcher()
@@ -0,0 +1,324 @@
+import re
+import math
+import bisect
+import logging
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .lyrics_tokens import WORD_PATTERN, lyrics_tokens, vocabulary
+
+logger = logging.getLogger(__name__)
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+PHRASE_PATTERN = re.compile(r'"([^"]+)"')
+POSITION_BITS = 20  # Word positions within a song stay below 2**20
+# Postings are rewritten once retired documents outnumber live ones and this many
+MIN_RETIRED_TO_COMPACT = 1000
+
+
+class Postings:
+    """Positional postings of one term, delta-encoded in flat uint32 arrays
+
+    docs holds the gaps between successive document numbers, freqs the
+    term's count in each document, and positions the gaps between its
+    successive positions, restarting at every document.
+    """
+
+    __slots__ = ('docs', 'freqs', 'positions', 'last_doc')
+
+    def __init__(self):
+        self.docs = array('I')
+        self.freqs = array('I')
+        self.positions = array('I')
+        self.last_doc = 0
+
+    def append(self, doc: int, freq: int, position_gaps: bytes):
+        self.docs.append(doc - self.last_doc)
+        self.freqs.append(freq)
+        self.positions.frombytes(position_gaps)
+        self.last_doc = doc
+
+    @classmethod
+    def encode(cls, docs: np.ndarray, freqs: np.ndarray, positions: np.ndarray) -> 'Postings':
+        """Postings from decoded (document numbers, frequencies, absolute positions)"""
+        postings = cls()
+        firsts = np.concatenate(([0], np.cumsum(freqs)[:-1]))
+        gaps = np.diff(positions, prepend=0)
+        gaps[firsts] = positions[firsts]
+        postings.docs.frombytes(np.diff(docs, prepend=0).astype(np.uint32).tobytes())
+        postings.freqs.frombytes(freqs.astype(np.uint32).tobytes())
+        postings.positions.frombytes(gaps.astype(np.uint32).tobytes())
+        postings.last_doc = int(docs[-1])
+        return postings
+
+    def decode(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(document numbers, frequencies, absolute positions) as NumPy arrays"""
+        docs = np.cumsum(np.frombuffer(self.docs, dtype=np.uint32), dtype=np.int64)
+        freqs = np.frombuffer(self.freqs, dtype=np.uint32).astype(np.int64)
+        gaps = np.frombuffer(self.positions, dtype=np.uint32).astype(np.int64)
+
+        # Undo the per-document delta encoding with one cumulative sum
+        running = np.cumsum(gaps)
+        firsts = np.concatenate(([0], np.cumsum(freqs)[:-1]))
+        base = running[firsts] - gaps[firsts]
+        positions = running - np.repeat(base, freqs)
+        return docs, freqs, positions
+
+
+class LyricsSearchIndex:
+    """Incremental inverted index over lyrics with BM25 ranking and phrase queries
+
+    Every lyrics text that enters the lyrics caches is added as a document.
+    A song whose lyrics change gets a new document; the old one stays in
+    the postings and is filtered out at query time. Past max_songs songs,
+    the least recently added song is retired the same way. Once retired
+    documents outnumber live ones, the postings are rewritten without them.
+    """
+
+    def __init__(self, max_songs: int = 50000):
+        self.terms = {}  # vocabulary id -> Postings
+        self.song_docs = OrderedDict()  # song_id -> (document number, lyrics hash), least recently added first
+        self.doc_songs = array('Q')
+        self.doc_lengths = array('I')
+        self.live = bytearray()
+        self.doc_meta = []  # document number -> (title, artist)
+        # Word offset and number of every lyric line, flat; a document's lines
+        # are [doc_line_starts[doc], doc_line_starts[doc + 1])
+        self.line_offsets = array('I')
+        self.line_numbers = array('I')
+        self.doc_line_starts = array('Q', [0])
+        self.live_docs = 0
+        self.live_length = 0
+        self.max_songs = max_songs
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self.live_docs
+
+    def add(self, song_id: int, lyrics: Optional[str], title: Optional[str] = None,
+            artist: Optional[str] = None) -> bool:
+        """Index a song's lyrics, returns False if they are already indexed"""
+        if not lyrics:
+            return False
+
+        lyrics_hash = hash(lyrics)
+        with self.lock:
+            existing = self.song_docs.get(song_id)
+            if existing and existing[1] == lyrics_hash:
+                self.song_docs.move_to_end(song_id)
+                return False
+
+        tokens = lyrics_tokens.get(song_id, lyrics)
+        if not tokens or len(tokens) >= 1 << POSITION_BITS:
+            return False
+
+        # Positions of every distinct token, grouped with one stable sort, and
+        # their gaps computed in one pass so each term only slices the bytes
+        token_ids = tokens.token_array()
+        order = np.argsort(token_ids, kind='stable')
+        sorted_ids = token_ids[order]
+        starts = np.flatnonzero(np.concatenate(([True], sorted_ids[1:] != sorted_ids[:-1])))
+        gaps = np.diff(order, prepend=0)
+        gaps[starts] = order[starts]
+        gap_bytes = gaps.astype(np.uint32).tobytes()
+        ends = np.append(starts[1:], len(order))
+        term_positions = zip(sorted_ids[starts].tolist(), starts.tolist(), ends.tolist())
+
+        with self.lock:
+            existing = self.song_docs.get(song_id)
+            if existing:
+                self._retire(existing[0])
+
+            doc = len(self.doc_lengths)
+            for term, start, end in term_positions:
+                postings = self.terms.get(term)
+                if postings is None:
+                    postings = self.terms[term] = Postings()
+                postings.append(doc, end - start, gap_bytes[4 * start:4 * end])
+
+            self.song_docs[song_id] = (doc, lyrics_hash)
+            self.song_docs.move_to_end(song_id)
+            self.doc_songs.append(song_id)
+            self.doc_lengths.append(len(tokens))
+            self.live.append(1)
+            self.doc_meta.append((title, artist))
+            # Copied, so the index doesn't keep tokenized songs alive past the tokens cache
+            self.line_offsets.extend(tokens.line_offsets[:tokens.line_count])
+            self.line_numbers.extend(tokens.line_numbers)
+            self.doc_line_starts.append(len(self.line_numbers))
+            self.live_docs += 1
+            self.live_length += len(tokens)
+
+            while len(self.song_docs) > self.max_songs:
+                _, (oldest, _) = self.song_docs.popitem(last=False)
+                self._retire(oldest)
+            if len(self.doc_lengths) - self.live_docs > max(self.live_docs, MIN_RETIRED_TO_COMPACT):
+                self._compact()
+
+        return True
+
+    def _retire(self, doc: int):
+        """Hide a replaced or evicted document (caller holds lock)"""
+        self.live[doc] = 0
+        self.live_docs -= 1
+        self.live_length -= self.doc_lengths[doc]
+
+    def _compact(self):
+        """Rewrite the postings and per-document arrays without retired documents (caller holds lock)"""
+        live = np.frombuffer(bytes(self.live), dtype=np.uint8).astype(bool)
+        renumbered = np.cumsum(live) - 1
+
+        terms = {}
+        for term, postings in self.terms.items():
+            docs, freqs, positions = postings.decode()
+            kept = live[docs]
+            if kept.any():
+                terms[term] = Postings.encode(renumbered[docs[kept]], freqs[kept],
+                                              positions[np.repeat(kept, freqs)])
+        self.terms = terms
+
+        line_starts = np.frombuffer(self.doc_line_starts, dtype=np.uint64).astype(np.int64)
+        line_counts = np.diff(line_starts)
+        line_kept = np.repeat(live, line_counts)
+        line_offsets = array('I', np.frombuffer(self.line_offsets, dtype=np.uint32)[line_kept].tobytes())
+        line_numbers = array('I', np.frombuffer(self.line_numbers, dtype=np.uint32)[line_kept].tobytes())
+        self.line_offsets, self.line_numbers = line_offsets, line_numbers
+        self.doc_line_starts = array('Q', [0])
+        self.doc_line_starts.extend(np.cumsum(line_counts[live]).tolist())
+
+        kept_docs = np.flatnonzero(live).tolist()
+        self.doc_songs = array('Q', [self.doc_songs[doc] for doc in kept_docs])
+        self.doc_lengths = array('I', [self.doc_lengths[doc] for doc in kept_docs])
+        self.doc_meta = [self.doc_meta[doc] for doc in kept_docs]
+        self.live = bytearray([1]) * len(kept_docs)
+        for song_id, (doc, lyrics_hash) in self.song_docs.items():
+            self.song_docs[song_id] = (int(renumbered[doc]), lyrics_hash)
+
+    def _line_of(self, doc: int, position: int) -> Optional[int]:
+        """Line number of a word position in a document"""
+        start = self.doc_line_starts[doc]
+        i = bisect.bisect_right(self.line_offsets, position, start, self.doc_line_starts[doc + 1]) - 1
+        return self.line_numbers[i] if i >= start else None
+
+    @staticmethod
+    def _parse_query(query: str) -> Tuple[List[Optional[int]], List[List[Optional[int]]]]:
+        """Vocabulary ids of all query terms, and of the terms of "quoted phrases" (None if never seen)"""
+        phrases = [[vocabulary.find(word) for word in WORD_PATTERN.findall(phrase.lower())]
+                   for phrase in PHRASE_PATTERN.findall(query)]
+        phrases = [phrase for phrase in phrases if len(phrase) > 1]
+        terms = [vocabulary.find(word) for word in dict.fromkeys(WORD_PATTERN.findall(query.lower()))]
+        return terms, phrases
+
+    def search(self, query: str, limit: int = 20) -> List[Dict]:
+        """Best matching songs for a query, phrases in double quotes must match exactly"""
+        terms, phrases = self._parse_query(query)
+        if not terms:
+            return []
+
+        with self.lock:
+            if not self.live_docs:
+                return []
+
+            n_docs = len(self.doc_lengths)
+            live = np.frombuffer(bytes(self.live), dtype=np.uint8).astype(bool)
+            lengths = np.array(self.doc_lengths, dtype=np.float64)
+            average_length = self.live_length / self.live_docs
+
+            decoded, dfs = {}, {}
+            scores = np.zeros(n_docs)
+            for term in terms:
+                postings = self.terms.get(term)
+                if postings is None:
+                    continue
+                docs, freqs, positions = decoded[term] = postings.decode()
+
+                # Only live documents count, retired ones can outnumber them until a compaction
+                df = dfs[term] = int(np.count_nonzero(live[docs]))
+                if not df:
+                    continue
+                idf = math.log(1 + (self.live_docs - df + 0.5) / (df + 0.5))
+                norm = K1 * (1 - B + B * lengths[docs] / average_length)
+                scores[docs] += idf * freqs * (K1 + 1) / (freqs + norm)
+
+            matched = live & (scores > 0)
+            # Where each result matched: first word of the phrase, else of the rarest term it contains
+            first_match = {}
+
+            for phrase in phrases:
+                if any(term not in decoded for term in phrase):
+                    return []
+                phrase_docs, phrase_starts = self._match_phrase(phrase, decoded)
+                mask = np.zeros(n_docs, dtype=bool)
+                mask[phrase_docs] = True
+                matched &= mask
+                for doc, start in zip(phrase_docs.tolist(), phrase_starts.tolist()):
+                    first_match.setdefault(doc, start)
+
+            candidates = np.flatnonzero(matched)
+            if not len(candidates):
+                return []
+            limit = min(limit, len(candidates))
+            top = candidates[np.argpartition(-scores[candidates], limit - 1)[:limit]]
+            top = top[np.argsort(-scores[top], kind='stable')]
+
+            match_positions = self._first_positions(top, decoded, dfs)
+            match_positions.update(first_match)
+
+            results = []
+            for doc in top.tolist():
+                position = match_positions.get(doc)
+                title, artist = self.doc_meta[doc]
+                results.append({
+                    'genius_id': int(self.doc_songs[doc]),
+                    'title': title,
+                    'artist': artist,
+                    'score': round(float(scores[doc]), 3),
+                    'line': self._line_of(doc, position) if position is not None else None
+                })
+
+        return results
+
+    @staticmethod
+    def _first_positions(top: np.ndarray, decoded: Dict, dfs: Dict[int, int]) -> Dict[int, int]:
+        """First position in each document of the rarest query term the document contains"""
+        found = {}
+        pending = top
+        for term in sorted(decoded, key=dfs.get):
+            docs, freqs, positions = decoded[term]
+            i = np.minimum(np.searchsorted(docs, pending), len(docs) - 1)
+            hit = docs[i] == pending
+            if hit.any():
+                firsts = np.cumsum(freqs) - freqs
+                found.update(zip(pending[hit].tolist(), positions[firsts[i[hit]]].tolist()))
+                pending = pending[~hit]
+                if not len(pending):
+                    break
+        return found
+
+    @staticmethod
+    def _match_phrase(phrase: List[int], decoded: Dict) -> Tuple[np.ndarray, np.ndarray]:
+        """Documents containing the phrase, with the first position it starts at in each"""
+        keys = None
+        for offset, term in enumerate(phrase):
+            docs, freqs, positions = decoded[term]
+            starts = positions - offset
+            term_keys = (np.repeat(docs, freqs) << POSITION_BITS) | np.maximum(starts, 0)
+            term_keys = term_keys[starts >= 0]
+            keys = term_keys if keys is None else np.intersect1d(keys, term_keys, assume_unique=True)
+            if not len(keys):
+                break
+
+        keys = np.unique(keys)
+        docs, first = np.unique(keys >> POSITION_BITS, return_index=True)
+        return docs, keys[first] & ((1 << POSITION_BITS) - 1)
+
+
+# Global lyrics search index
+lyrics_search = LyricsSearchIndex()
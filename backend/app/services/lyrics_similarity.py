@@ -0,0 +1,203 @@
+import zlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from .lyrics_tokens import TokenTable, TokenizedLyrics, lyrics_tokens
+
+logger = logging.getLogger(__name__)
+
+SHINGLE_SIZE = 3  # Words per shingle
+NUM_PERM = 128
+BANDS = 64
+ROWS = NUM_PERM // BANDS  # Songs sharing all rows of any band become candidates
+
+# Estimated Jaccard similarity from which two songs count as versions of each other
+NEAR_DUPLICATE = 0.8
+MIN_SIMILARITY = 0.15
+
+# Shingles hashed per batch, bounds the (NUM_PERM x shingles) working matrix
+BATCH_SHINGLES = 1 << 16
+
+# Multiply-shift hash functions (a * x + b) >> 32 with odd a, wrapping at 2**64
+_rng = np.random.default_rng(20240)
+PERM_A = _rng.integers(0, 1 << 63, size=(NUM_PERM, 1), dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+PERM_B = _rng.integers(0, 1 << 63, size=(NUM_PERM, 1), dtype=np.uint64)
+SHINGLE_MIX = np.array([0x9E3779B1, 0x85EBCA77, 0xC2B2AE3D][:SHINGLE_SIZE], dtype=np.uint64)
+
+# crc32 rather than vocabulary ids so signatures agree across workers and restarts
+WORD_HASHES = TokenTable(lambda word: zlib.crc32(word.encode('utf-8')), np.uint64)
+
+
+def shingle_hashes(doc: Optional[TokenizedLyrics]) -> np.ndarray:
+    """Distinct 32-bit hashes of a tokenized song's SHINGLE_SIZE-word shingles"""
+    if not doc:
+        return np.empty(0, dtype=np.uint64)
+
+    tokens = WORD_HASHES[doc.token_array()]
+    if len(tokens) < SHINGLE_SIZE:
+        return np.unique(tokens)
+
+    windows = np.lib.stride_tricks.sliding_window_view(tokens, SHINGLE_SIZE)
+    return np.unique((windows * SHINGLE_MIX).sum(axis=1) & np.uint64(0xFFFFFFFF))
+
+def minhash_signatures(shingle_sets: List[np.ndarray]) -> np.ndarray:
+    """
+    MinHash signatures of many shingle sets at once, one uint32 row per set
+
+    Sets are concatenated into batches of about BATCH_SHINGLES shingles,
+    every hash function is applied to a whole batch in one
+    broadcast, and np.minimum.reduceat takes the minimum per set. Empty
+    sets get an all-ones signature that matches nothing real.
+    """
+    signatures = np.full((len(shingle_sets), NUM_PERM), 0xFFFFFFFF, dtype=np.uint32)
+    sizes = np.array([len(shingles) for shingles in shingle_sets], dtype=np.int64)
+
+    batch, batch_size = [], 0
+    for i in np.flatnonzero(sizes).tolist():
+        batch.append(i)
+        batch_size += sizes[i]
+        if batch_size >= BATCH_SHINGLES:
+            _sign_batch(shingle_sets, batch, sizes, signatures)
+            batch, batch_size = [], 0
+    if batch:
+        _sign_batch(shingle_sets, batch, sizes, signatures)
+    return signatures
+
+def _sign_batch(shingle_sets: List[np.ndarray], batch: List[int], sizes: np.ndarray, signatures: np.ndarray):
+    values = np.concatenate([shingle_sets[i] for i in batch])
+    starts = np.concatenate(([0], np.cumsum(sizes[batch])[:-1]))
+    permuted = PERM_A * values
+    permuted += PERM_B
+    permuted >>= np.uint64(32)
+    signatures[batch] = np.minimum.reduceat(permuted, starts, axis=1).T
+
+def band_keys(signatures: np.ndarray) -> np.ndarray:
+    """One integer bucket key per band, each band's ROWS values packed together"""
+    bands = signatures.reshape(len(signatures), BANDS, ROWS).astype(np.uint64)
+    keys = np.zeros((len(signatures), BANDS), dtype=np.uint64)
+    for row in range(ROWS):
+        keys = (keys << np.uint64(64 // ROWS)) ^ bands[:, :, row]
+    return keys
+
+
+class LyricsSimilarityIndex:
+    """
+    MinHash/LSH index over lyrics for near-duplicate and similar-song lookup
+
+    Every song's signature is split into BANDS bands; songs that agree on
+    a whole band land in the same bucket. A lookup only compares the
+    signatures of songs sharing a bucket with it, so it stays sub-linear
+    in the number of indexed songs. Past max_songs songs, the least
+    recently added one is dropped.
+    """
+
+    def __init__(self, max_songs: int = 50000):
+        # song_id -> (lyrics hash, signature, band keys, title, artist), least recently added first
+        self.songs = OrderedDict()
+        self.buckets = [{} for _ in range(BANDS)]  # band -> key -> set of song ids
+        self.max_songs = max_songs
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.songs)
+
+    def add(self, song_id: int, lyrics: Optional[str], title: Optional[str] = None,
+            artist: Optional[str] = None) -> bool:
+        """Index a song's lyrics, returns False if they are already indexed"""
+        return self.add_many([(song_id, lyrics, title, artist)]) > 0
+
+    def add_many(self, songs: Iterable[Tuple[int, Optional[str], Optional[str], Optional[str]]]) -> int:
+        """Index (song_id, lyrics, title, artist) tuples with one batched signature pass"""
+        pending = []
+        with self.lock:
+            for song_id, lyrics, title, artist in songs:
+                existing = self.songs.get(song_id)
+                if existing and lyrics and existing[0] == hash(lyrics):
+                    self.songs.move_to_end(song_id)
+                elif lyrics:
+                    pending.append((song_id, lyrics, title, artist))
+        if not pending:
+            return 0
+
+        shingle_sets = [shingle_hashes(lyrics_tokens.get(song_id, lyrics)) for song_id, lyrics, _, _ in pending]
+        signatures = minhash_signatures(shingle_sets)
+        keys = band_keys(signatures)
+
+        added = 0
+        with self.lock:
+            for i, (song_id, lyrics, title, artist) in enumerate(pending):
+                if not len(shingle_sets[i]):
+                    continue
+                existing = self.songs.get(song_id)
+                if existing:
+                    self._remove(song_id, existing[2])
+
+                song_keys = keys[i].tolist()
+                for band, key in enumerate(song_keys):
+                    self.buckets[band].setdefault(key, set()).add(song_id)
+                self.songs[song_id] = (hash(lyrics), signatures[i], song_keys, title, artist)
+                self.songs.move_to_end(song_id)
+                added += 1
+
+            while len(self.songs) > self.max_songs:
+                oldest, entry = self.songs.popitem(last=False)
+                self._remove(oldest, entry[2])
+        return added
+
+    def _remove(self, song_id: int, song_keys: List[int]):
+        """Take a song out of its buckets (caller holds lock)"""
+        for band, key in enumerate(song_keys):
+            bucket = self.buckets[band].get(key)
+            if bucket is None:
+                continue
+            bucket.discard(song_id)
+            if not bucket:
+                del self.buckets[band][key]
+
+    def similar(self, song_id: int, limit: int = 20, min_similarity: float = MIN_SIMILARITY) -> Optional[List[Dict]]:
+        """
+        Indexed songs whose lyrics resemble the song's, most similar first
+
+        Returns None when the song is not indexed. Similarity is the
+        estimated Jaccard similarity of the two songs' word shingles.
+        """
+        with self.lock:
+            entry = self.songs.get(song_id)
+            if entry is None:
+                return None
+
+            candidates = set()
+            for band, key in enumerate(entry[2]):
+                candidates |= self.buckets[band].get(key, set())
+            candidates.discard(song_id)
+            if not candidates:
+                return []
+
+            candidates = list(candidates)
+            others = np.stack([self.songs[candidate][1] for candidate in candidates])
+            meta = [self.songs[candidate][3:] for candidate in candidates]
+
+        similarity = (others == entry[1]).mean(axis=1)
+        order = np.argsort(-similarity, kind='stable')
+        order = order[similarity[order] >= min_similarity][:limit]
+
+        return [{
+            'genius_id': candidates[i],
+            'title': meta[i][0],
+            'artist': meta[i][1],
+            'similarity': round(float(similarity[i]), 3),
+            'near_duplicate': bool(similarity[i] >= NEAR_DUPLICATE)
+        } for i in order.tolist()]
+
+    def near_duplicates(self, song_id: int) -> List[int]:
+        """Genius ids of other versions of the song (remasters, live versions, re-uploads)"""
+        similar = self.similar(song_id, limit=len(self.songs), min_similarity=NEAR_DUPLICATE) or []
+        return [song['genius_id'] for song in similar]
+
+
+# Global lyrics similarity index
+lyrics_similarity = LyricsSimilarityIndex()
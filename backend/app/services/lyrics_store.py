@@ -0,0 +1,313 @@
+import os
+import mmap
+import zlib
+import time
+import atexit
+import logging
+import threading
+from typing import Dict, Optional
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process writer lock
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Default location, next to the ratings and catalog files
+DEFAULT_STORE_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'data', 'lyrics_store'
+)
+
+# Fixed-width index records, sorted by song id. On disk each field is stored
+# as its own contiguous column (all ids, then all offsets, ...) so lookups
+# binary-search the mapped id column directly.
+INDEX_DTYPE = np.dtype([
+    ('song_id', '<u8'),
+    ('offset', '<u8'),
+    ('length', '<u4'),
+    ('crc', '<u4')
+])
+
+DATA_MAGIC = b'LYRSTOR1'
+
+
+class LyricsStore:
+    """On-disk store of scraped lyrics keyed by Genius song id, shared by all workers
+
+    Lyrics are zlib-compressed records appended to ``<name>.dat``; identical
+    lyrics are stored once. ``<name>.idx`` holds fixed-width (song_id,
+    offset, length, crc) records sorted by song id. Records are bytes, so
+    other per-song data derived from the lyrics can live in a store of its
+    own name in the same directory. Readers mmap
+    both files read-only, so every worker process shares one page-cache copy
+    and a lookup is a binary search plus one decompression.
+
+    Writes are queued and flushed in batches by a single writer at a time
+    (a file lock guards against other processes). A flush appends the
+    records, then writes a merged index and swaps it in atomically; readers
+    pick up the new index on their next lookup.
+    """
+
+    def __init__(self, name: str = 'lyrics', flush_interval: float = 5.0, compression_level: int = 6,
+                 reload_interval: float = 1.0):
+        self.name = name
+        self.path = None
+        self.flush_interval = flush_interval
+        self.compression_level = compression_level
+        self.reload_interval = reload_interval
+
+        self.pending = {}  # song_id -> record bytes, not yet on disk
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()
+        self.flush_wanted = threading.Event()
+        self.thread = None
+
+        self.data_map = None
+        self.index = None
+        self.index_stat = None
+        self.checked_at = 0.0
+
+    @property
+    def data_path(self) -> str:
+        return os.path.join(self.path, f'{self.name}.dat')
+
+    @property
+    def index_path(self) -> str:
+        return os.path.join(self.path, f'{self.name}.idx')
+
+    @property
+    def lock_path(self) -> str:
+        return os.path.join(self.path, 'write.lock')
+
+    def open(self, path: str):
+        """Open (creating if needed) the store in a directory"""
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self._reload(force=True)
+        atexit.register(self.flush)
+        logger.info(f"Opened {self.name} store at {path} ({len(self)} songs)")
+
+    def __len__(self) -> int:
+        return 0 if self.index is None else len(self.index['song_id'])
+
+    @staticmethod
+    def _index_columns(buffer) -> Dict[str, np.ndarray]:
+        """Zero-copy column views of a serialized index"""
+        count = len(buffer) // INDEX_DTYPE.itemsize
+        columns, offset = {}, 0
+        for name in INDEX_DTYPE.names:
+            dtype = INDEX_DTYPE.fields[name][0]
+            columns[name] = np.frombuffer(buffer, dtype=dtype, count=count, offset=offset)
+            offset += count * dtype.itemsize
+        return columns
+
+    @staticmethod
+    def _index_bytes(records: np.ndarray) -> bytes:
+        """Serialize index records column by column"""
+        return b''.join(np.ascontiguousarray(records[name]).tobytes() for name in INDEX_DTYPE.names)
+
+    @staticmethod
+    def _map_file(path: str) -> Optional[mmap.mmap]:
+        """Map a whole file read-only, None if it is missing or empty"""
+        try:
+            with open(path, 'rb') as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    return None
+                return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except FileNotFoundError:
+            return None
+
+    def _reload(self, force: bool = False):
+        """Remap the index (and data) if a writer swapped in a new index"""
+        now = time.time()
+        if not force and now - self.checked_at < self.reload_interval:
+            return
+        self.checked_at = now
+
+        try:
+            stat = os.stat(self.index_path)
+            index_stat = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        except FileNotFoundError:
+            index_stat = None
+
+        if not force and index_stat == self.index_stat:
+            return
+
+        # Old maps are never closed explicitly: lookups in other threads may
+        # still hold views into them, and they are freed once unreferenced
+        index_map = self._map_file(self.index_path) if index_stat else None
+        self.index = self._index_columns(index_map) if index_map is not None else None
+        self.data_map = self._map_file(self.data_path)
+        self.index_stat = index_stat
+
+    def get(self, song_id: int) -> Optional[str]:
+        """Get the stored lyrics of a Genius song"""
+        record = self.get_bytes(song_id)
+        return record.decode('utf-8') if record is not None else None
+
+    def get_bytes(self, song_id: int) -> Optional[bytes]:
+        """Get the stored record of a Genius song"""
+        if self.path is None:
+            return None
+
+        with self.lock:
+            if song_id in self.pending:
+                return self.pending[song_id]
+
+        self._reload()
+        index, data_map = self.index, self.data_map
+        if index is None:
+            return None
+
+        song_ids = index['song_id']
+        # A plain int would make numpy convert the whole uint64 column
+        i = int(song_ids.searchsorted(np.uint64(song_id)))
+        if i == len(song_ids) or int(song_ids[i]) != song_id:
+            return None
+
+        offset, length = int(index['offset'][i]), int(index['length'][i])
+        if data_map is None or offset + length > len(data_map):
+            # The index is newer than our data map
+            self._reload(force=True)
+            data_map = self.data_map
+            if data_map is None or offset + length > len(data_map):
+                logger.error(f"{self.name} store record of song {song_id} is past the end of the data file")
+                return None
+
+        with memoryview(data_map) as view:
+            # Decompress straight from the shared mapping, no intermediate copy
+            return zlib.decompress(view[offset:offset + length])
+
+    def put(self, song_id: int, lyrics: str):
+        """Queue lyrics for the next batched write"""
+        if lyrics:
+            self.put_bytes(song_id, lyrics.encode('utf-8'))
+
+    def put_bytes(self, song_id: int, record: bytes):
+        """Queue a record for the next batched write"""
+        if self.path is None or not record:
+            return
+
+        with self.lock:
+            self.pending[song_id] = record
+            self._ensure_started()
+        self.flush_wanted.set()
+
+    def _ensure_started(self):
+        """Start the flush thread on first use (caller holds lock)"""
+        if self.thread and self.thread.is_alive():
+            return
+
+        self.thread = threading.Thread(target=self._run, name=f'{self.name}-store-flush', daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        """Background loop: write queued records in batches"""
+        while True:
+            self.flush_wanted.wait()
+            # Let more writes arrive so they share one index swap
+            time.sleep(self.flush_interval)
+            self.flush_wanted.clear()
+
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Error flushing {self.name} store: {e}")
+
+    def flush(self) -> int:
+        """Write all queued records and swap in the merged index, returns how many were written"""
+        if self.path is None:
+            return 0
+
+        with self.write_lock:
+            with self.lock:
+                batch = self.pending.copy()
+            if not batch:
+                return 0
+
+            with open(self.lock_path, 'a') as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    self._write_batch(batch)
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+            self._reload(force=True)
+            with self.lock:
+                for song_id, record in batch.items():
+                    if self.pending.get(song_id) is record:
+                        del self.pending[song_id]
+
+        logger.info(f"Wrote {len(batch)} songs to the {self.name} store ({len(self)} total)")
+        return len(batch)
+
+    def _write_batch(self, batch: Dict[int, bytes]):
+        """Append records and swap in a new index (caller holds the writer lock)"""
+        # Start from the index on disk: another process may have written since we mapped it
+        existing = np.empty(0, dtype=INDEX_DTYPE)
+        if os.path.exists(self.index_path):
+            with open(self.index_path, 'rb') as f:
+                columns = self._index_columns(f.read())
+            existing = np.empty(len(columns['song_id']), dtype=INDEX_DTYPE)
+            for name, column in columns.items():
+                existing[name] = column
+        data_map = self._map_file(self.data_path)
+
+        blobs = [zlib.compress(record, self.compression_level) for record in batch.values()]
+        crcs = np.array([zlib.crc32(blob) for blob in blobs], dtype=np.uint32)
+        known = np.isin(crcs, existing['crc'])
+
+        entries = np.empty(len(batch), dtype=INDEX_DTYPE)
+        with open(self.data_path, 'ab') as data:
+            if data.tell() == 0:
+                data.write(DATA_MAGIC)
+
+            written = {}  # (crc, length) -> offset of records in this batch
+            for i, (song_id, blob) in enumerate(zip(batch, blobs)):
+                key = (int(crcs[i]), len(blob))
+                offset = written.get(key)
+                if offset is None and known[i] and data_map is not None:
+                    offset = self._find_record(existing, data_map, blob, key)
+                if offset is None:
+                    offset = data.tell()
+                    data.write(blob)
+                    written[key] = offset
+                entries[i] = (song_id, offset, len(blob), key[0])
+
+            data.flush()
+            os.fsync(data.fileno())
+
+        # New entries after old ones, so a stable sort keeps the newest per song
+        merged = np.concatenate([existing, entries])
+        merged = merged[np.argsort(merged['song_id'], kind='stable')]
+        if len(merged):
+            last = np.append(merged['song_id'][1:] != merged['song_id'][:-1], True)
+            merged = merged[last]
+
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(self._index_bytes(merged))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.index_path)
+
+    @staticmethod
+    def _find_record(existing: np.ndarray, data_map: mmap.mmap, blob: bytes, key) -> Optional[int]:
+        """Offset of an existing record with exactly these bytes, for dedup"""
+        crc, length = key
+        candidates = existing[(existing['crc'] == crc) & (existing['length'] == length)]
+        for offset in candidates['offset']:
+            offset = int(offset)
+            if data_map[offset:offset + length] == blob:
+                return offset
+        return None
+
+
+# Global store instances (opened by create_app)
+lyrics_store = LyricsStore()
+token_store = LyricsStore('tokens')
@@ -0,0 +1,228 @@
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+
+from .lyrics_tokens import TokenTable, TokenizedLyrics, Vocabulary, lyrics_tokens, vocabulary
+
+logger = logging.getLogger(__name__)
+
+# Function words and vocal fillers that say nothing about a song's themes
+STOP_WORDS = frozenset("""
+a about after again against all am an and any are as at be because been before being but by
+can could did do does doing don't down for from had has have having he her here hers him his
+how i i'd i'll i'm i've if in into is isn't it it's its just let let's me more most my myself
+no nor not now of off on once only or other our ours out over own same she should so some such
+than that that's the their them then there these they this those through to too under until up
+very was we we're were what when where which while who whom why will with won't would you
+you'd you'll you're you've your yours yourself ain't can't gonna gotta wanna 'cause cause got
+get gets go goes going know like make made say said see take tell come came way thing things
+one two yeah yea yes oh ooh ohh ah ahh uh huh hey ha la na da woah whoa mm mmm hmm ay ayy eh
+""".split())
+
+MAX_PROFILE_TERMS = 50
+# Phrases pack (first word id + 1) above this bit and the second word id below it
+PHRASE_BIT = 32
+
+
+def is_theme_word(word: str) -> bool:
+    return word not in STOP_WORDS and len(word) >= 3
+
+THEME_WORDS = TokenTable(is_theme_word, bool)
+
+def document_terms(doc: Optional[TokenizedLyrics]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Distinct theme terms of a tokenized song and their counts
+
+    Terms are words, as vocabulary ids, and two-word phrases, as both ids
+    packed into one integer above PHRASE_BIT. Stop words and words under
+    three letters are skipped, and phrases are pairs of neighbouring kept
+    words on the same line.
+    """
+    if not doc:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    tokens = doc.token_array().astype(np.int64)
+    kept = THEME_WORDS[tokens]
+    word_lines = doc.word_lines()
+    paired = kept[1:] & kept[:-1] & (word_lines[1:] == word_lines[:-1])
+    phrases = ((tokens[:-1][paired] + 1) << PHRASE_BIT) | tokens[1:][paired]
+    return np.unique(np.concatenate((tokens[kept], phrases)), return_counts=True)
+
+def term_names(terms: List[int]) -> List[str]:
+    """Text of words and packed phrases"""
+    low = (1 << PHRASE_BIT) - 1
+    parts = [(term,) if term <= low else ((term >> PHRASE_BIT) - 1, term & low) for term in terms]
+    word_ids = list({word_id for part in parts for word_id in part})
+    names = dict(zip(word_ids, vocabulary.lookup(word_ids)))
+    return [' '.join(names[word_id] for word_id in part) for part in parts]
+
+
+class LyricsThemes:
+    """
+    TF-IDF theme profiles of users' rated songs
+
+    Every lyrics text entering the caches updates the corpus document
+    frequencies and keeps its term counts as a sparse row. Past max_songs
+    songs, the least recently added one leaves the corpus; a rated song
+    is added back from its cached lyrics when a profile needs it. A user's
+    profile is built from those rows and cached under the user's ratings
+    sync token, so it is only rebuilt after their ratings change.
+    """
+
+    def __init__(self, max_profiles: int = 1000, max_songs: int = 50000):
+        self.terms = Vocabulary()  # words and packed phrases -> dense term ids
+        self.df = np.zeros(1024, dtype=np.int64)
+        self.documents = OrderedDict()  # song_id -> (lyrics hash, term ids, term counts), least recently added first
+        self.profiles = OrderedDict()  # user_id -> (sync token, profile)
+        self.max_profiles = max_profiles
+        self.max_songs = max_songs
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def add(self, song_id: int, lyrics: Optional[str]) -> bool:
+        """Add a song's lyrics to the corpus, returns False if they are already in it"""
+        if not lyrics:
+            return False
+        with self.lock:
+            existing = self.documents.get(song_id)
+            if existing and existing[0] == hash(lyrics):
+                self.documents.move_to_end(song_id)
+                return False
+
+        terms, term_counts = document_terms(lyrics_tokens.get(song_id, lyrics))
+        ids = self.terms.intern(terms.tolist())
+        term_counts = term_counts.astype(np.uint32)
+
+        with self.lock:
+            existing = self.documents.get(song_id)
+            if existing:
+                self.df[existing[1]] -= 1
+            if len(self.terms) > len(self.df):
+                self.df = np.concatenate((self.df, np.zeros(max(len(self.terms), 2 * len(self.df)) - len(self.df),
+                                                            dtype=np.int64)))
+            self.df[ids] += 1
+            self.documents[song_id] = (hash(lyrics), ids, term_counts)
+            self.documents.move_to_end(song_id)
+            while len(self.documents) > self.max_songs:
+                _, (_, oldest_ids, _) = self.documents.popitem(last=False)
+                self.df[oldest_ids] -= 1
+        return True
+
+    def get_profile(self, user_id: str, sync_token: str, load_entries: Callable[[], List[Dict]],
+                    get_lyrics: Callable[[int], Optional[str]],
+                    find_song_id: Callable[[Dict], Optional[int]] = lambda song: None) -> Dict:
+        """
+        Theme profile of a user, rebuilt only when the ratings sync token moved
+
+        Args:
+            user_id: User identifier
+            sync_token: Current ratings sync token of the user
+            load_entries: Returns the user's rating entries
+            get_lyrics: Returns cached lyrics of a Genius song, for rated
+                songs that aren't in the corpus yet
+            find_song_id: Returns the Genius id of a rated song that was
+                stored without one, None if it is unknown
+        """
+        with self.lock:
+            cached = self.profiles.get(user_id)
+            if cached and cached[0] == sync_token:
+                self.profiles.move_to_end(user_id)
+                return cached[1]
+
+        profile = self.build_profile(load_entries(), get_lyrics, find_song_id)
+        with self.lock:
+            self.profiles[user_id] = (sync_token, profile)
+            self.profiles.move_to_end(user_id)
+            while len(self.profiles) > self.max_profiles:
+                self.profiles.popitem(last=False)
+        return profile
+
+    def build_profile(self, entries: List[Dict], get_lyrics: Callable[[int], Optional[str]],
+                      find_song_id: Callable[[Dict], Optional[int]] = lambda song: None) -> Dict:
+        """
+        Most distinctive terms and phrases across rated songs
+
+        Each song is a sublinear TF-IDF row, L2 normalized so long songs
+        don't dominate, and weighted by its rating out of 10. A term's score
+        is the weighted sum of its column over the total weight. Terms found
+        in only one song are skipped once several songs were analyzed, so a
+        single song's chorus can't pass for a theme. Rated songs whose Genius
+        song or lyrics can't be found count as songs without lyrics.
+        """
+        weights, rows, missing = [], [], 0
+        for entry in entries:
+            if not entry.get('rating'):
+                continue
+            song = entry.get('song') or {}
+            genius_id = str(song.get('genius_id') or '')
+            genius_id = int(genius_id) if genius_id.isdigit() else find_song_id(song)
+            if not genius_id:
+                missing += 1
+                continue
+
+            with self.lock:
+                document = self.documents.get(genius_id)
+            if document is None and self.add(genius_id, get_lyrics(genius_id)):
+                with self.lock:
+                    document = self.documents.get(genius_id)
+            if document is None:
+                missing += 1
+                continue
+            weights.append(entry['rating'] / 10.0)
+            rows.append(document)
+
+        profile = {
+            'terms': [],
+            'phrases': [],
+            'songs_analyzed': len(rows),
+            'songs_without_lyrics': missing
+        }
+        if not rows:
+            return profile
+
+        with self.lock:
+            documents = len(self.documents)
+            df = self.df[:len(self.terms)].copy()
+
+        columns = np.concatenate([ids for _, ids, _ in rows]).astype(np.int64)
+        counts = np.concatenate([term_counts for _, _, term_counts in rows]).astype(np.float64)
+        lengths = np.array([len(ids) for _, ids, _ in rows])
+        row_index = np.repeat(np.arange(len(rows)), lengths)
+
+        idf = np.log((1 + documents) / (1 + df)) + 1
+        values = (1 + np.log(counts)) * idf[columns]
+        norms = np.sqrt(np.bincount(row_index, weights=values ** 2, minlength=len(rows)))
+        values /= norms[row_index]
+
+        matrix = sparse.csr_matrix((values, (row_index, columns)), shape=(len(rows), len(df)))
+        weights = np.array(weights)
+        scores = (weights @ matrix) / weights.sum()
+        song_counts = np.bincount(columns, minlength=len(df))
+        if len(rows) > 2:
+            scores[song_counts < 2] = 0
+
+        # Only the best terms need their strings
+        top = np.argpartition(-scores, min(4 * MAX_PROFILE_TERMS, len(scores) - 1))[:4 * MAX_PROFILE_TERMS]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        top = top[scores[top] > 0].tolist()
+
+        terms = self.terms.lookup(top)
+        for term_id, term, name in zip(top, terms, term_names(terms)):
+            target = profile['phrases'] if term >= 1 << PHRASE_BIT else profile['terms']
+            if len(target) < MAX_PROFILE_TERMS:
+                target.append({
+                    'term': name,
+                    'score': round(float(scores[term_id]), 4),
+                    'songs': int(song_counts[term_id])
+                })
+        return profile
+
+
+# Global themes instance
+lyrics_themes = LyricsThemes()
@@ -0,0 +1,201 @@
+import re
+import bisect
+import logging
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .lyrics_tokens import TokenTable, TokenizedLyrics, lyrics_tokens
+
+logger = logging.getLogger(__name__)
+
+VOWEL_GROUPS = re.compile(r'[aeiouy]+')
+
+# Weights in syllables: the pause after every line, the instrumental break
+# at each section header, and the intro before / outro after the vocals
+LINE_PAUSE = 1.5
+SECTION_BREAK = 4.0
+INTRO = 6.0
+OUTRO = 6.0
+
+# Estimated section starts move to an audio-analysis section boundary this close
+SNAP_TOLERANCE_MS = 8000
+
+
+def count_syllables(word: str) -> int:
+    """Rough syllable count of a lowercase word from its vowel groups"""
+    groups = len(VOWEL_GROUPS.findall(word))
+    if word.endswith('e') and not word.endswith(('le', 'ee')) and groups > 1:
+        groups -= 1  # Silent final e
+    return max(groups, 1)
+
+SYLLABLES = TokenTable(count_syllables, np.float64)
+
+def line_weights(doc: TokenizedLyrics) -> Tuple[List[int], np.ndarray, np.ndarray, List[int]]:
+    """
+    Line numbers, sung weights and preceding pauses of the lyric lines,
+    plus the indexes of lines that start a section
+
+    A line weighs its syllables, at least one. Line numbers count non-empty
+    lines including section headers, 1-based, the same as the annotations'
+    lyrics_line_number.
+    """
+    line_count = doc.line_count
+    line_of_token = np.repeat(np.arange(line_count), doc.line_lengths())
+    syllables = np.bincount(line_of_token, weights=SYLLABLES[doc.token_array()], minlength=line_count)
+
+    pauses = np.full(line_count, LINE_PAUSE)
+    if line_count:
+        pauses[0] = INTRO
+    section_starts = list(doc.section_starts)
+    np.add.at(pauses, [start for start in section_starts if start < line_count], SECTION_BREAK)
+
+    return list(doc.line_numbers), np.maximum(syllables, 1.0), pauses, section_starts
+
+
+class LineTimingIndex:
+    """Estimated start time of every lyric line, as compact cumulative arrays"""
+
+    def __init__(self, lines: List[int], starts_ms: List[int], duration_ms: int, anchored: bool):
+        self.lines = array('I', lines)
+        self.starts_ms = array('I', starts_ms)
+        self.duration_ms = duration_ms
+        self.anchored = anchored  # Snapped to audio-analysis sections
+
+    def position(self, progress_ms: int) -> Tuple[Optional[int], Optional[int]]:
+        """(current line number, start of the next line in ms) at a playback position"""
+        i = bisect.bisect_right(self.starts_ms, progress_ms) - 1
+        current_line = self.lines[i] if i >= 0 else None
+        next_line_at_ms = self.starts_ms[i + 1] if i + 1 < len(self.starts_ms) else None
+        return current_line, next_line_at_ms
+
+    def to_dict(self) -> Dict:
+        return {
+            'lines': self.lines.tolist(),
+            'starts_ms': self.starts_ms.tolist(),
+            'anchored': self.anchored
+        }
+
+def build_timing_index(doc: Optional[TokenizedLyrics], duration_ms: int,
+                       audio_sections: Optional[List[Dict]] = None) -> Optional[LineTimingIndex]:
+    """
+    Spread a track's duration over the lyric lines of a tokenized song
+
+    Each line gets time in proportion to its syllables, plus a short pause
+    after it and a longer break at section headers. With Spotify
+    audio-analysis sections, estimated section starts that fall near a
+    section boundary are snapped to it, and lines in between are spread
+    over the corrected span.
+    """
+    if doc is None or not doc.line_count or not duration_ms:
+        return None
+    lines, weights, pauses, section_starts = line_weights(doc)
+
+    # Cumulative start of every line, in weight units
+    starts = np.cumsum(pauses) + np.cumsum(weights) - weights
+    total = float(pauses.sum() + weights.sum())
+    scale = duration_ms / (total + OUTRO)
+    starts_ms = (starts * scale).tolist()
+
+    anchored = False
+    if audio_sections:
+        boundaries = sorted(int(section['start'] * 1000) for section in audio_sections if section.get('start'))
+        anchors = {}  # line index -> snapped start
+        for index in [0] + section_starts:
+            if index >= len(starts_ms) or not boundaries:
+                continue
+            j = bisect.bisect_left(boundaries, starts_ms[index])
+            nearest = min(boundaries[max(j - 1, 0):j + 1], key=lambda boundary: abs(boundary - starts_ms[index]))
+            previous = max((value for key, value in anchors.items() if key < index), default=-1)
+            if abs(nearest - starts_ms[index]) <= SNAP_TOLERANCE_MS and nearest > previous:
+                anchors[index] = nearest
+
+        if anchors:
+            anchored = True
+            starts_ms = _interpolate(starts_ms, anchors, duration_ms * total / (total + OUTRO))
+
+    return LineTimingIndex(lines, [int(start) for start in starts_ms], duration_ms, anchored)
+
+def _interpolate(starts_ms: List[float], anchors: Dict[int, float], vocals_end_ms: float) -> List[float]:
+    """Move anchored lines to their anchors, stretching the lines between them linearly"""
+    points = sorted(anchors.items())
+    if points[0][0] != 0:
+        points.insert(0, (0, starts_ms[0]))
+    # The end of the vocals stays where it was estimated
+    points.append((len(starts_ms), max(vocals_end_ms, points[-1][1])))
+    estimated = starts_ms + [vocals_end_ms]
+
+    result = list(starts_ms)
+    for (left, left_ms), (right, right_ms) in zip(points, points[1:]):
+        span = estimated[right] - estimated[left]
+        for i in range(left, right):
+            fraction = (estimated[i] - estimated[left]) / span if span > 0 else 0.0
+            result[i] = left_ms + fraction * (right_ms - left_ms)
+    return result
+
+
+class LyricsTiming:
+    """Line timing indexes per Genius song and track duration, and audio-analysis sections per Spotify track
+
+    Versions of a song on Spotify (album, single, remaster) often differ in
+    length, so each duration gets its own index.
+    """
+
+    def __init__(self, max_entries: int = 5000, max_sections: int = 1000):
+        self.indexes = OrderedDict()  # (song_id, duration_ms) -> (lyrics hash, index)
+        self.audio_sections = OrderedDict()  # spotify track_id -> sections
+        self.max_entries = max_entries
+        self.max_sections = max_sections
+        self.lock = threading.Lock()
+
+    def put_audio_sections(self, track_id: str, sections: List[Dict]):
+        """Cache the audio-analysis sections of a Spotify track"""
+        with self.lock:
+            self.audio_sections[track_id] = sections
+            self.audio_sections.move_to_end(track_id)
+            while len(self.audio_sections) > self.max_sections:
+                self.audio_sections.popitem(last=False)
+
+    def has_audio_sections(self, track_id: str) -> bool:
+        with self.lock:
+            return track_id in self.audio_sections
+
+    def get_index(self, song_id: int, lyrics: Optional[str], duration_ms: int,
+                  track_id: Optional[str] = None) -> Optional[LineTimingIndex]:
+        """Timing index of a song for a track, built on a miss or when better data arrived"""
+        if not lyrics or not duration_ms:
+            return None
+
+        key = (song_id, duration_ms)
+        with self.lock:
+            cached = self.indexes.get(key)
+            sections = self.audio_sections.get(track_id) if track_id else None
+            if cached and cached[0] == hash(lyrics) and (cached[1].anchored or not sections):
+                self.indexes.move_to_end(key)
+                return cached[1]
+
+        index = build_timing_index(lyrics_tokens.get(song_id, lyrics), duration_ms, sections)
+        if index is None:
+            return None
+
+        with self.lock:
+            self.indexes[key] = (hash(lyrics), index)
+            self.indexes.move_to_end(key)
+            while len(self.indexes) > self.max_entries:
+                self.indexes.popitem(last=False)
+        return index
+
+    def position(self, song_id: int, duration_ms: int, progress_ms: int) -> Tuple[Optional[int], Optional[int]]:
+        """(current line, next line start in ms) from an already built index of the track's duration"""
+        with self.lock:
+            cached = self.indexes.get((song_id, duration_ms))
+        if cached is None:
+            return None, None
+        return cached[1].position(progress_ms)
+
+
+# Global timing instance
+lyrics_timing = LyricsTiming()
@@ -0,0 +1,307 @@
+import re
+import zlib
+import struct
+import logging
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from .lyrics_store import token_store
+
+logger = logging.getLogger(__name__)
+
+WORD_PATTERN = re.compile(r"[\w']+")
+SECTION_HEADER = re.compile(r'^\[([^\]]*)\]$')
+
+RECORD_MAGIC = b'TOK1'
+# checksum, tokens, lines, sections, distinct words, wide local ids
+RECORD_HEADER = struct.Struct('<IIIIIB')
+
+
+class Vocabulary:
+    """Thread-safe interner mapping strings to dense integer ids"""
+
+    def __init__(self):
+        self.ids = {}
+        self.strings = []
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def intern(self, strings: List[str]) -> np.ndarray:
+        """Ids of many strings, adding unseen ones"""
+        # Only the distinct strings go through the locked, Python-level loop
+        distinct = dict.fromkeys(strings)
+        with self.lock:
+            ids = self.ids
+            for string in distinct:
+                string_id = ids.get(string)
+                if string_id is None:
+                    string_id = ids[string] = len(self.strings)
+                    self.strings.append(string)
+                distinct[string] = string_id
+        return np.fromiter(map(distinct.__getitem__, strings), dtype=np.uint32, count=len(strings))
+
+    def find(self, string: str) -> Optional[int]:
+        """Id of a string if it was interned, without adding it"""
+        return self.ids.get(string)
+
+    def lookup(self, ids) -> List[str]:
+        """Strings of interned ids"""
+        with self.lock:
+            return [self.strings[string_id] for string_id in ids]
+
+
+# Global vocabulary of lyric words, shared by every tokenized song
+vocabulary = Vocabulary()
+
+
+class TokenTable:
+    """
+    A value per vocabulary word, e.g. its syllable count or lexicon column
+
+    Values are computed from the word string once, the first time a lookup
+    sees the vocabulary has grown, so per-song work is a NumPy gather.
+    """
+
+    def __init__(self, function: Callable[[str], float], dtype):
+        self.function = function
+        self.values = np.empty(0, dtype=dtype)
+        self.lock = threading.Lock()
+
+    def __getitem__(self, ids: np.ndarray) -> np.ndarray:
+        values = self.values
+        if len(values) < len(vocabulary):
+            with self.lock:
+                size = len(vocabulary)
+                if len(self.values) < size:
+                    words = vocabulary.lookup(range(len(self.values), size))
+                    added = np.fromiter(map(self.function, words), dtype=self.values.dtype, count=len(words))
+                    self.values = np.concatenate((self.values, added))
+                values = self.values
+        return values[ids]
+
+
+def section_type(label: str) -> str:
+    """Normalized section type of a header label, e.g. "Chorus: Artist" -> "chorus" """
+    name = label.split(':')[0].strip().lower()
+    name = re.sub(r'[\d\s]+$', '', name)  # "Verse 2" -> "verse"
+    return re.sub(r'^(pre|post)[\s-]', r'\1-', name) or 'section'
+
+def line_hash(words: List[str]) -> int:
+    """Stable hash of a normalized line, equal for lines that differ only in case and punctuation"""
+    return zlib.crc32(' '.join(words).encode('utf-8'))
+
+def lyrics_checksum(lyrics: str) -> int:
+    return zlib.crc32(lyrics.encode('utf-8'))
+
+
+class TokenizedLyrics:
+    """
+    Compact token form of a song's lyrics
+
+    tokens holds global vocabulary ids of every word; lyric line i spans
+    tokens[line_offsets[i]:line_offsets[i + 1]] and has line number
+    line_numbers[i]. Line numbers count non-empty lines including section
+    headers, 1-based, the same as the annotations' lyrics_line_number.
+    Each section has its header's line number, label and the index of its
+    first lyric line.
+    """
+
+    __slots__ = ('tokens', 'line_offsets', 'line_numbers', 'line_hashes',
+                 'section_lines', 'section_starts', 'section_labels', 'checksum')
+
+    def __init__(self):
+        self.tokens = array('I')
+        self.line_offsets = array('I', [0])
+        self.line_numbers = array('I')
+        self.line_hashes = array('I')
+        self.section_lines = array('I')
+        self.section_starts = array('I')
+        self.section_labels = []
+        self.checksum = 0
+
+    def __len__(self) -> int:
+        return len(self.tokens)
+
+    @property
+    def line_count(self) -> int:
+        return len(self.line_numbers)
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the arrays, without object overhead"""
+        return sum(len(column) * column.itemsize for column in (
+            self.tokens, self.line_offsets, self.line_numbers, self.line_hashes,
+            self.section_lines, self.section_starts
+        )) + sum(map(len, self.section_labels))
+
+    def token_array(self) -> np.ndarray:
+        """Token ids as a zero-copy NumPy view"""
+        return np.frombuffer(self.tokens, dtype=np.uint32)
+
+    def line_lengths(self) -> np.ndarray:
+        return np.diff(np.frombuffer(self.line_offsets, dtype=np.uint32)).astype(np.int64)
+
+    def word_lines(self) -> np.ndarray:
+        """Line number of every token"""
+        return np.repeat(np.frombuffer(self.line_numbers, dtype=np.uint32).astype(np.int64), self.line_lengths())
+
+    def words(self, start: int = 0, stop: Optional[int] = None) -> List[str]:
+        return vocabulary.lookup(self.tokens[start:stop])
+
+    def sections(self) -> List[Dict]:
+        """Sections with type, label, first line number and lyric line count"""
+        ends = list(self.section_starts[1:]) + [self.line_count]
+        return [{
+            'type': section_type(label),
+            'label': label,
+            'start_line': header_line + 1,
+            'line_count': end - start
+        } for label, header_line, start, end in zip(self.section_labels, self.section_lines,
+                                                    self.section_starts, ends)]
+
+    def to_bytes(self) -> bytes:
+        """
+        Serialize for the token store
+
+        Global ids only mean something inside one process, so tokens are
+        written as indexes into the song's own list of distinct words,
+        which are re-interned on load.
+        """
+        distinct, local = np.unique(self.token_array(), return_inverse=True)
+        words = '\n'.join(vocabulary.lookup(distinct.tolist())).encode('utf-8')
+        labels = '\n'.join(self.section_labels).encode('utf-8')
+        wide = len(distinct) > 0xFFFF
+        return b''.join((
+            RECORD_MAGIC,
+            RECORD_HEADER.pack(self.checksum, len(self.tokens), self.line_count,
+                               len(self.section_labels), len(distinct), wide),
+            struct.pack('<II', len(words), len(labels)), words, labels,
+            local.astype(np.uint32 if wide else np.uint16).tobytes(),
+            self.line_offsets.tobytes(), self.line_numbers.tobytes(), self.line_hashes.tobytes(),
+            self.section_lines.tobytes(), self.section_starts.tobytes()
+        ))
+
+    @classmethod
+    def from_bytes(cls, record: bytes) -> 'TokenizedLyrics':
+        """Load a record written by to_bytes, interning its words"""
+        if record[:4] != RECORD_MAGIC:
+            raise ValueError('Not a token record')
+        checksum, n_tokens, n_lines, n_sections, n_distinct, wide = RECORD_HEADER.unpack_from(record, 4)
+        offset = 4 + RECORD_HEADER.size
+        words_length, labels_length = struct.unpack_from('<II', record, offset)
+        offset += 8
+        words = record[offset:offset + words_length].decode('utf-8').split('\n') if n_distinct else []
+        offset += words_length
+        labels = record[offset:offset + labels_length].decode('utf-8').split('\n') if n_sections else []
+        offset += labels_length
+
+        local_dtype = np.uint32 if wide else np.uint16
+        local = np.frombuffer(record, dtype=local_dtype, count=n_tokens, offset=offset)
+        offset += n_tokens * np.dtype(local_dtype).itemsize
+
+        doc = cls()
+        doc.checksum = checksum
+        doc.tokens.frombytes(vocabulary.intern(words)[local].tobytes())
+        doc.section_labels = labels
+        for column, count in ((doc.line_offsets, n_lines + 1), (doc.line_numbers, n_lines),
+                              (doc.line_hashes, n_lines), (doc.section_lines, n_sections),
+                              (doc.section_starts, n_sections)):
+            del column[:]
+            column.frombytes(record[offset:offset + 4 * count])
+            offset += 4 * count
+        return doc
+
+
+def tokenize(lyrics: str) -> TokenizedLyrics:
+    """Split cleaned lyrics into lowercase word tokens, lyric lines and sections"""
+    doc = TokenizedLyrics()
+    doc.checksum = lyrics_checksum(lyrics or '')
+    words = []
+    line_number = 0
+
+    for line in (lyrics or '').split('\n'):
+        line = line.strip()
+        if not line:
+            continue
+        line_number += 1
+
+        header = SECTION_HEADER.match(line) if line[0] == '[' else None
+        if header:
+            doc.section_lines.append(line_number)
+            doc.section_starts.append(len(doc.line_numbers))
+            doc.section_labels.append(header.group(1).strip())
+            continue
+
+        line_words = WORD_PATTERN.findall(line.lower())
+        words.extend(line_words)
+        doc.line_offsets.append(len(words))
+        doc.line_numbers.append(line_number)
+        doc.line_hashes.append(line_hash(line_words))
+
+    doc.tokens.frombytes(vocabulary.intern(words).tobytes())
+    return doc
+
+
+class LyricsTokens:
+    """
+    Tokenized lyrics per Genius song, built once and shared by every lyrics feature
+
+    A song is tokenized the first time its lyrics are seen and the result is
+    written to the token store next to the lyrics store, so other workers
+    and later runs load it instead of tokenizing again. Recently used songs
+    stay in memory.
+    """
+
+    def __init__(self, max_entries: int = 20000):
+        self.cache = OrderedDict()  # song_id -> (lyrics hash, tokens)
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+
+    def get(self, song_id: Optional[int], lyrics: Optional[str]) -> Optional[TokenizedLyrics]:
+        """Tokens of a song's lyrics, loaded or built on a miss"""
+        if not lyrics:
+            return None
+        if song_id is None:
+            return tokenize(lyrics)
+
+        with self.lock:
+            cached = self.cache.get(song_id)
+            if cached and cached[0] == hash(lyrics):
+                self.cache.move_to_end(song_id)
+                return cached[1]
+
+        doc = self._load(song_id, lyrics)
+        if doc is None:
+            doc = tokenize(lyrics)
+            if token_store.path is not None:
+                token_store.put_bytes(song_id, doc.to_bytes())
+
+        with self.lock:
+            self.cache[song_id] = (hash(lyrics), doc)
+            self.cache.move_to_end(song_id)
+            while len(self.cache) > self.max_entries:
+                self.cache.popitem(last=False)
+        return doc
+
+    @staticmethod
+    def _load(song_id: int, lyrics: str) -> Optional[TokenizedLyrics]:
+        """Stored tokens of a song, None if missing or made from other lyrics"""
+        record = token_store.get_bytes(song_id)
+        if record is None:
+            return None
+        try:
+            doc = TokenizedLyrics.from_bytes(record)
+        except (ValueError, struct.error) as e:
+            logger.warning(f"Ignoring unreadable token record of song {song_id}: {e}")
+            return None
+        return doc if doc.checksum == lyrics_checksum(lyrics) else None
+
+
+# Global tokenized lyrics instance
+lyrics_tokens = LyricsTokens()
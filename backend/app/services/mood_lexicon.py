@@ -0,0 +1,60 @@
+"""Valence lexicon for lyric mood scoring
+
+Hand-curated for song lyrics: words mapped to a valence from -3 (very
+negative) to 3 (very positive). Words not listed are neutral.
+"""
+
+VALENCE = {
+    # Positive
+    'love': 3, 'loved': 3, 'lovely': 3, 'lover': 2, 'loving': 3,
+    'happy': 3, 'happiness': 3, 'joy': 3, 'joyful': 3, 'glad': 2,
+    'smile': 2, 'smiles': 2, 'smiling': 2, 'laugh': 2, 'laughing': 2, 'laughter': 2,
+    'beautiful': 3, 'beauty': 2, 'pretty': 2, 'sweet': 2, 'sweetest': 2,
+    'heaven': 2, 'paradise': 2, 'angel': 2, 'angels': 2, 'blessed': 2, 'bless': 2,
+    'free': 2, 'freedom': 2, 'alive': 2, 'live': 1, 'living': 1,
+    'shine': 2, 'shining': 2, 'sunshine': 2, 'sun': 1, 'light': 1, 'bright': 2,
+    'dream': 1, 'dreams': 1, 'dreaming': 1, 'hope': 2, 'hoping': 1,
+    'kiss': 2, 'kisses': 2, 'hug': 2, 'hold': 1, 'together': 1, 'forever': 1,
+    'dance': 2, 'dancing': 2, 'party': 2, 'celebrate': 2, 'fun': 2,
+    'good': 2, 'great': 2, 'best': 2, 'better': 1, 'fine': 1, 'nice': 2,
+    'amazing': 3, 'wonderful': 3, 'perfect': 3, 'awesome': 3, 'magic': 2,
+    'gold': 1, 'golden': 2, 'win': 2, 'winning': 2, 'won': 2, 'victory': 2,
+    'strong': 1, 'brave': 2, 'proud': 2, 'rise': 1, 'high': 1, 'fly': 1, 'flying': 1,
+    'warm': 1, 'safe': 1, 'peace': 2, 'peaceful': 2, 'calm': 1, 'heal': 2,
+    'friend': 2, 'friends': 2, 'baby': 1, 'darling': 2, 'honey': 1,
+    'trust': 1, 'believe': 1, 'faith': 1, 'true': 1, 'kind': 1,
+    'yes': 1, 'yeah': 1, 'okay': 1, 'fresh': 1, 'new': 1,
+    'sing': 1, 'singing': 1, 'song': 1, 'music': 1, 'play': 1,
+    'heart': 1, 'soul': 1, 'fire': 1, 'wild': 1,
+    'rich': 1, 'money': 1, 'glow': 2, 'summer': 1,
+    'thank': 2, 'thanks': 2, 'grateful': 2, 'lucky': 2, 'luck': 1,
+    'cool': 1, 'excited': 2, 'thrill': 2, 'desire': 1, 'adore': 3,
+
+    # Negative
+    'hate': -3, 'hated': -3, 'hating': -3, 'hatred': -3,
+    'sad': -2, 'sadness': -2, 'sorrow': -2, 'unhappy': -2, 'depressed': -3,
+    'cry': -2, 'crying': -2, 'cried': -2, 'tears': -2, 'tear': -1, 'weep': -2,
+    'pain': -2, 'painful': -2, 'hurt': -2, 'hurts': -2, 'hurting': -2, 'ache': -2,
+    'broken': -2, 'break': -1, 'breaking': -2, 'broke': -1, 'shattered': -2,
+    'lonely': -2, 'alone': -1, 'loneliness': -2, 'empty': -2, 'lost': -2, 'lose': -2,
+    'die': -3, 'dying': -3, 'dead': -3, 'death': -3, 'kill': -3, 'killed': -3, 'killing': -3,
+    'blood': -2, 'bleed': -2, 'bleeding': -2, 'grave': -2, 'funeral': -2,
+    'dark': -1, 'darkness': -2, 'cold': -1, 'shadow': -1, 'shadows': -1,
+    'fear': -2, 'afraid': -2, 'scared': -2, 'scary': -2, 'terror': -3, 'panic': -2,
+    'angry': -2, 'anger': -2, 'mad': -1, 'rage': -2, 'fight': -1, 'fighting': -1,
+    'war': -2, 'enemy': -2, 'enemies': -2, 'gun': -2, 'guns': -2, 'bullet': -2,
+    'wrong': -2, 'bad': -2, 'worse': -2, 'worst': -3, 'evil': -3, 'devil': -2,
+    'hell': -2, 'damn': -1, 'sick': -2, 'poison': -2, 'toxic': -2,
+    'lie': -2, 'lies': -2, 'liar': -2, 'lying': -2, 'cheat': -2, 'betray': -3,
+    'goodbye': -1, 'leave': -1, 'leaving': -1, 'left': -1, 'gone': -1, 'miss': -1, 'missing': -1,
+    'regret': -2, 'sorry': -1, 'shame': -2, 'guilty': -2, 'blame': -2,
+    'tired': -1, 'weak': -1, 'fall': -1, 'falling': -1, 'fell': -1, 'down': -1,
+    'rain': -1, 'storm': -1, 'grey': -1, 'gray': -1, 'blue': -1,
+    'never': -1, 'nothing': -1, 'nobody': -1, 'no': -1, 'not': -1,
+    'trouble': -2, 'problem': -1, 'problems': -2, 'struggle': -2, 'suffer': -2,
+    'crazy': -1, 'insane': -1, 'demons': -2, 'ghost': -1, 'haunted': -2,
+    'jealous': -2, 'bitter': -2, 'cruel': -3, 'ugly': -2, 'stupid': -2,
+    'heartbreak': -3, 'heartbroken': -3, 'misery': -3, 'miserable': -3, 'despair': -3,
+    'worry': -1, 'worried': -1, 'anxious': -2, 'stress': -2, 'sigh': -1,
+    'end': -1, 'ending': -1, 'over': -1, 'fade': -1, 'fading': -1,
+}
@@ -0,0 +1,298 @@
+import time
+import heapq
+import random
+import logging
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any
+
+import spotipy
+from spotipy.oauth2 import SpotifyOAuth
+
+from .spotify_cache import spotify_cache
+from .lyrics_cache import lyrics_cache
+from .genius_client import get_genius_client
+from .lyrics_prefetcher import lyrics_prefetcher
+from .lyrics_timing import lyrics_timing
+
+logger = logging.getLogger(__name__)
+
+
+def format_current_track(current_track: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Format a Spotify currently-playing payload as a /spotify/current-track response"""
+    if not current_track or not current_track.get('item'):
+        return {
+            'success': True,
+            'playing': False,
+            'message': 'No track currently playing',
+            'fetched_at': int(time.time() * 1000)
+        }
+
+    track = current_track['item']
+    artists = [artist['name'] for artist in track['artists']]
+
+    return {
+        'success': True,
+        'playing': True,
+        'track': {
+            'id': track['id'],
+            'name': track['name'],
+            'artists': artists,
+            'album': {
+                'name': track['album']['name'],
+                'images': track['album'].get('images', [])
+            },
+            'duration_ms': track['duration_ms'],
+            'progress_ms': current_track.get('progress_ms', 0),
+            'is_playing': current_track.get('is_playing', False),
+            'external_urls': track.get('external_urls', {}),
+            'preview_url': track.get('preview_url'),
+            'popularity': track.get('popularity', 0),
+            'explicit': track.get('explicit', False)
+        },
+        'fetched_at': int(time.time() * 1000)
+    }
+
+
+class PlaybackPoller:
+    """Server-side Spotify playback poller
+
+    Keeps a schedule of active users and polls each one at an interval suited
+    to their playback state. Poll results are written to the Spotify cache so
+    client requests are answered from memory, and on a track change the Genius
+    match and lyrics bundle are loaded speculatively so they are warm before
+    the client asks for them, and the next tracks in the user's queue are
+    handed to the lyrics prefetcher. Users drop off the schedule once their
+    client stops asking for playback.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.enabled = False
+        self.users = {}
+        self.schedule = []  # Heap of (due_time, user_id)
+        self.condition = threading.Condition()
+        self.thread = None
+        self.poll_executor = None
+        self.warm_executor = None
+        self.audio_analysis = False
+
+        # Poll intervals by playback state (seconds)
+        self.playing_interval = 5
+        self.paused_interval = 15
+        self.idle_interval = 30
+        self.error_interval = 60
+        self.jitter = 0.1  # +/-10% so users that registered together drift apart
+        self.min_spacing = 0.1  # Minimum gap between any two polls
+        self.track_end_margin = 0.75  # Poll just after the current track should end
+        self.idle_timeout = 5 * 60  # Drop users whose client hasn't asked for 5 minutes
+
+    def init_app(self, app):
+        """Bind the poller to a Flask app"""
+        self.app = app
+        self.enabled = app.config.get('PLAYBACK_POLLER_ENABLED', True)
+        self.audio_analysis = app.config.get('AUDIO_ANALYSIS_ENABLED', False)
+
+    def register(self, user_id: str, token_info: Dict[str, Any]):
+        """Add a user to the schedule, or refresh their token and activity"""
+        if not self.enabled or not token_info or user_id == 'anonymous':
+            return
+
+        now = time.time()
+        with self.condition:
+            user = self.users.get(user_id)
+            if user:
+                user['last_seen'] = now
+                # Keep the freshest token (the session may have refreshed it)
+                if token_info.get('expires_at', 0) >= user['token_info'].get('expires_at', 0):
+                    user['token_info'] = token_info
+                return
+
+            self.users[user_id] = {
+                'token_info': token_info,
+                'last_seen': now,
+                'track_id': None,
+                'due': None
+            }
+
+            # Stagger first polls across the interval based on a stable hash of the user
+            phase = (zlib.crc32(user_id.encode('utf-8')) % 1000) / 1000.0
+            self._schedule(user_id, now + phase * self.playing_interval)
+            self._ensure_started()
+
+        logger.info(f"Registered user {user_id} with playback poller")
+
+    def unregister(self, user_id: str):
+        """Remove a user from the schedule"""
+        with self.condition:
+            if self.users.pop(user_id, None):
+                logger.info(f"Unregistered user {user_id} from playback poller")
+            # Stale heap entries are skipped when they come due
+
+    def _schedule(self, user_id: str, due: float):
+        """Put a user on the heap (caller holds condition)"""
+        self.users[user_id]['due'] = due
+        heapq.heappush(self.schedule, (due, user_id))
+        self.condition.notify()
+
+    def _ensure_started(self):
+        """Start the scheduler thread on first use (caller holds condition)"""
+        if self.thread and self.thread.is_alive():
+            return
+
+        self.poll_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='playback-poll')
+        self.warm_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='lyrics-warm')
+        self.thread = threading.Thread(target=self._run, name='playback-poller', daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        """Scheduler loop: dispatch polls as they come due"""
+        last_dispatch = 0.0
+
+        while True:
+            with self.condition:
+                while True:
+                    if not self.schedule:
+                        self.condition.wait()
+                        continue
+
+                    due, user_id = self.schedule[0]
+                    # Spread polls that came due together instead of firing them at once
+                    due = max(due, last_dispatch + self.min_spacing)
+                    wait = due - time.time()
+                    if wait <= 0:
+                        break
+                    self.condition.wait(timeout=wait)
+
+                scheduled_due, user_id = heapq.heappop(self.schedule)
+                user = self.users.get(user_id)
+
+                # Skip entries left behind by unregister or rescheduling
+                if not user or user['due'] != scheduled_due:
+                    continue
+
+                if time.time() - user['last_seen'] > self.idle_timeout:
+                    del self.users[user_id]
+                    logger.info(f"Expired idle user {user_id} from playback poller")
+                    continue
+
+                user['due'] = None
+                last_dispatch = time.time()
+
+            self.poll_executor.submit(self._poll_user, user_id)
+
+    def _get_client(self, user: Dict[str, Any]) -> spotipy.Spotify:
+        """Get a Spotify client for a scheduled user, refreshing their token if needed"""
+        token_info = user['token_info']
+
+        sp_oauth = SpotifyOAuth(
+            client_id=self.app.config['SPOTIFY_CLIENT_ID'],
+            client_secret=self.app.config['SPOTIFY_CLIENT_SECRET'],
+            redirect_uri=self.app.config['SPOTIFY_REDIRECT_URI'],
+            scope=self.app.config['SPOTIFY_SCOPE'],
+            cache_handler=None
+        )
+
+        if sp_oauth.is_token_expired(token_info):
+            token_info = sp_oauth.refresh_access_token(token_info['refresh_token'])
+            user['token_info'] = token_info
+
+        return spotipy.Spotify(auth=token_info['access_token'])
+
+    def _next_interval(self, response_data: Dict[str, Any]) -> float:
+        """Pick the next poll interval from the playback state"""
+        if not response_data.get('playing'):
+            return self.idle_interval
+
+        track = response_data['track']
+        if not track.get('is_playing'):
+            return self.paused_interval
+
+        interval = self.playing_interval
+        remaining = (track.get('duration_ms', 0) - track.get('progress_ms', 0)) / 1000.0
+        if 0 <= remaining < interval:
+            # Catch the track change as soon as it happens
+            interval = remaining + self.track_end_margin
+
+        return interval
+
+    def _poll_user(self, user_id: str):
+        """Poll one user's playback and reschedule them"""
+        with self.condition:
+            user = self.users.get(user_id)
+        if not user:
+            return
+
+        interval = self.error_interval
+        try:
+            sp = self._get_client(user)
+            current_track = sp.current_user_playing_track()
+            response_data = format_current_track(current_track)
+
+            spotify_cache.cache_response(user_id, 'current-track', response_data)
+            interval = self._next_interval(response_data)
+
+            track_id = response_data['track']['id'] if response_data.get('playing') else None
+            if track_id and track_id != user['track_id']:
+                logger.info(f"Detected track change for {user_id}: {response_data['track']['name']}")
+                self.warm_executor.submit(self._warm_lyrics, response_data['track'])
+                self.warm_executor.submit(self._prefetch_up_next, user_id, sp)
+                if self.audio_analysis and not lyrics_timing.has_audio_sections(track_id):
+                    self.warm_executor.submit(self._load_audio_sections, track_id, sp)
+            user['track_id'] = track_id
+
+        except spotipy.exceptions.SpotifyException as e:
+            if e.http_status == 429:
+                interval = max(float(getattr(e, 'retry_after', None) or 0), self.error_interval)
+                logger.warning(f"Playback poller rate limited for {user_id}, backing off {interval}s")
+            else:
+                logger.warning(f"Playback poll failed for {user_id}: {e}")
+        except Exception as e:
+            logger.error(f"Unexpected error polling {user_id}: {e}")
+
+        interval *= 1 + random.uniform(-self.jitter, self.jitter)
+
+        with self.condition:
+            if user_id in self.users:
+                self._schedule(user_id, time.time() + interval)
+
+    def _warm_lyrics(self, track: Dict[str, Any]):
+        """Speculatively resolve the Genius match and lyrics bundle for a track"""
+        try:
+            with self.app.app_context():
+                genius_client = get_genius_client()
+                if not genius_client:
+                    return
+
+                lyrics_cache.warm(genius_client, {
+                    'name': track['name'],
+                    'artists': track['artists'],
+                    'album': {'name': track['album']['name']}
+                })
+        except Exception as e:
+            logger.warning(f"Lyrics warm-up failed for '{track.get('name')}': {e}")
+
+    def _load_audio_sections(self, track_id: str, sp: spotipy.Spotify):
+        """Fetch a track's audio-analysis sections to anchor the lyrics line timing"""
+        try:
+            analysis = sp.audio_analysis(track_id)
+            sections = [
+                {'start': section['start'], 'duration': section['duration']}
+                for section in (analysis or {}).get('sections', [])
+            ]
+            lyrics_timing.put_audio_sections(track_id, sections)
+        except Exception as e:
+            logger.warning(f"Could not load audio analysis for {track_id}: {e}")
+
+    def _prefetch_up_next(self, user_id: str, sp: spotipy.Spotify):
+        """Queue lyrics prefetch for the next tracks in the user's playback queue"""
+        try:
+            queued = lyrics_prefetcher.enqueue_up_next(sp.queue())
+            if queued:
+                logger.info(f"Queued lyrics prefetch for {queued} up-next tracks of {user_id}")
+        except Exception as e:
+            logger.warning(f"Could not read playback queue for {user_id}: {e}")
+
+# Global poller instance
+playback_poller = PlaybackPoller()
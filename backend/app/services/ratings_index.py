@@ -0,0 +1,537 @@
+import re
+import heapq
+import bisect
+import uuid
+import unicodedata
+from collections import OrderedDict
+from fractions import Fraction
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Ratings are bucketed at 0.1 resolution: bucket i holds ratings that round to i / 10
+RATING_BUCKETS = 101
+
+# Listing orders: sort key of an entry, and whether the listing runs from the end
+SORT_ORDERS = {
+    'title': (lambda entry: ((entry['song'].get('title') or '').lower(),), False),
+    'artist': (lambda entry: ((entry['song'].get('artist') or '').lower(),), False),
+    'rating': (lambda entry: (entry['rating'],), True),
+    'date': (lambda entry: (entry['updated_at'],), True)
+}
+
+# Type of the sort value in a listing position key (sort value, song key)
+SORT_VALUE_TYPES = {
+    'title': str,
+    'artist': str,
+    'rating': (int, float),
+    'date': str
+}
+
+
+# Searchable song fields and how much a match in each counts
+SEARCH_FIELDS = (('title', 3), ('artist', 2), ('album', 1))
+
+TOKEN_PATTERN = re.compile(r'\w+')
+
+# Shorter last words are matched as whole words only; a one-letter prefix matches most of a library
+MIN_PREFIX_LENGTH = 2
+
+# Search score units per field weight point: a partial (prefix) word counts a bit
+# less than the same word typed out. Integers, so score ties compare exactly.
+WHOLE_WORD_SCORE = 5
+PARTIAL_WORD_SCORE = 4
+
+
+def search_tokens(text: Optional[str]) -> List[str]:
+    """Lowercase, accent-free word tokens of a string"""
+    if not text:
+        return []
+    normalized = unicodedata.normalize('NFKD', text.lower())
+    normalized = ''.join(char for char in normalized if not unicodedata.combining(char))
+    return TOKEN_PATTERN.findall(normalized)
+
+def rating_bucket(rating: float) -> int:
+    """Histogram bucket of a 0.0-10.0 rating"""
+    return min(max(int(round(rating * 10)), 0), RATING_BUCKETS - 1)
+
+
+class FenwickTree:
+    """Binary indexed tree over counts, with O(log n) updates and prefix sums"""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.tree = [0] * (size + 1)
+
+    def add(self, index: int, delta: int):
+        """Add delta to the count at index"""
+        i = index + 1
+        while i <= self.size:
+            self.tree[i] += delta
+            i += i & -i
+
+    def prefix_sum(self, end: int) -> int:
+        """Sum of the counts in [0, end)"""
+        total = 0
+        i = min(end, self.size)
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+    def range_sum(self, start: int, end: int) -> int:
+        """Sum of the counts in [start, end)"""
+        return self.prefix_sum(end) - self.prefix_sum(start)
+
+
+class RatingMultiset:
+    """Multiset of rating values with O(1) min/max"""
+
+    def __init__(self):
+        self.counts = {}
+        self.values = []  # Distinct values, sorted
+
+    def add(self, value: float):
+        """Add one occurrence of value"""
+        if value in self.counts:
+            self.counts[value] += 1
+        else:
+            self.counts[value] = 1
+            bisect.insort(self.values, value)
+
+    def remove(self, value: float):
+        """Remove one occurrence of value"""
+        self.counts[value] -= 1
+        if not self.counts[value]:
+            del self.counts[value]
+            del self.values[bisect.bisect_left(self.values, value)]
+
+    def min(self) -> Optional[float]:
+        return self.values[0] if self.values else None
+
+    def max(self) -> Optional[float]:
+        return self.values[-1] if self.values else None
+
+
+class UserRatingsIndex:
+    """In-memory aggregates over one user's ratings, kept up to date on every write
+
+    Writes are idempotent per song, so replaying a write the index already
+    saw is harmless.
+
+    Every write also gets the next number of a per-index change sequence.
+    Sequence numbers are only comparable within one epoch; a rebuilt index
+    (e.g. after a restart) starts a new epoch.
+    """
+
+    def __init__(self, entries: Optional[Dict[str, Dict]] = None):
+        self.entries = {}  # song_key -> rating entry
+        self.ratings = {}  # song_key -> rating value
+        # Per listing order: sorted (sort key..., song_key) tuples, keys precomputed
+        self.sorted_keys = {sort_by: [] for sort_by in SORT_ORDERS}
+        self.total = Fraction(0)  # Exact, so incremental updates never drift
+        self.multiset = RatingMultiset()
+        self.histogram = FenwickTree(RATING_BUCKETS)
+
+        self.epoch = uuid.uuid4().hex[:12]
+        self.seq = 0
+        self.changes = OrderedDict()  # song_key -> (seq, entry or None for a delete), oldest first
+
+        # Search: token -> {song_key: field weight}, the same postings sorted best first
+        # as (-weight, title, song_key), each song's tokens, and the sorted tokens for prefix lookups
+        self.token_songs = {}
+        self.token_postings = {}
+        self.song_tokens = {}
+        self.tokens = []
+
+        # Postings are appended while loading and sorted once at the end
+        for song_key, entry in (entries or {}).items():
+            self._put(song_key, entry, sort_postings=False)
+        for postings in self.token_postings.values():
+            postings.sort()
+
+    def put(self, song_key: str, entry: Dict):
+        """Insert or update the rating of a song"""
+        self._put(song_key, entry, sort_postings=True)
+
+    def _put(self, song_key: str, entry: Dict, sort_postings: bool):
+        self._discard(song_key)
+        self._record_change(song_key, entry)
+
+        self.entries[song_key] = entry
+        for sort_by, (key_func, _) in SORT_ORDERS.items():
+            bisect.insort(self.sorted_keys[sort_by], key_func(entry) + (song_key,))
+
+        tokens = self.song_tokens[song_key] = self._song_tokens(entry)
+        title = self._title_key(entry)
+        for token, weight in tokens.items():
+            songs = self.token_songs.get(token)
+            if songs is None:
+                songs = self.token_songs[token] = {}
+                self.token_postings[token] = []
+                bisect.insort(self.tokens, token)
+            songs[song_key] = weight
+            if sort_postings:
+                bisect.insort(self.token_postings[token], (-weight, title, song_key))
+            else:
+                self.token_postings[token].append((-weight, title, song_key))
+
+        rating = entry['rating']
+        self.ratings[song_key] = rating
+        self.total += Fraction(rating)
+        self.multiset.add(rating)
+        self.histogram.add(rating_bucket(rating), 1)
+
+    def remove(self, song_key: str):
+        """Remove the rating of a song if present"""
+        if self._discard(song_key):
+            self._record_change(song_key, None)
+
+    def _discard(self, song_key: str) -> bool:
+        """Drop a song from the aggregates, returns False if it wasn't there"""
+        entry = self.entries.pop(song_key, None)
+        if entry is None:
+            return False
+
+        for sort_by, (key_func, _) in SORT_ORDERS.items():
+            keys = self.sorted_keys[sort_by]
+            del keys[bisect.bisect_left(keys, key_func(entry) + (song_key,))]
+
+        title = self._title_key(entry)
+        for token, weight in self.song_tokens.pop(song_key).items():
+            songs = self.token_songs[token]
+            del songs[song_key]
+            if songs:
+                postings = self.token_postings[token]
+                del postings[bisect.bisect_left(postings, (-weight, title, song_key))]
+            else:
+                del self.token_songs[token]
+                del self.token_postings[token]
+                del self.tokens[bisect.bisect_left(self.tokens, token)]
+
+        rating = self.ratings.pop(song_key)
+        self.total -= Fraction(rating)
+        self.multiset.remove(rating)
+        self.histogram.add(rating_bucket(rating), -1)
+        return True
+
+    @staticmethod
+    def _song_tokens(entry: Dict) -> Dict[str, int]:
+        """Search tokens of a song with the weight of the best field they appear in"""
+        tokens = {}
+        song = entry['song']
+        for field, weight in SEARCH_FIELDS:
+            for token in search_tokens(song.get(field)):
+                if weight > tokens.get(token, 0):
+                    tokens[token] = weight
+        return tokens
+
+    @staticmethod
+    def _title_key(entry: Dict) -> str:
+        """Secondary search order: songs with the same score list by title"""
+        return (entry['song'].get('title') or '').lower()
+
+    def _prefix_tokens(self, prefix: str) -> List[str]:
+        """Indexed tokens starting with prefix"""
+        start = bisect.bisect_left(self.tokens, prefix)
+        end = bisect.bisect_left(self.tokens, prefix + '\uffff')
+        return self.tokens[start:end]
+
+    def _prefix_score(self, song_key: str, prefix: str) -> Optional[int]:
+        """Score of a song's best token starting with prefix, None if it has none"""
+        best = None
+        for token, weight in self.song_tokens[song_key].items():
+            if token.startswith(prefix):
+                score = weight * (WHOLE_WORD_SCORE if token == prefix else PARTIAL_WORD_SCORE)
+                if best is None or score > best:
+                    best = score
+        return best
+
+    @staticmethod
+    def _scored(postings: Iterable[Tuple[int, str, str]], units: int) -> Iterator[Tuple[int, str, str]]:
+        """(-weight, title, song_key) postings as (-score, title, song_key), in the same order"""
+        for negative_weight, title, song_key in postings:
+            yield negative_weight * units, title, song_key
+
+    def _prefix_postings(self, prefix: str, tokens: List[str]) -> Iterator[Tuple[int, str, str]]:
+        """Songs with a token starting with prefix as (-score, title, song_key), best first"""
+        # Partial words all score alike, so their raw postings merge as they are
+        partial = heapq.merge(*(self.token_postings[token] for token in tokens if token != prefix))
+        streams = [self._scored(partial, PARTIAL_WORD_SCORE)]
+        if prefix in self.token_postings:
+            streams.append(self._scored(self.token_postings[prefix], WHOLE_WORD_SCORE))
+
+        # A song matching several tokens comes first with its best one
+        seen = set()
+        for negative_score, title, song_key in heapq.merge(*streams):
+            if song_key not in seen:
+                seen.add(song_key)
+                yield negative_score, title, song_key
+
+    def search(self, query: str, limit: int = 20) -> List[Dict]:
+        """
+        Songs whose title, artist or album contain every word of the query
+
+        The last word is matched as a prefix (from MIN_PREFIX_LENGTH letters)
+        so results update while typing. Matches in the title rank above
+        artist, then album.
+
+        Candidates come from the rarest term's postings, best first, and are
+        checked against the other terms. The scan stops once no remaining
+        candidate can make the top `limit`, so a common word costs about as
+        much as a rare one.
+        """
+        terms = search_tokens(query)
+        if not terms or limit <= 0:
+            return []
+
+        prefix = terms[-1] if len(terms[-1]) >= MIN_PREFIX_LENGTH else None
+        words = terms[:-1] if prefix else terms
+        if any(word not in self.token_songs for word in words):
+            return []
+
+        # Candidate sources as (size, best score, postings), words before the prefix on ties
+        sources = [(len(self.token_songs[word]), -self.token_postings[word][0][0] * WHOLE_WORD_SCORE, word)
+                   for word in words]
+        if prefix:
+            prefix_tokens = self._prefix_tokens(prefix)
+            if not prefix_tokens:
+                return []
+            best = max(-self.token_postings[token][0][0] *
+                       (WHOLE_WORD_SCORE if token == prefix else PARTIAL_WORD_SCORE)
+                       for token in prefix_tokens)
+            sources.append((sum(len(self.token_songs[token]) for token in prefix_tokens), best, None))
+
+        driver = min(range(len(sources)), key=lambda i: sources[i][0])
+        driver_term = sources[driver][2]
+        # The most the terms other than the driver can add to a candidate's score
+        rest_bound = sum(best for i, (_, best, _) in enumerate(sources) if i != driver)
+        other_words = [word for i, (_, _, word) in enumerate(sources) if i != driver and word is not None]
+        check_prefix = prefix is not None and driver_term is not None
+
+        if driver_term is None:
+            candidates = self._prefix_postings(prefix, prefix_tokens)
+        else:
+            candidates = self._scored(self.token_postings[driver_term], WHOLE_WORD_SCORE)
+
+        top = []  # Best (-score, title, song_key) so far, at most limit
+        for negative_score, title, song_key in candidates:
+            # Candidates come best first, so nothing after this one can beat the worst kept result
+            if len(top) == limit and (negative_score - rest_bound, title, song_key) > top[-1]:
+                break
+
+            score = -negative_score
+            for word in other_words:
+                weight = self.token_songs[word].get(song_key)
+                if weight is None:
+                    break
+                score += weight * WHOLE_WORD_SCORE
+            else:
+                if check_prefix:
+                    prefix_score = self._prefix_score(song_key, prefix)
+                    if prefix_score is None:
+                        continue
+                    score += prefix_score
+
+                key = (-score, title, song_key)
+                if len(top) < limit or key < top[-1]:
+                    bisect.insort(top, key)
+                    del top[limit:]
+
+        return [self.entries[song_key] for _, _, song_key in top]
+
+    def _record_change(self, song_key: str, entry: Optional[Dict]):
+        """Log a write as the newest change of its song"""
+        self.seq += 1
+        self.changes.pop(song_key, None)
+        self.changes[song_key] = (self.seq, entry)
+
+    def changes_since(self, seq: int) -> Tuple[List[Dict], List[str]]:
+        """
+        Get the songs written after sequence number seq
+
+        Returns (upserts, deleted): the current entries of songs rated or
+        re-rated since then, and the keys of songs deleted since then.
+        Only the latest change of each song is kept, so the cost is
+        proportional to the number of songs changed.
+        """
+        upserts = []
+        deleted = []
+        for song_key, (change_seq, entry) in reversed(self.changes.items()):
+            if change_seq <= seq:
+                break
+            if entry is None:
+                deleted.append(song_key)
+            else:
+                upserts.append(entry)
+
+        upserts.reverse()
+        deleted.reverse()
+        return upserts, deleted
+
+    def page(self, sort_by: str, limit: Optional[int] = None,
+             after: Optional[Tuple] = None) -> Tuple[List[Dict], Optional[Tuple]]:
+        """
+        Get entries in listing order, starting after the position key `after`
+
+        Returns (entries, next_after) where next_after is the position key of
+        the last returned entry, or None when the listing is exhausted.
+        Positions are keys, not offsets, so writes between pages don't make
+        the listing skip or repeat entries.
+        """
+        keys = self.sorted_keys[sort_by]
+        reverse = SORT_ORDERS[sort_by][1]
+
+        if reverse:
+            end = len(keys) if after is None else bisect.bisect_left(keys, after)
+            start = 0 if limit is None else max(end - limit, 0)
+            selected = keys[start:end][::-1]
+            exhausted = start == 0
+        else:
+            start = 0 if after is None else bisect.bisect_right(keys, after)
+            end = len(keys) if limit is None else start + limit
+            selected = keys[start:end]
+            exhausted = end >= len(keys)
+
+        entries = [self.entries[key[-1]] for key in selected]
+        next_after = None if exhausted or not selected else selected[-1]
+        return entries, next_after
+
+    def stats(self) -> Dict:
+        """Count, average, highest and lowest rating"""
+        if not self.ratings:
+            return {
+                'total_ratings': 0,
+                'average_rating': 0.0,
+                'highest_rating': 0.0,
+                'lowest_rating': 0.0
+            }
+
+        return {
+            'total_ratings': len(self.ratings),
+            'average_rating': round(float(self.total / len(self.ratings)), 1),
+            'highest_rating': self.multiset.max(),
+            'lowest_rating': self.multiset.min()
+        }
+
+    def percentile_rank(self, rating: float) -> float:
+        """Percentage of the user's ratings below a rating, counting ties as half"""
+        if not self.ratings:
+            return 0.0
+
+        bucket = rating_bucket(rating)
+        below = self.histogram.prefix_sum(bucket)
+        equal = self.histogram.range_sum(bucket, bucket + 1)
+        return round(100.0 * (below + equal / 2) / len(self.ratings), 1)
+
+    def distribution(self, bin_width: int = 10) -> List[Dict]:
+        """
+        Rating histogram in bins of bin_width buckets (10 buckets = 1.0 points)
+
+        The last bin also holds 10.0, so every bin covers the same width.
+        """
+        bins = []
+        for start in range(0, RATING_BUCKETS - 1, bin_width):
+            end = min(start + bin_width, RATING_BUCKETS - 1)
+            # Fold the 10.0 bucket into the last bin
+            count_end = RATING_BUCKETS if end == RATING_BUCKETS - 1 else end
+            bins.append({
+                'from': start / 10,
+                'to': end / 10,
+                'count': self.histogram.range_sum(start, count_end)
+            })
+        return bins
+
+
+class SongRatingsIndex:
+    """Cross-user aggregates per song and a top-rated leaderboard
+
+    Songs are ranked by their mean rating shrunk toward the middle of the
+    scale, so one 10.0 doesn't outrank a song many listeners love. The
+    prior is fixed, which keeps each song's score independent of every
+    other song and the leaderboard cheap to maintain.
+    """
+
+    PRIOR_RATING = 5
+    PRIOR_WEIGHT = 2
+
+    def __init__(self):
+        self.songs = {}  # song_key -> aggregate
+        self.leaderboard = []  # Sorted (-score, -count, song_key)
+
+    def _score(self, aggregate: Dict) -> float:
+        """Shrunk mean rating used for ranking"""
+        return float((aggregate['sum'] + self.PRIOR_RATING * self.PRIOR_WEIGHT) /
+                     (aggregate['count'] + self.PRIOR_WEIGHT))
+
+    def _rank_key(self, song_key: str, aggregate: Dict) -> Tuple:
+        return (-self._score(aggregate), -aggregate['count'], song_key)
+
+    def put(self, user_id: str, song_key: str, entry: Dict):
+        """Insert or update one user's rating of a song"""
+        self.remove(user_id, song_key)
+
+        aggregate = self.songs.get(song_key)
+        if aggregate is None:
+            aggregate = {'count': 0, 'sum': Fraction(0), 'histogram': [0] * 10, 'users': {}, 'song': None}
+            self.songs[song_key] = aggregate
+        else:
+            self._unrank(song_key, aggregate)
+
+        rating = entry['rating']
+        aggregate['users'][user_id] = rating
+        aggregate['count'] += 1
+        aggregate['sum'] += Fraction(rating)
+        aggregate['histogram'][min(int(rating), 9)] += 1
+        aggregate['song'] = entry['song']
+        bisect.insort(self.leaderboard, self._rank_key(song_key, aggregate))
+
+    def remove(self, user_id: str, song_key: str):
+        """Remove one user's rating of a song if present"""
+        aggregate = self.songs.get(song_key)
+        if aggregate is None or user_id not in aggregate['users']:
+            return
+
+        self._unrank(song_key, aggregate)
+        rating = aggregate['users'].pop(user_id)
+        aggregate['count'] -= 1
+        aggregate['sum'] -= Fraction(rating)
+        aggregate['histogram'][min(int(rating), 9)] -= 1
+
+        if aggregate['count']:
+            bisect.insort(self.leaderboard, self._rank_key(song_key, aggregate))
+        else:
+            del self.songs[song_key]
+
+    def _unrank(self, song_key: str, aggregate: Dict):
+        """Take a song out of the leaderboard before its aggregate changes"""
+        position = bisect.bisect_left(self.leaderboard, self._rank_key(song_key, aggregate))
+        del self.leaderboard[position]
+
+    def summary(self, song_key: str) -> Optional[Dict]:
+        """Rating count, average and 1.0-wide histogram of a song"""
+        aggregate = self.songs.get(song_key)
+        if aggregate is None:
+            return None
+
+        return {
+            'song': aggregate['song'],
+            'total_ratings': aggregate['count'],
+            'average_rating': round(float(aggregate['sum'] / aggregate['count']), 1),
+            'score': round(self._score(aggregate), 2),
+            'distribution': [
+                {'from': float(i), 'to': float(i + 1), 'count': count}
+                for i, count in enumerate(aggregate['histogram'])
+            ]
+        }
+
+    def top(self, limit: int = 10) -> List[Dict]:
+        """The top rated songs, best first"""
+        results = []
+        for _, _, song_key in self.leaderboard[:limit]:
+            aggregate = self.songs[song_key]
+            results.append({
+                'song': aggregate['song'],
+                'total_ratings': aggregate['count'],
+                'average_rating': round(float(aggregate['sum'] / aggregate['count']), 1),
+                'score': round(self._score(aggregate), 2)
+            })
+        return results
@@ -0,0 +1,240 @@
+import os
+import json
+import time
+import atexit
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from .ratings_storage import RatingsStorage, write_json_atomic
+
+logger = logging.getLogger(__name__)
+
+
+class LogRatingsStorage(RatingsStorage):
+    """Append-only log storage for song ratings, compatible with ratings.json
+
+    Ratings are served from memory. Writes are buffered for a short window in
+    which repeated writes to the same (user, song) coalesce into one, then the
+    buffer is appended to ``ratings.json.log`` with a single fsync. Once the
+    log grows past a threshold a background compaction folds it into the
+    ``ratings.json`` snapshot (same format as the JSON engine) and swaps the
+    snapshot in atomically.
+
+    Writes acknowledged within the last flush interval can be lost on a
+    crash. The log has a single writer, so only one process may use it.
+    """
+
+    IMPORT_BATCH_SIZE = 1000
+
+    def __init__(self, storage_path: str = None, flush_interval: float = 0.25,
+                 compact_threshold: int = 1000):
+        super().__init__(storage_path)
+
+        self.log_path = f"{self.storage_path}.log"
+        self.compacting_path = f"{self.storage_path}.log.compacting"
+        self.flush_interval = flush_interval
+        self.compact_threshold = compact_threshold
+
+        self.lock = threading.Lock()
+        self.io_lock = threading.Lock()  # Serializes log appends and rotation
+        self.flush_wanted = threading.Condition(self.lock)
+        self.pending = OrderedDict()  # (user_id, song_key) -> op, coalesced
+        self.log_ops = 0
+        self.compacting = False
+
+        self.ratings = self._recover()
+        self.log_file = open(self.log_path, 'a', encoding='utf-8')
+        if self.log_file.tell() and not self._ends_with_newline(self.log_path):
+            # Terminate a torn last line so the next op starts on its own line
+            self.log_file.write('\n')
+
+        self.flusher = threading.Thread(target=self._run_flusher, name='ratings-log-flush', daemon=True)
+        self.flusher.start()
+        atexit.register(self.flush)
+
+    def _recover(self) -> Dict:
+        """Rebuild state from the snapshot and any logs not yet compacted"""
+        ratings = self._load_ratings()
+
+        # A leftover compacting log means a crash mid-compaction. Its ops are
+        # older than the live log's, and replaying whole-entry ops is idempotent.
+        for path in (self.compacting_path, self.log_path):
+            if not os.path.exists(path):
+                continue
+
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        op = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Torn write at the tail of the log
+                        logger.warning(f"Skipping malformed ratings log line in {path}")
+                        continue
+                    self._apply(ratings, op)
+                    self.log_ops += 1
+
+        if self.log_ops:
+            logger.info(f"Replayed {self.log_ops} ratings log operations")
+        return ratings
+
+    @staticmethod
+    def _ends_with_newline(path: str) -> bool:
+        """Check whether a non-empty file ends with a newline"""
+        with open(path, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b'\n'
+
+    @staticmethod
+    def _apply(ratings: Dict, op: Dict):
+        """Apply one log operation to a ratings dict"""
+        user_ratings = ratings.setdefault(op['user'], {})
+        if op['op'] == 'put':
+            user_ratings[op['song']] = op['entry']
+        else:
+            user_ratings.pop(op['song'], None)
+
+    def _append(self, user_id: str, song_key: str, op: Dict):
+        """Queue an operation for the next flush (caller holds lock)"""
+        key = (user_id, song_key)
+        # Drop any earlier write to the same song in this window
+        self.pending.pop(key, None)
+        self.pending[key] = op
+        self.flush_wanted.notify()
+
+    def _storage_version(self):
+        """Ratings live in memory and have a single writer, so the indexes never go stale"""
+        return None
+
+    def _read_entry(self, user_id: str, song_key: str) -> Optional[Dict]:
+        """Read one rating entry"""
+        with self.lock:
+            return self.ratings.get(user_id, {}).get(song_key)
+
+    def _store_entry(self, user_id: str, song_key: str, entry: Dict) -> Dict:
+        """Insert or replace a rating entry, keeping the original rated_at"""
+        with self.lock:
+            user_ratings = self.ratings.setdefault(user_id, {})
+
+            # Check if updating existing rating
+            if song_key in user_ratings:
+                entry['rated_at'] = user_ratings[song_key].get('rated_at', entry['rated_at'])
+
+            user_ratings[song_key] = entry
+            self._append(user_id, song_key, {'op': 'put', 'user': user_id, 'song': song_key, 'entry': entry})
+
+        return entry
+
+    def _store_entries(self, user_id: str, entries: List[Tuple[str, Dict]]) -> List[Tuple[str, Dict]]:
+        """Insert or replace many entries of a user, flushed together"""
+        with self.lock:
+            user_ratings = self.ratings.setdefault(user_id, {})
+            for song_key, entry in entries:
+                if song_key in user_ratings:
+                    entry['rated_at'] = user_ratings[song_key].get('rated_at', entry['rated_at'])
+                user_ratings[song_key] = entry
+                self._append(user_id, song_key, {'op': 'put', 'user': user_id, 'song': song_key, 'entry': entry})
+
+        return entries
+
+    def _remove_entry(self, user_id: str, song_key: str) -> bool:
+        """Remove a rating entry, returns False if it didn't exist"""
+        with self.lock:
+            user_ratings = self.ratings.get(user_id, {})
+            if song_key not in user_ratings:
+                return False
+
+            del user_ratings[song_key]
+            self._append(user_id, song_key, {'op': 'del', 'user': user_id, 'song': song_key})
+
+        return True
+
+    def _read_all_entries(self) -> List[Tuple[str, str, Dict]]:
+        """Read every rating entry of every user as (user_id, song_key, entry)"""
+        with self.lock:
+            return [
+                (user_id, song_key, entry)
+                for user_id, user_ratings in self.ratings.items()
+                for song_key, entry in user_ratings.items()
+            ]
+
+    def _read_user_entries(self, user_id: str, sort_by: str) -> List[Dict]:
+        """Read all rating entries of a user in the requested order"""
+        with self.lock:
+            ratings_list = list(self.ratings.get(user_id, {}).values())
+
+        return self._sort_entries(ratings_list, sort_by)
+
+    def _run_flusher(self):
+        """Background loop: batch pending operations into log appends"""
+        while True:
+            with self.lock:
+                while not self.pending:
+                    self.flush_wanted.wait()
+
+            # Let more writes arrive and coalesce before touching the disk
+            time.sleep(self.flush_interval)
+
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Error flushing ratings log: {e}")
+
+    def flush(self):
+        """Append all pending operations to the log with a single fsync"""
+        with self.io_lock:
+            with self.lock:
+                if not self.pending:
+                    return
+                ops = list(self.pending.values())
+                self.pending.clear()
+
+            self.log_file.write(''.join(json.dumps(op) + '\n' for op in ops))
+            self.log_file.flush()
+            os.fsync(self.log_file.fileno())
+
+            self.log_ops += len(ops)
+            if self.log_ops >= self.compact_threshold and not self.compacting:
+                self.compacting = True
+                threading.Thread(target=self.compact, name='ratings-log-compact', daemon=True).start()
+
+    def compact(self):
+        """Fold the log into a new snapshot and swap it in atomically"""
+        try:
+            with self.io_lock:
+                # Rotate the log; writes from now on go to a fresh file
+                with self.lock:
+                    pending_ops = list(self.pending.values())
+                    self.pending.clear()
+                    snapshot = {user_id: dict(user_ratings) for user_id, user_ratings in self.ratings.items()}
+
+                if pending_ops:
+                    self.log_file.write(''.join(json.dumps(op) + '\n' for op in pending_ops))
+                    self.log_file.flush()
+                    os.fsync(self.log_file.fileno())
+
+                self.log_file.close()
+                if os.path.exists(self.compacting_path):
+                    # Left over from an interrupted compaction (its ops are already
+                    # in memory). Keep the older ops first so replay stays in order
+                    with open(self.compacting_path, 'a', encoding='utf-8') as older, \
+                            open(self.log_path, 'r', encoding='utf-8') as newer:
+                        older.write(newer.read())
+                        older.flush()
+                        os.fsync(older.fileno())
+                    os.remove(self.log_path)
+                else:
+                    os.replace(self.log_path, self.compacting_path)
+                self.log_file = open(self.log_path, 'a', encoding='utf-8')
+                self.log_ops = 0
+
+            # Write the snapshot outside the io lock so appends keep flowing
+            write_json_atomic(self.storage_path, snapshot)
+            os.remove(self.compacting_path)
+            logger.info(f"Compacted ratings log into {self.storage_path}")
+
+        except Exception as e:
+            logger.error(f"Error compacting ratings log: {e}")
+        finally:
+            self.compacting = False
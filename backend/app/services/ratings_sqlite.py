@@ -0,0 +1,235 @@
+import os
+import json
+import sqlite3
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from .ratings_storage import RatingsStorage
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ratings (
+    user_id TEXT NOT NULL,
+    spotify_id TEXT NOT NULL,
+    rating REAL NOT NULL,
+    genius_id,
+    title TEXT,
+    artist TEXT,
+    album TEXT,
+    image_url TEXT,
+    rated_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (user_id, spotify_id)
+);
+CREATE INDEX IF NOT EXISTS idx_ratings_user_rating ON ratings (user_id, rating);
+CREATE INDEX IF NOT EXISTS idx_ratings_user_updated ON ratings (user_id, updated_at);
+CREATE INDEX IF NOT EXISTS idx_ratings_user_title ON ratings (user_id, title COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_ratings_user_artist ON ratings (user_id, artist COLLATE NOCASE);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# ORDER BY clauses matching RatingsStorage._sort_entries, each backed by an index
+SORT_ORDERS = {
+    'title': 'title COLLATE NOCASE ASC',
+    'artist': 'artist COLLATE NOCASE ASC',
+    'rating': 'rating DESC',
+    'date': 'updated_at DESC'
+}
+
+COLUMNS = 'spotify_id, rating, genius_id, title, artist, album, image_url, rated_at, updated_at'
+
+# Insert or update one rating; rated_at keeps the original value on update
+UPSERT_SQL = f'''INSERT INTO ratings (user_id, {COLUMNS})
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (user_id, spotify_id) DO UPDATE SET
+        rating = excluded.rating,
+        genius_id = excluded.genius_id,
+        title = excluded.title,
+        artist = excluded.artist,
+        album = excluded.album,
+        image_url = excluded.image_url,
+        updated_at = excluded.updated_at
+    RETURNING rated_at'''
+
+
+class SQLiteRatingsStorage(RatingsStorage):
+    """SQLite-backed storage for song ratings
+
+    Same interface as the JSON storage, but every operation touches only the
+    rows of one user through the (user_id, ...) indexes. The database runs in
+    WAL mode so readers in other processes aren't blocked by a writer, and
+    the in-memory indexes are rebuilt when another process commits a write.
+    """
+
+    IMPORT_BATCH_SIZE = 1000
+
+    def __init__(self, db_path: str = None, migrate_from: str = None):
+        if db_path is None:
+            # Default to storing in backend/data directory
+            backend_dir = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+            data_dir = os.path.join(backend_dir, 'data')
+            os.makedirs(data_dir, exist_ok=True)
+            db_path = os.path.join(data_dir, 'ratings.db')
+            if migrate_from is None:
+                migrate_from = os.path.join(data_dir, 'ratings.json')
+
+        self.storage_path = db_path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False, timeout=5.0)
+        self.conn.row_factory = sqlite3.Row
+
+        with self.lock:
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.execute('PRAGMA synchronous=NORMAL')
+            self.conn.executescript(SCHEMA)
+
+        if migrate_from:
+            migrate_json_to_sqlite(migrate_from, self)
+
+        self._init_indexes()
+
+    def _storage_version(self):
+        """Get the data version, which changes when another connection commits"""
+        with self.lock:
+            return self.conn.execute('PRAGMA data_version').fetchone()[0]
+
+    @staticmethod
+    def _row_to_entry(row: sqlite3.Row) -> Dict:
+        """Convert a ratings row to the JSON entry format"""
+        return {
+            'rating': row['rating'],
+            'song': {
+                'spotify_id': row['spotify_id'],
+                'genius_id': row['genius_id'],
+                'title': row['title'],
+                'artist': row['artist'],
+                'album': row['album'],
+                'image_url': row['image_url']
+            },
+            'rated_at': row['rated_at'],
+            'updated_at': row['updated_at']
+        }
+
+    @staticmethod
+    def _entry_to_row(user_id: str, song_key: str, entry: Dict) -> tuple:
+        """Convert a JSON entry to ratings column values"""
+        song = entry.get('song', {})
+        return (
+            user_id,
+            song_key,
+            entry['rating'],
+            song.get('genius_id'),
+            song.get('title'),
+            song.get('artist'),
+            song.get('album'),
+            song.get('image_url'),
+            entry['rated_at'],
+            entry['updated_at']
+        )
+
+    def _read_entry(self, user_id: str, song_key: str) -> Optional[Dict]:
+        """Read one rating entry"""
+        with self.lock:
+            row = self.conn.execute(
+                f'SELECT {COLUMNS} FROM ratings WHERE user_id = ? AND spotify_id = ?',
+                (user_id, song_key)
+            ).fetchone()
+
+        return self._row_to_entry(row) if row else None
+
+    def _store_entry(self, user_id: str, song_key: str, entry: Dict) -> Dict:
+        """Insert or replace a rating entry, keeping the original rated_at"""
+        with self.lock, self.conn:
+            row = self.conn.execute(UPSERT_SQL, self._entry_to_row(user_id, song_key, entry)).fetchone()
+
+        entry['rated_at'] = row['rated_at']
+        return entry
+
+    def _store_entries(self, user_id: str, entries: List[Tuple[str, Dict]]) -> List[Tuple[str, Dict]]:
+        """Insert or replace many entries of a user in one transaction"""
+        with self.lock, self.conn:
+            for song_key, entry in entries:
+                row = self.conn.execute(UPSERT_SQL, self._entry_to_row(user_id, song_key, entry)).fetchone()
+                entry['rated_at'] = row['rated_at']
+
+        return entries
+
+    def _remove_entry(self, user_id: str, song_key: str) -> bool:
+        """Remove a rating entry, returns False if it didn't exist"""
+        with self.lock, self.conn:
+            cursor = self.conn.execute(
+                'DELETE FROM ratings WHERE user_id = ? AND spotify_id = ?',
+                (user_id, song_key)
+            )
+
+        return cursor.rowcount > 0
+
+    def _read_all_entries(self) -> List[Tuple[str, str, Dict]]:
+        """Read every rating entry of every user as (user_id, song_key, entry)"""
+        with self.lock:
+            rows = self.conn.execute(f'SELECT user_id, {COLUMNS} FROM ratings').fetchall()
+
+        return [(row['user_id'], row['spotify_id'], self._row_to_entry(row)) for row in rows]
+
+    def _read_user_entries(self, user_id: str, sort_by: str) -> List[Dict]:
+        """Read all rating entries of a user in the requested order"""
+        order = SORT_ORDERS.get(sort_by, SORT_ORDERS['title'])
+
+        with self.lock:
+            rows = self.conn.execute(
+                f'SELECT {COLUMNS} FROM ratings WHERE user_id = ? ORDER BY {order}',
+                (user_id,)
+            ).fetchall()
+
+        return [self._row_to_entry(row) for row in rows]
+
+
+def migrate_json_to_sqlite(json_path: str, storage: SQLiteRatingsStorage) -> int:
+    """
+    One-shot import of a ratings.json file into SQLite storage
+
+    Runs at most once per database (recorded in the meta table), so ratings
+    deleted after the migration don't come back. The meta row is claimed in
+    the same transaction as the import, so when several workers start at
+    once only one of them imports. Returns the number of ratings imported.
+    """
+    # Cheap check so restarts don't re-read the JSON file
+    with storage.lock:
+        done = storage.conn.execute(
+            "SELECT value FROM meta WHERE key = 'migrated_from_json'"
+        ).fetchone()
+    if done or not os.path.exists(json_path):
+        return 0
+
+    try:
+        with open(json_path, 'r') as f:
+            ratings = json.load(f)
+    except Exception as e:
+        logger.error(f"Could not read {json_path} for migration: {e}")
+        return 0
+
+    rows = []
+    for user_id, user_ratings in ratings.items():
+        for song_key, entry in user_ratings.items():
+            rows.append(storage._entry_to_row(user_id, song_key, entry))
+
+    with storage.lock, storage.conn:
+        claimed = storage.conn.execute(
+            "INSERT OR IGNORE INTO meta (key, value) VALUES ('migrated_from_json', ?)",
+            (os.path.abspath(json_path),)
+        ).rowcount
+        if not claimed:
+            # Another process migrated after our check
+            return 0
+        storage.conn.executemany(
+            f'INSERT OR REPLACE INTO ratings (user_id, {COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            rows
+        )
+
+    logger.info(f"Migrated {len(rows)} ratings from {json_path} to {storage.storage_path}")
+    return len(rows)
@@ -1,13 +1,50 @@
 import json
 import os
-from typing import Dict, List, Optional
+import threading
+import base64
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 from datetime import datetime
 import logging
 
+from .ratings_index import SORT_ORDERS, SORT_VALUE_TYPES, SongRatingsIndex, UserRatingsIndex
+
 logger = logging.getLogger(__name__)
 
+# Optional song fields, stored and indexed as strings
+SONG_TEXT_FIELDS = ('genius_id', 'title', 'artist', 'album', 'image_url')
+
+def write_json_atomic(path: str, data: Dict) -> os.stat_result:
+    """
+    Write JSON to a temp file and swap it in, so readers never see a partial file
+
+    Returns the stat of the written file (the swap keeps its inode and mtime).
+    """
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+        stat = os.fstat(f.fileno())
+    os.replace(tmp_path, path)
+    return stat
+
+
+def _file_version(stat: os.stat_result) -> Tuple[int, int, int]:
+    """Identify one version of a file that is replaced on every write"""
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
 class RatingsStorage:
-    """Simple JSON-based storage for song ratings"""
+    """Simple JSON-based storage for song ratings
+
+    The in-memory indexes notice when another process replaces the file
+    (by its inode, mtime and size) and are rebuilt from it. Writes from
+    several processes can still overwrite each other, so run a single
+    worker or use the SQLite engine.
+    """
+
+    # Every batch rewrites the whole file, so import in few, large batches
+    IMPORT_BATCH_SIZE = 20000
 
     def __init__(self, storage_path: str = None):
         if storage_path is None:
@@ -19,6 +56,117 @@ class RatingsStorage:
 
         self.storage_path = storage_path
         self._ensure_file_exists()
+        self._init_indexes()
+
+    def _init_indexes(self):
+        """Set up the per-user in-memory indexes (built lazily on first use)"""
+        self.indexes = {}
+        self.song_index = None
+        self.taste_engine = None
+        self.index_lock = threading.Lock()
+        # Storage version the indexes were built from
+        self.indexes_version = self._storage_version()
+        # Held across a write to storage and to the indexes, so writes of one
+        # user reach the indexes in the same order as storage
+        self.user_locks = {}
+
+    def _user_lock(self, user_id: str) -> threading.Lock:
+        """Get the write lock of a user"""
+        with self.index_lock:
+            return self.user_locks.setdefault(user_id, threading.Lock())
+
+    @contextmanager
+    def _user_write(self, user_id: str):
+        """
+        Hold a user's write lock for a storage write and its index updates
+
+        If either step fails the indexes may no longer match storage, so
+        they are dropped and rebuilt from storage on next use.
+        """
+        with self._user_lock(user_id):
+            try:
+                yield
+            except Exception:
+                with self.index_lock:
+                    self.indexes.pop(user_id, None)
+                    self.song_index = None
+                    self.taste_engine = None
+                raise
+
+    def _storage_version(self):
+        """Get a token that changes whenever storage is written, None if unknown"""
+        try:
+            return _file_version(os.stat(self.storage_path))
+        except OSError:
+            return None
+
+    def _check_storage_version(self):
+        """Drop the indexes if another process wrote to storage (call with index_lock held)"""
+        version = self._storage_version()
+        if version != self.indexes_version:
+            if self.indexes or self.song_index is not None or self.taste_engine is not None:
+                logger.info("Ratings storage changed on disk, rebuilding indexes")
+            self.indexes = {}
+            self.song_index = None
+            self.taste_engine = None
+            self.indexes_version = version
+
+    def _get_index(self, user_id: str) -> UserRatingsIndex:
+        """Get the index of a user, building it from storage on first use"""
+        with self.index_lock:
+            self._check_storage_version()
+            index = self.indexes.get(user_id)
+            if index is None:
+                entries = self._read_user_entries(user_id, 'date')
+                index = UserRatingsIndex({entry['song']['spotify_id']: entry for entry in entries})
+                self.indexes[user_id] = index
+            return index
+
+    def _get_song_index(self) -> SongRatingsIndex:
+        """Get the cross-user song index, building it from storage on first use"""
+        with self.index_lock:
+            self._check_storage_version()
+            if self.song_index is None:
+                song_index = SongRatingsIndex()
+                for user_id, song_key, entry in self._read_all_entries():
+                    song_index.put(user_id, song_key, entry)
+                self.song_index = song_index
+                logger.info(f"Built song ratings index with {len(song_index.songs)} songs")
+            return self.song_index
+
+    def _get_taste_engine(self):
+        """Get the taste similarity engine, building it from storage on first use"""
+        with self.index_lock:
+            self._check_storage_version()
+            if self.taste_engine is None:
+                from .taste_similarity import TasteSimilarityEngine
+                taste_engine = TasteSimilarityEngine()
+                for user_id, song_key, entry in self._read_all_entries():
+                    taste_engine.put(user_id, song_key, entry['rating'])
+                self.taste_engine = taste_engine
+            return self.taste_engine
+
+    def _index_put(self, user_id: str, song_key: str, entry: Dict):
+        """Apply a stored entry to the indexes that have been built"""
+        with self.index_lock:
+            index = self.indexes.get(user_id)
+            if index is not None:
+                index.put(song_key, entry)
+            if self.song_index is not None:
+                self.song_index.put(user_id, song_key, entry)
+            if self.taste_engine is not None:
+                self.taste_engine.put(user_id, song_key, entry['rating'])
+
+    def _index_remove(self, user_id: str, song_key: str):
+        """Apply a removed entry to the indexes that have been built"""
+        with self.index_lock:
+            index = self.indexes.get(user_id)
+            if index is not None:
+                index.remove(song_key)
+            if self.song_index is not None:
+                self.song_index.remove(user_id, song_key)
+            if self.taste_engine is not None:
+                self.taste_engine.remove(user_id, song_key)
 
     def _ensure_file_exists(self):
         """Create the ratings file if it doesn't exist"""
@@ -37,66 +185,231 @@ class RatingsStorage:
             return {}
 
     def _save_ratings(self, ratings: Dict):
-        """Save ratings to storage"""
+        """Save ratings to storage, raises if the file can't be written"""
+        with self.index_lock:
+            # A write from another process since the indexes were built
+            self._check_storage_version()
+
         try:
-            with open(self.storage_path, 'w') as f:
-                json.dump(ratings, f, indent=2)
+            stat = write_json_atomic(self.storage_path, ratings)
         except Exception as e:
             logger.error(f"Error saving ratings: {e}")
+            raise
 
-    def add_rating(self, user_id: str, song_data: Dict, rating: float) -> Dict:
-        """
-        Add or update a rating for a song
+        with self.index_lock:
+            # Our own write doesn't make the indexes stale
+            self.indexes_version = _file_version(stat)
 
-        Args:
-            user_id: Unique identifier for the user
-            song_data: Dictionary containing song info (spotify_id, title, artist, etc.)
-            rating: Rating value (0.0-10.0)
-
-        Returns:
-            The saved rating entry
-        """
-        if not 0.0 <= rating <= 10.0:
-            raise ValueError("Rating must be between 0.0 and 10.0")
+    def _read_entry(self, user_id: str, song_key: str) -> Optional[Dict]:
+        """Read one rating entry"""
+        ratings = self._load_ratings()
+        return ratings.get(user_id, {}).get(song_key)
 
+    def _store_entry(self, user_id: str, song_key: str, entry: Dict) -> Dict:
+        """Insert or replace a rating entry, keeping the original rated_at"""
         ratings = self._load_ratings()
 
         # Create user ratings dict if it doesn't exist
         if user_id not in ratings:
             ratings[user_id] = {}
 
+        # Check if updating existing rating
+        if song_key in ratings[user_id]:
+            entry['rated_at'] = ratings[user_id][song_key].get('rated_at', entry['rated_at'])
+
+        ratings[user_id][song_key] = entry
+        self._save_ratings(ratings)
+        return entry
+
+    def _store_entries(self, user_id: str, entries: List[Tuple[str, Dict]]) -> List[Tuple[str, Dict]]:
+        """Insert or replace many entries of a user with a single write"""
+        ratings = self._load_ratings()
+        user_ratings = ratings.setdefault(user_id, {})
+
+        for song_key, entry in entries:
+            if song_key in user_ratings:
+                entry['rated_at'] = user_ratings[song_key].get('rated_at', entry['rated_at'])
+            user_ratings[song_key] = entry
+
+        self._save_ratings(ratings)
+        return entries
+
+    def _remove_entry(self, user_id: str, song_key: str) -> bool:
+        """Remove a rating entry, returns False if it didn't exist"""
+        ratings = self._load_ratings()
+
+        if user_id in ratings and song_key in ratings[user_id]:
+            del ratings[user_id][song_key]
+            self._save_ratings(ratings)
+            return True
+
+        return False
+
+    def _read_user_entries(self, user_id: str, sort_by: str) -> List[Dict]:
+        """Read all rating entries of a user from storage in the requested order"""
+        ratings = self._load_ratings()
+        user_ratings = ratings.get(user_id, {})
+
+        # Convert to list
+        return self._sort_entries(list(user_ratings.values()), sort_by)
+
+    def _read_all_entries(self) -> List[Tuple[str, str, Dict]]:
+        """Read every rating entry of every user as (user_id, song_key, entry)"""
+        ratings = self._load_ratings()
+        return [
+            (user_id, song_key, entry)
+            for user_id, user_ratings in ratings.items()
+            for song_key, entry in user_ratings.items()
+        ]
+
+    @staticmethod
+    def _sort_entries(ratings_list: List[Dict], sort_by: str) -> List[Dict]:
+        """Sort rating entries by 'title', 'artist', 'rating' or 'date'"""
+        if sort_by == 'title':
+            ratings_list.sort(key=lambda x: x['song']['title'].lower())
+        elif sort_by == 'artist':
+            ratings_list.sort(key=lambda x: x['song']['artist'].lower())
+        elif sort_by == 'rating':
+            ratings_list.sort(key=lambda x: x['rating'], reverse=True)
+        elif sort_by == 'date':
+            ratings_list.sort(key=lambda x: x['updated_at'], reverse=True)
+
+        return ratings_list
+
+    @staticmethod
+    def _build_entry(song_data: Dict, rating: float, rated_at: Optional[str] = None,
+                     updated_at: Optional[str] = None) -> Tuple[str, Dict]:
+        """Validate a rating and build its entry, returns (song_key, entry)"""
+        if not 0.0 <= rating <= 10.0:
+            raise ValueError("Rating must be between 0.0 and 10.0")
+        if not isinstance(song_data, dict):
+            raise ValueError("Song data must be an object")
+
         # Use Spotify ID as the unique key for songs
         song_key = song_data.get('spotify_id', song_data.get('id'))
+        if not song_key or not isinstance(song_key, str):
+            raise ValueError("Song spotify_id must be a non-empty string")
+        for field in SONG_TEXT_FIELDS:
+            if not isinstance(song_data.get(field), (str, type(None))):
+                raise ValueError(f"Song {field} must be a string")
 
         rating_entry = {
             'rating': rating,
             'song': {
-                'spotify_id': song_data.get('spotify_id', song_data.get('id')),
+                'spotify_id': song_key,
                 'genius_id': song_data.get('genius_id'),
                 'title': song_data.get('title'),
                 'artist': song_data.get('artist'),
                 'album': song_data.get('album'),
                 'image_url': song_data.get('image_url')
             },
-            'rated_at': datetime.now().isoformat(),
-            'updated_at': datetime.now().isoformat()
+            'rated_at': rated_at or datetime.now().isoformat(),
+            'updated_at': updated_at or datetime.now().isoformat()
         }
 
-        # Check if updating existing rating
-        if song_key in ratings[user_id]:
-            rating_entry['rated_at'] = ratings[user_id][song_key].get('rated_at', rating_entry['rated_at'])
+        return song_key, rating_entry
 
-        ratings[user_id][song_key] = rating_entry
-        self._save_ratings(ratings)
+    def add_rating(self, user_id: str, song_data: Dict, rating: float) -> Dict:
+        """
+        Add or update a rating for a song
+
+        Args:
+            user_id: Unique identifier for the user
+            song_data: Dictionary containing song info (spotify_id, title, artist, etc.)
+            rating: Rating value (0.0-10.0)
+
+        Returns:
+            The saved rating entry
+        """
+        song_key, rating_entry = self._build_entry(song_data, rating)
+
+        with self._user_write(user_id):
+            rating_entry = self._store_entry(user_id, song_key, rating_entry)
+            self._index_put(user_id, song_key, rating_entry)
 
         logger.info(f"Saved rating {rating} for song {song_data.get('title')} by user {user_id}")
         return rating_entry
 
+    def export_ratings(self, user_id: str, sort_by: str = 'date', page_size: int = 500) -> Iterator[str]:
+        """Yield a user's ratings as NDJSON lines, one page of the index at a time"""
+        cursor = None
+        while True:
+            ratings, cursor = self.get_ratings_page(user_id, sort_by, page_size, cursor)
+            for entry in ratings:
+                yield json.dumps(entry) + '\n'
+            if cursor is None:
+                return
+
+    def import_ratings(self, user_id: str, lines: Iterable, max_errors: int = 50) -> Dict:
+        """
+        Import NDJSON rating records (the export format) for a user
+
+        Records are validated as they are read and stored in batches, so the
+        input is never held in memory as a whole. Invalid records are skipped.
+
+        Returns:
+            Dict with the imported and skipped counts and the first max_errors
+            errors as {'line', 'error'}
+        """
+        imported = 0
+        skipped = 0
+        errors = []
+        batch = {}
+
+        for line_number, line in enumerate(lines, 1):
+            if isinstance(line, bytes):
+                line = line.decode('utf-8', errors='replace')
+            if not line.strip():
+                continue
+
+            try:
+                record = json.loads(line)
+                if not isinstance(record, dict) or not isinstance(record.get('song'), dict):
+                    raise ValueError('Record must be an object with a song object')
+                if not (record['song'].get('spotify_id') or record['song'].get('id')):
+                    raise ValueError('Song spotify_id required')
+                rating = record.get('rating')
+                if isinstance(rating, bool) or not isinstance(rating, (int, float)):
+                    raise ValueError('Rating must be a number')
+
+                song_key, entry = self._build_entry(
+                    record['song'], float(rating),
+                    _parse_timestamp(record.get('rated_at')),
+                    _parse_timestamp(record.get('updated_at'))
+                )
+            except ValueError as e:
+                skipped += 1
+                if len(errors) < max_errors:
+                    errors.append({'line': line_number, 'error': str(e)})
+                continue
+
+            # Later records for the same song win
+            batch[song_key] = entry
+            if len(batch) >= self.IMPORT_BATCH_SIZE:
+                imported += self._import_batch(user_id, batch)
+                batch = {}
+
+        if batch:
+            imported += self._import_batch(user_id, batch)
+
+        logger.info(f"Imported {imported} ratings for user {user_id} ({skipped} skipped)")
+        return {
+            'imported': imported,
+            'skipped': skipped,
+            'errors': errors
+        }
+
+    def _import_batch(self, user_id: str, batch: Dict[str, Dict]) -> int:
+        """Store one batch of imported entries and update the indexes"""
+        with self._user_write(user_id):
+            stored = self._store_entries(user_id, list(batch.items()))
+            for song_key, entry in stored:
+                self._index_put(user_id, song_key, entry)
+        return len(stored)
+
     def get_rating(self, user_id: str, song_id: str) -> Optional[Dict]:
         """Get a specific rating for a song"""
-        ratings = self._load_ratings()
-        user_ratings = ratings.get(user_id, {})
-        return user_ratings.get(song_id)
+        return self._read_entry(user_id, song_id)
 
     def get_all_ratings(self, user_id: str, sort_by: str = 'title') -> List[Dict]:
         """
@@ -109,64 +422,217 @@ class RatingsStorage:
         Returns:
             List of rating entries sorted by the specified field
         """
-        ratings = self._load_ratings()
-        user_ratings = ratings.get(user_id, {})
+        ratings, _ = self.get_ratings_page(user_id, sort_by)
+        return ratings
 
-        # Convert to list
-        ratings_list = list(user_ratings.values())
+    def get_ratings_page(self, user_id: str, sort_by: str = 'title', limit: Optional[int] = None,
+                         cursor: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+        """
+        Get one page of a user's ratings from the sorted in-memory index
 
-        # Sort based on the requested field
-        if sort_by == 'title':
-            ratings_list.sort(key=lambda x: x['song']['title'].lower())
-        elif sort_by == 'artist':
-            ratings_list.sort(key=lambda x: x['song']['artist'].lower())
-        elif sort_by == 'rating':
-            ratings_list.sort(key=lambda x: x['rating'], reverse=True)
-        elif sort_by == 'date':
-            ratings_list.sort(key=lambda x: x['updated_at'], reverse=True)
+        Args:
+            user_id: User identifier
+            sort_by: Sort method - 'title', 'artist', 'rating', 'date'
+            limit: Maximum number of ratings to return (None for all)
+            cursor: Opaque cursor returned with the previous page
 
-        return ratings_list
+        Returns:
+            (ratings, next_cursor) where next_cursor is None on the last page
 
-    def delete_rating(self, user_id: str, song_id: str) -> bool:
-        """Delete a rating"""
-        ratings = self._load_ratings()
+        Raises:
+            ValueError: If the cursor is malformed or belongs to another sort
+        """
+        if sort_by not in SORT_ORDERS:
+            sort_by = 'title'
+        after = _decode_ratings_cursor(cursor, sort_by) if cursor else None
+
+        index = self._get_index(user_id)
+        with self.index_lock:
+            ratings, next_after = index.page(sort_by, limit, after)
+
+        next_cursor = _encode_ratings_cursor(sort_by, next_after) if next_after else None
+        return ratings, next_cursor
+
+    def search_ratings(self, user_id: str, query: str, limit: int = 20) -> List[Dict]:
+        """Search a user's rated songs by title, artist and album, best matches first"""
+        index = self._get_index(user_id)
+        with self.index_lock:
+            return index.search(query, limit)
+
+    def get_song_summary(self, song_id: str) -> Optional[Dict]:
+        """Get the ratings of a song across all users, None if nobody rated it"""
+        song_index = self._get_song_index()
+        with self.index_lock:
+            return song_index.summary(song_id)
+
+    def get_top_songs(self, limit: int = 10) -> List[Dict]:
+        """Get the top rated songs across all users"""
+        song_index = self._get_song_index()
+        with self.index_lock:
+            return song_index.top(limit)
+
+    def get_similar_users(self, user_id: str, limit: int = 10) -> List[Dict]:
+        """Get the users whose ratings are most similar to a user's"""
+        return self._get_taste_engine().similar_users(user_id, limit)
+
+    def get_recommendations(self, user_id: str, limit: int = 20) -> List[Dict]:
+        """Get songs a user hasn't rated yet, ranked by predicted rating"""
+        recommendations = self._get_taste_engine().recommend(user_id, limit)
+
+        song_index = self._get_song_index()
+        with self.index_lock:
+            for recommendation in recommendations:
+                summary = song_index.summary(recommendation['spotify_id'])
+                recommendation['song'] = summary['song'] if summary else None
+        return recommendations
+
+    def get_theme_profile(self, user_id: str) -> Dict:
+        """Get the lyric themes of the songs a user rated, cached until their ratings change"""
+        from .lyrics_cache import lyrics_cache
+        from .lyrics_themes import lyrics_themes
+
+        def find_song_id(song: Dict) -> Optional[int]:
+            # Songs rated without a Genius id: use the match cached when their lyrics were shown.
+            # Ratings join the Spotify artists with ', ' and matches are keyed by the first one
+            artist, title = song.get('artist') or '', song.get('title') or ''
+            for candidate in dict.fromkeys((artist, artist.split(', ')[0])):
+                _, match = lyrics_cache.get_cached_match(candidate, title)
+                if match:
+                    return match['id']
+            return None
+
+        return lyrics_themes.get_profile(
+            user_id,
+            self.get_sync_token(user_id),
+            lambda: self.get_all_ratings(user_id, 'date'),
+            lyrics_cache.get_cached_lyrics,
+            find_song_id
+        )
+
+    def get_sync_token(self, user_id: str) -> str:
+        """Get a token for the current position of a user's change feed"""
+        index = self._get_index(user_id)
+        with self.index_lock:
+            return f"{index.epoch}:{index.seq}"
+
+    def get_changes(self, user_id: str, since: Optional[str] = None) -> Dict:
+        """
+        Get a user's rating changes since a sync token
 
-        if user_id in ratings and song_id in ratings[user_id]:
-            del ratings[user_id][song_id]
-            self._save_ratings(ratings)
-            logger.info(f"Deleted rating for song {song_id} by user {user_id}")
-            return True
+        Args:
+            user_id: User identifier
+            since: Token from get_sync_token or a previous call (None for everything)
 
-        return False
+        Returns:
+            Dict with upserts (entries), deleted (song ids), sync_token for the
+            next call, and reset: True when the token is from another epoch
+            and upserts hold the full rating set instead of a delta
 
-    def get_stats(self, user_id: str) -> Dict:
-        """Get rating statistics for a user"""
-        user_ratings = self.get_all_ratings(user_id)
+        Raises:
+            ValueError: If the token is malformed
+        """
+        epoch, seq = None, 0
+        if since:
+            try:
+                epoch, seq = since.rsplit(':', 1)
+                seq = int(seq)
+            except ValueError:
+                raise ValueError('Invalid sync token')
+
+        index = self._get_index(user_id)
+        with self.index_lock:
+            reset = epoch != index.epoch or not 0 <= seq <= index.seq
+            upserts, deleted = index.changes_since(0 if reset else seq)
+            if reset:
+                # Tombstones are meaningless to a client starting from scratch
+                deleted = []
 
-        if not user_ratings:
             return {
-                'total_ratings': 0,
-                'average_rating': 0.0,
-                'highest_rating': 0.0,
-                'lowest_rating': 0.0
+                'upserts': upserts,
+                'deleted': deleted,
+                'reset': reset,
+                'sync_token': f"{index.epoch}:{index.seq}"
             }
 
-        ratings_values = [r['rating'] for r in user_ratings]
+    def delete_rating(self, user_id: str, song_id: str) -> bool:
+        """Delete a rating"""
+        with self._user_write(user_id):
+            if not self._remove_entry(user_id, song_id):
+                return False
+            self._index_remove(user_id, song_id)
 
-        return {
-            'total_ratings': len(user_ratings),
-            'average_rating': round(sum(ratings_values) / len(ratings_values), 1),
-            'highest_rating': max(ratings_values),
-            'lowest_rating': min(ratings_values)
-        }
+        logger.info(f"Deleted rating for song {song_id} by user {user_id}")
+        return True
+
+    def get_stats(self, user_id: str) -> Dict:
+        """Get rating statistics for a user"""
+        index = self._get_index(user_id)
+        with self.index_lock:
+            return index.stats()
+
+    def get_percentile_rank(self, user_id: str, rating: float) -> float:
+        """Get the percentile rank of a rating within a user's ratings"""
+        index = self._get_index(user_id)
+        with self.index_lock:
+            return index.percentile_rank(rating)
+
+    def get_distribution(self, user_id: str, bin_width: int = 10) -> List[Dict]:
+        """Get a user's rating histogram in bins of bin_width tenths of a point"""
+        index = self._get_index(user_id)
+        with self.index_lock:
+            return index.distribution(bin_width)
+
+
+def _parse_timestamp(value) -> Optional[str]:
+    """Normalize an ISO timestamp from an import record, None if missing"""
+    if value is None:
+        return None
+    try:
+        return datetime.fromisoformat(str(value)).isoformat()
+    except ValueError:
+        raise ValueError(f"Invalid timestamp: {value}")
+
+def _encode_ratings_cursor(sort_by: str, after: Tuple) -> str:
+    """Encode a listing position as an opaque cursor"""
+    payload = json.dumps({'s': sort_by, 'k': list(after)}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+def _decode_ratings_cursor(cursor: str, sort_by: str) -> Tuple:
+    """Decode an opaque listing cursor, raising ValueError if it is malformed"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+        if payload['s'] != sort_by:
+            raise ValueError()
+        # The key is bisected against the index's keys, so it must compare with them
+        value, song_key = payload['k']
+        if isinstance(value, bool) or not isinstance(value, SORT_VALUE_TYPES[sort_by]) \
+                or not isinstance(song_key, str):
+            raise ValueError()
+        return value, song_key
+    except Exception:
+        raise ValueError('Invalid cursor')
 
 
 # Global instance
 _ratings_storage = None
 
 def get_ratings_storage() -> RatingsStorage:
-    """Get the global ratings storage instance"""
+    """Get the global ratings storage instance
+
+    RATINGS_BACKEND selects the engine: 'json' (default), 'sqlite' or 'log'.
+    The SQLite engine imports an existing ratings.json on first start; the log
+    engine uses ratings.json as its snapshot file.
+    """
     global _ratings_storage
     if _ratings_storage is None:
-        _ratings_storage = RatingsStorage()
+        backend = os.getenv('RATINGS_BACKEND', 'json').lower()
+        if backend == 'sqlite':
+            from .ratings_sqlite import SQLiteRatingsStorage
+            _ratings_storage = SQLiteRatingsStorage()
+        elif backend == 'log':
+            from .ratings_log import LogRatingsStorage
+            _ratings_storage = LogRatingsStorage()
+        else:
+            _ratings_storage = RatingsStorage()
     return _ratings_storage
@@ -1,6 +1,9 @@
 import time
 import logging
-from typing import Optional, Dict, Any
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, Callable, Tuple
 from datetime import datetime, timedelta
 
 logger = logging.getLogger(__name__)
@@ -104,4 +107,121 @@ class SpotifyCacheService:
             logger.debug(f"Cleaned up {len(expired_keys)} expired cache entries")
 
 # Global cache instance
-spotify_cache = SpotifyCacheService()
\ No newline at end of file
+spotify_cache = SpotifyCacheService()
+
+class SpotifySearchCache:
+    """LRU cache for Spotify search pages with background next-page prefetch
+
+    Search results are the same for every user, so pages are keyed by the
+    normalized query, search type, offset and limit rather than by user.
+    """
+
+    def __init__(self, max_entries: int = 512, cache_duration: int = 120, max_workers: int = 2):
+        self.cache = OrderedDict()
+        self.max_entries = max_entries
+        self.cache_duration = cache_duration  # Search results change slowly, 2 minutes is fine
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='spotify-search')
+
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        """Normalize query so case and whitespace variations share a cache entry"""
+        return ' '.join(query.lower().split())
+
+    def _get_cache_key(self, query: str, search_type: str, offset: int, limit: int) -> Tuple[str, str, int, int]:
+        """Generate cache key for a search page"""
+        return (self.normalize_query(query), search_type, offset, limit)
+
+    def get(self, query: str, search_type: str, offset: int, limit: int) -> Optional[Dict[str, Any]]:
+        """Get a cached search page if still valid"""
+        key = self._get_cache_key(query, search_type, offset, limit)
+
+        with self.lock:
+            entry = self.cache.get(key)
+            if not entry:
+                return None
+
+            if time.time() - entry['timestamp'] >= self.cache_duration:
+                del self.cache[key]
+                return None
+
+            # Mark as most recently used
+            self.cache.move_to_end(key)
+            logger.debug(f"Search cache hit for {key}")
+            return entry['data']
+
+    def put(self, query: str, search_type: str, offset: int, limit: int, data: Dict[str, Any]):
+        """Cache a search page, evicting least recently used pages"""
+        key = self._get_cache_key(query, search_type, offset, limit)
+
+        with self.lock:
+            self.cache[key] = {
+                'data': data,
+                'timestamp': time.time()
+            }
+            self.cache.move_to_end(key)
+
+            while len(self.cache) > self.max_entries:
+                self.cache.popitem(last=False)
+
+    def get_or_fetch(self, fetch_func: Callable[[], Dict[str, Any]], query: str, search_type: str,
+                     offset: int, limit: int) -> Tuple[Dict[str, Any], bool]:
+        """
+        Return a search page from cache, an in-flight prefetch, or a fresh fetch
+        Returns (data, from_cache)
+        """
+        cached_data = self.get(query, search_type, offset, limit)
+        if cached_data is not None:
+            return cached_data, True
+
+        # If the page is already being prefetched, wait for it instead of searching twice
+        key = self._get_cache_key(query, search_type, offset, limit)
+        with self.lock:
+            future = self.pending.get(key)
+
+        if future is not None:
+            try:
+                data = future.result(timeout=10)
+                if data is not None:
+                    return data, True
+            except Exception as e:
+                logger.debug(f"Prefetch for {key} failed, fetching directly: {e}")
+
+        data = fetch_func()
+        self.put(query, search_type, offset, limit, data)
+        return data, False
+
+    def prefetch(self, fetch_func: Callable[[], Dict[str, Any]], query: str, search_type: str,
+                 offset: int, limit: int):
+        """Fetch a search page in the background if it isn't cached or already pending"""
+        key = self._get_cache_key(query, search_type, offset, limit)
+
+        with self.lock:
+            if key in self.pending:
+                return
+            entry = self.cache.get(key)
+            if entry and time.time() - entry['timestamp'] < self.cache_duration:
+                return
+
+            future = self.executor.submit(self._run_prefetch, fetch_func, query, search_type, offset, limit)
+            self.pending[key] = future
+
+    def _run_prefetch(self, fetch_func: Callable[[], Dict[str, Any]], query: str, search_type: str,
+                      offset: int, limit: int) -> Optional[Dict[str, Any]]:
+        """Background worker for prefetch"""
+        key = self._get_cache_key(query, search_type, offset, limit)
+        try:
+            data = fetch_func()
+            self.put(query, search_type, offset, limit, data)
+            logger.debug(f"Prefetched search page {key}")
+            return data
+        except Exception as e:
+            logger.warning(f"Search prefetch failed for {key}: {e}")
+            return None
+        finally:
+            with self.lock:
+                self.pending.pop(key, None)
+
+# Global search cache instance
+spotify_search_cache = SpotifySearchCache()
@@ -0,0 +1,314 @@
+import time
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+
+logger = logging.getLogger(__name__)
+
+
+class RatingsMatrixSnapshot:
+    """Immutable CSR view of the user x song ratings matrix at one point in time"""
+
+    def __init__(self, rows: np.ndarray, cols: np.ndarray, values: np.ndarray,
+                 n_users: int, n_songs: int, version: int):
+        self.version = version
+        self.built_at = time.time()
+        shape = (n_users, n_songs)
+
+        counts = np.bincount(rows, minlength=n_users)
+        sums = np.bincount(rows, weights=values, minlength=n_users)
+        self.means = np.divide(sums, counts, out=np.zeros(n_users), where=counts > 0)
+
+        # Mean-centered ratings, and the same rows scaled to unit length for cosine similarity
+        centered = values - self.means[rows]
+        norms = np.sqrt(np.bincount(rows, weights=centered ** 2, minlength=n_users))
+        row_norms = norms[rows]
+        normalized = np.divide(centered, row_norms, out=np.zeros_like(centered), where=row_norms > 0)
+
+        self.centered = sparse.csr_matrix((centered.astype(np.float32), (rows, cols)), shape=shape)
+        self.normalized = sparse.csr_matrix((normalized.astype(np.float32), (rows, cols)), shape=shape)
+        self.rated = sparse.csr_matrix((np.ones(len(rows), dtype=np.float32), (rows, cols)), shape=shape)
+        self.normalized_t = self.normalized.T.tocsr()
+        self.rated_t = self.rated.T.tocsr()
+
+    def top_neighbors(self, user_rows: np.ndarray, k: int,
+                      min_overlap: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """Top-k most similar users of each user row, as (rows, similarities) best first"""
+        similarity = (self.normalized[user_rows] @ self.normalized_t).toarray()
+        overlap = (self.rated[user_rows] @ self.rated_t).toarray()
+
+        # Similarity over one or two shared songs is mostly noise
+        similarity[overlap < min_overlap] = -np.inf
+        similarity[np.arange(len(user_rows)), user_rows] = -np.inf
+
+        k = min(k, similarity.shape[1] - 1)
+        if k <= 0:
+            return [(np.empty(0, dtype=np.int64), np.empty(0))] * len(user_rows)
+
+        candidates = np.argpartition(-similarity, k - 1, axis=1)[:, :k]
+        results = []
+        for i, row_candidates in enumerate(candidates):
+            scores = similarity[i, row_candidates]
+            order = np.argsort(-scores)
+            keep = np.isfinite(scores[order]) & (scores[order] > 0)
+            results.append((row_candidates[order][keep], scores[order][keep]))
+        return results
+
+
+class TasteSimilarityEngine:
+    """User x song ratings matrix for "similar listeners" and song recommendations
+
+    Writes update coordinate arrays in O(1). The CSR matrices used for the
+    batch linear algebra are rebuilt from them lazily: at most once every
+    rebuild_interval seconds, and only when something changed. Neighbor
+    lists are cached per user until the user rates something or the list
+    is older than neighbor_ttl.
+    """
+
+    def __init__(self, neighbors: int = 50, min_overlap: int = 3, rebuild_interval: float = 30.0,
+                 neighbor_ttl: float = 600.0, initial_capacity: int = 1024):
+        self.neighbors = neighbors
+        self.min_overlap = min_overlap
+        self.rebuild_interval = rebuild_interval
+        self.neighbor_ttl = neighbor_ttl
+
+        self.user_ids = {}  # user_id -> row
+        self.user_list = []
+        self.song_ids = {}  # spotify_id -> column
+        self.song_list = []
+
+        # Coordinate storage; slots of deleted ratings are reused
+        self.rows = np.zeros(initial_capacity, dtype=np.int32)
+        self.cols = np.zeros(initial_capacity, dtype=np.int32)
+        self.values = np.zeros(initial_capacity, dtype=np.float64)
+        self.live = np.zeros(initial_capacity, dtype=bool)
+        self.size = 0
+        self.slots = {}  # (row, col) -> slot
+        self.free_slots = []
+
+        self.version = 0
+        self.snapshot = None
+        self.user_changed_at = {}  # row -> time of the user's last write
+        self.neighbor_cache = {}  # row -> (computed_at, neighbor rows, similarities)
+        self.lock = threading.Lock()
+
+    def _get_row(self, user_id: str) -> int:
+        row = self.user_ids.get(user_id)
+        if row is None:
+            row = len(self.user_list)
+            self.user_ids[user_id] = row
+            self.user_list.append(user_id)
+        return row
+
+    def _get_col(self, song_id: str) -> int:
+        col = self.song_ids.get(song_id)
+        if col is None:
+            col = len(self.song_list)
+            self.song_ids[song_id] = col
+            self.song_list.append(song_id)
+        return col
+
+    def _grow(self):
+        """Double the coordinate arrays (caller holds lock)"""
+        capacity = len(self.rows) * 2
+        for name in ('rows', 'cols', 'values', 'live'):
+            array = getattr(self, name)
+            grown = np.zeros(capacity, dtype=array.dtype)
+            grown[:len(array)] = array
+            setattr(self, name, grown)
+
+    def put(self, user_id: str, song_id: str, rating: float):
+        """Insert or update one rating"""
+        with self.lock:
+            row = self._get_row(user_id)
+            col = self._get_col(song_id)
+
+            slot = self.slots.get((row, col))
+            if slot is None:
+                if self.free_slots:
+                    slot = self.free_slots.pop()
+                else:
+                    if self.size == len(self.rows):
+                        self._grow()
+                    slot = self.size
+                    self.size += 1
+                self.slots[(row, col)] = slot
+                self.rows[slot] = row
+                self.cols[slot] = col
+                self.live[slot] = True
+
+            self.values[slot] = rating
+            self.version += 1
+            self.user_changed_at[row] = time.time()
+
+    def remove(self, user_id: str, song_id: str):
+        """Remove one rating if present"""
+        with self.lock:
+            row = self.user_ids.get(user_id)
+            col = self.song_ids.get(song_id)
+            slot = self.slots.pop((row, col), None)
+            if slot is None:
+                return
+
+            self.live[slot] = False
+            self.free_slots.append(slot)
+            self.version += 1
+            self.user_changed_at[row] = time.time()
+
+    def _get_snapshot(self, force: bool = False) -> Optional[RatingsMatrixSnapshot]:
+        """Get the current matrix snapshot, rebuilding it if it's stale"""
+        with self.lock:
+            snapshot = self.snapshot
+            stale = snapshot is None or (
+                snapshot.version != self.version and
+                (force or time.time() - snapshot.built_at >= self.rebuild_interval)
+            )
+            if not stale:
+                return snapshot
+
+            live = self.live[:self.size]
+            rows = self.rows[:self.size][live].astype(np.int64)
+            cols = self.cols[:self.size][live].astype(np.int64)
+            values = self.values[:self.size][live].copy()
+            n_users, n_songs, version = len(self.user_list), len(self.song_list), self.version
+
+        if not n_users or not n_songs:
+            return None
+
+        # The heavy part runs outside the lock so writes aren't held up
+        started = time.time()
+        snapshot = RatingsMatrixSnapshot(rows, cols, values, n_users, n_songs, version)
+        logger.info(f"Built ratings matrix {n_users}x{n_songs} ({len(values)} ratings) "
+                    f"in {time.time() - started:.2f}s")
+
+        with self.lock:
+            if self.snapshot is None or self.snapshot.version < version:
+                self.snapshot = snapshot
+        return snapshot
+
+    def _cached_neighbors(self, row: int) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """Cached neighbor list of a user row, if still valid (caller holds lock)"""
+        cached = self.neighbor_cache.get(row)
+        if cached is None:
+            return None
+
+        computed_at, neighbor_rows, similarities = cached
+        if time.time() - computed_at > self.neighbor_ttl or self.user_changed_at.get(row, 0) > computed_at:
+            return None
+        return neighbor_rows, similarities
+
+    def _neighbors(self, row: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Neighbor rows and similarities of a user row, computing them on a cache miss"""
+        with self.lock:
+            cached = self._cached_neighbors(row)
+        if cached is not None:
+            return cached
+
+        # A user's own recent writes should show up in their results
+        force = self.user_changed_at.get(row, 0) > (self.snapshot.built_at if self.snapshot else 0)
+        snapshot = self._get_snapshot(force=force)
+        if snapshot is None or row >= snapshot.normalized.shape[0]:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        computed_at = time.time()
+        neighbor_rows, similarities = snapshot.top_neighbors(np.array([row]), self.neighbors, self.min_overlap)[0]
+        with self.lock:
+            self.neighbor_cache[row] = (computed_at, neighbor_rows, similarities)
+        return neighbor_rows, similarities
+
+    def precompute_neighbors(self, user_ids: Optional[List[str]] = None, batch_size: int = 256) -> int:
+        """
+        Compute and cache neighbor lists for many users in batched matrix products
+
+        Returns the number of users processed.
+        """
+        snapshot = self._get_snapshot(force=True)
+        if snapshot is None:
+            return 0
+
+        with self.lock:
+            if user_ids is None:
+                rows = np.arange(snapshot.normalized.shape[0])
+            else:
+                rows = np.array([self.user_ids[user_id] for user_id in user_ids if user_id in self.user_ids])
+
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            computed_at = time.time()
+            results = snapshot.top_neighbors(batch, self.neighbors, self.min_overlap)
+            with self.lock:
+                for row, result in zip(batch, results):
+                    self.neighbor_cache[int(row)] = (computed_at, result[0], result[1])
+
+        return len(rows)
+
+    def similar_users(self, user_id: str, limit: int = 10) -> List[Dict]:
+        """Users whose mean-centered ratings point the same way, most similar first"""
+        with self.lock:
+            row = self.user_ids.get(user_id)
+        if row is None:
+            return []
+
+        neighbor_rows, similarities = self._neighbors(row)
+        snapshot = self.snapshot
+        if not len(neighbor_rows):
+            return []
+
+        shared = (snapshot.rated[neighbor_rows[:limit]] @ snapshot.rated[row].T).toarray().ravel()
+
+        return [
+            {
+                'user_id': self.user_list[neighbor_row],
+                'similarity': round(float(similarity), 3),
+                'shared_ratings': int(count)
+            }
+            for neighbor_row, similarity, count in zip(neighbor_rows[:limit], similarities[:limit], shared)
+        ]
+
+    def recommend(self, user_id: str, limit: int = 20, min_support: int = 2) -> List[Dict]:
+        """
+        Songs the user hasn't rated, ranked by predicted rating
+
+        The prediction is the user's mean plus the similarity-weighted average
+        of the neighbors' mean-centered ratings of the song. Songs rated by
+        fewer than min_support neighbors are skipped.
+        """
+        with self.lock:
+            row = self.user_ids.get(user_id)
+        if row is None:
+            return []
+
+        neighbor_rows, similarities = self._neighbors(row)
+        snapshot = self.snapshot
+        if not len(neighbor_rows):
+            return []
+
+        weights = similarities.astype(np.float32)
+        numerator = snapshot.centered[neighbor_rows].T @ weights
+        denominator = snapshot.rated[neighbor_rows].T @ weights
+        support = np.asarray(snapshot.rated[neighbor_rows].sum(axis=0)).ravel()
+
+        candidates = support >= min_support
+        candidates[snapshot.rated[row].indices] = False
+        if not candidates.any():
+            return []
+
+        predicted = np.full(len(candidates), -np.inf)
+        predicted[candidates] = snapshot.means[row] + numerator[candidates] / denominator[candidates]
+        predicted = np.clip(predicted, -np.inf, 10.0)
+
+        limit = min(limit, int(candidates.sum()))
+        top = np.argpartition(-predicted, limit - 1)[:limit]
+        top = top[np.argsort(-predicted[top])]
+
+        return [
+            {
+                'spotify_id': self.song_list[col],
+                'predicted_rating': round(float(max(predicted[col], 0.0)), 1),
+                'supporting_listeners': int(support[col])
+            }
+            for col in top
+        ]
@@ -0,0 +1,46 @@
+"""Lyric analytics throughput on synthetic lyrics
+
+Times LyricsAnalytics.analyze_batch over SONGS tokenized synthetic songs
+in batches of BATCH. Tokenizing is timed by bench_lyrics_tokens.py.
+
+Usage:
+    python benchmarks/bench_lyrics_analytics.py
+    python benchmarks/bench_lyrics_analytics.py --songs 50000 --batch 1000
+"""
+import os
+import sys
+import time
+
+import click
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.lyrics_analytics import LyricsAnalytics
+from app.services.lyrics_tokens import tokenize
+from bench_lyrics_store import generate_lyrics
+
+
+@click.command()
+@click.option('--songs', default=10_000, show_default=True)
+@click.option('--batch', default=500, show_default=True, help='Songs per analyze_batch call')
+@click.option('--seed', default=7, show_default=True)
+def main(songs, batch, seed):
+    """Time batched lyric analytics"""
+    rng = np.random.default_rng(seed)
+    vocabulary = np.array([f"word{i}" for i in range(5000)])
+    lyrics = [generate_lyrics(rng, vocabulary) for _ in range(songs)]
+    print(f"{songs} songs, {sum(map(len, lyrics)) / songs:.0f} characters each on average")
+
+    docs = [tokenize(text) for text in lyrics]
+
+    analytics = LyricsAnalytics()
+    started = time.perf_counter()
+    for start in range(0, songs, batch):
+        analytics.analyze_batch(docs[start:start + batch])
+    elapsed = time.perf_counter() - started
+    print(f"{'analyze tokenized songs':<45} {elapsed * 1000:10.1f} ms ({songs / elapsed:,.0f} songs/s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""Lyrics full-text index on synthetic lyrics
+
+Indexes SONGS synthetic songs incrementally, then times BM25 queries of
+one to three terms and phrase queries taken from indexed lines.
+
+Usage:
+    python benchmarks/bench_lyrics_search.py
+    python benchmarks/bench_lyrics_search.py --songs 100000
+"""
+import os
+import sys
+import time
+
+import click
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.lyrics_search import LyricsSearchIndex
+from bench_lyrics_store import generate_lyrics
+
+
+def time_queries(label: str, index: LyricsSearchIndex, queries):
+    started = time.perf_counter()
+    for query in queries:
+        index.search(query, 20)
+    elapsed = time.perf_counter() - started
+    print(f"{label:<45} {elapsed / len(queries) * 1000:10.2f} ms/query")
+
+
+@click.command()
+@click.option('--songs', default=20_000, show_default=True)
+@click.option('--queries', default=200, show_default=True)
+@click.option('--seed', default=7, show_default=True)
+def main(songs, queries, seed):
+    """Time indexing and queries of the lyrics search index"""
+    rng = np.random.default_rng(seed)
+    vocabulary = np.array([f"word{i}" for i in range(5000)])
+    lyrics = [generate_lyrics(rng, vocabulary) for _ in range(songs)]
+
+    index = LyricsSearchIndex()
+    started = time.perf_counter()
+    for song_id, text in enumerate(lyrics):
+        index.add(song_id, text)
+    elapsed = time.perf_counter() - started
+    print(f"{'index ' + str(songs) + ' songs':<45} {elapsed * 1000:10.1f} ms ({songs / elapsed:,.0f} songs/s)")
+
+    for terms in (1, 2, 3):
+        time_queries(f"{terms}-term queries", index, [
+            ' '.join(rng.choice(vocabulary, size=terms)) for _ in range(queries)
+        ])
+
+    phrases = []
+    for song_id in rng.integers(songs, size=queries):
+        words = lyrics[song_id].split('\n')[1].split()
+        phrases.append('"' + ' '.join(words[:3]) + '"')
+    time_queries('3-word phrase queries', index, phrases)
+
+
+if __name__ == '__main__':
+    main()
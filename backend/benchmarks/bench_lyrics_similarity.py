@@ -0,0 +1,76 @@
+"""MinHash/LSH similar-lyrics index on synthetic lyrics
+
+Indexes SONGS synthetic songs plus edited copies of the first VERSIONS
+(a share of lines rewritten, like live versions or remasters with extra
+ad-libs), then checks that the index finds every copy and compares
+lookup time against scanning all signatures.
+
+Usage:
+    python benchmarks/bench_lyrics_similarity.py
+    python benchmarks/bench_lyrics_similarity.py --songs 100000 --edited 0.2
+"""
+import os
+import sys
+import time
+
+import click
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.lyrics_similarity import LyricsSimilarityIndex, shingle_hashes, minhash_signatures
+from app.services.lyrics_tokens import tokenize
+from bench_lyrics_store import generate_lyrics
+
+
+def edit_lyrics(rng, lyrics: str, share: float) -> str:
+    """Rewrite a share of the lines of a song"""
+    return '\n'.join(
+        line if rng.random() >= share else f"oh yeah {rng.integers(1 << 30)} one more time"
+        for line in lyrics.split('\n')
+    )
+
+
+@click.command()
+@click.option('--songs', default=20_000, show_default=True)
+@click.option('--versions', default=500, show_default=True)
+@click.option('--edited', default=0.1, show_default=True, help='Share of lines rewritten in each version')
+@click.option('--seed', default=7, show_default=True)
+def main(songs, versions, edited, seed):
+    """Time signatures and lookups of the similar-lyrics index"""
+    rng = np.random.default_rng(seed)
+    vocabulary = np.array([f"word{i}" for i in range(5000)])
+    lyrics = [generate_lyrics(rng, vocabulary) for _ in range(songs)]
+
+    docs = [tokenize(text) for text in lyrics]
+    started = time.perf_counter()
+    shingle_sets = [shingle_hashes(doc) for doc in docs]
+    shingled = time.perf_counter()
+    minhash_signatures(shingle_sets)
+    signed = time.perf_counter()
+    print(f"{'shingle ' + str(songs) + ' songs':<45} {(shingled - started) * 1000:10.1f} ms")
+    print(f"{'sign ' + str(songs) + ' songs':<45} {(signed - shingled) * 1000:10.1f} ms "
+          f"({songs / (signed - shingled):,.0f} songs/s)")
+
+    index = LyricsSimilarityIndex()
+    index.add_many([(song_id, text, None, None) for song_id, text in enumerate(lyrics)])
+    index.add_many([(songs + i, edit_lyrics(rng, lyrics[i], edited), None, None) for i in range(versions)])
+
+    started = time.perf_counter()
+    found = 0
+    for i in range(versions):
+        found += any(song['genius_id'] == songs + i for song in index.similar(i))
+    elapsed = time.perf_counter() - started
+    print(f"{'LSH lookup':<45} {elapsed / versions * 1000:10.3f} ms/query, found {found}/{versions} versions")
+
+    signatures = np.stack([entry[1] for entry in index.songs.values()])
+    started = time.perf_counter()
+    for i in range(versions):
+        similarity = (signatures == index.songs[i][1]).mean(axis=1)
+        np.argsort(-similarity)[:20]
+    elapsed = time.perf_counter() - started
+    print(f"{'full signature scan':<45} {elapsed / versions * 1000:10.3f} ms/query")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""Lyrics store benchmark on synthetic lyrics
+
+Writes SONGS synthetic lyrics (verses plus a repeated chorus, drawn from a
+shared vocabulary) to a fresh store in batches, then times random lookups
+from a second, read-only store instance as another worker would.
+
+Usage:
+    python benchmarks/bench_lyrics_store.py
+    python benchmarks/bench_lyrics_store.py --songs 1000000 --batch 50000
+"""
+import os
+import sys
+import time
+import tempfile
+
+import click
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.lyrics_store import LyricsStore
+
+
+def generate_lyrics(rng: np.random.Generator, vocabulary: np.ndarray) -> str:
+    """One synthetic song: a few verses with a chorus repeated between them"""
+    def line():
+        return ' '.join(vocabulary[rng.integers(len(vocabulary), size=rng.integers(4, 10))])
+
+    chorus = '\n'.join(line() for _ in range(4))
+    parts = []
+    for _ in range(rng.integers(2, 4)):
+        parts.append('[Verse]\n' + '\n'.join(line() for _ in range(8)))
+        parts.append('[Chorus]\n' + chorus)
+    return '\n\n'.join(parts)
+
+def timed(label: str, func, *args, **kwargs):
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    elapsed = time.perf_counter() - started
+    print(f"{label:<45} {elapsed * 1000:10.1f} ms")
+    return result
+
+
+@click.command()
+@click.option('--songs', default=100_000, show_default=True)
+@click.option('--batch', default=10_000, show_default=True, help='Songs per flush')
+@click.option('--lookups', default=10_000, show_default=True)
+@click.option('--seed', default=7, show_default=True)
+def main(songs, batch, lookups, seed):
+    """Time writes, size and lookups of the lyrics store"""
+    rng = np.random.default_rng(seed)
+    vocabulary = np.array([f"word{i}" for i in range(5000)])
+
+    with tempfile.TemporaryDirectory() as path:
+        writer = LyricsStore()
+        writer.open(path)
+
+        raw_bytes = 0
+        started = time.perf_counter()
+        for start in range(0, songs, batch):
+            for song_id in range(start, min(start + batch, songs)):
+                lyrics = generate_lyrics(rng, vocabulary)
+                raw_bytes += len(lyrics.encode('utf-8'))
+                writer.pending[song_id] = lyrics
+            writer.flush()
+        print(f"{'write ' + str(songs) + ' songs':<45} {(time.perf_counter() - started) * 1000:10.1f} ms"
+              " (incl. generation)")
+
+        # One more small flush merges into the full-size index
+        writer.pending[songs] = generate_lyrics(rng, vocabulary)
+        timed('flush 1 song into a full index', writer.flush)
+
+        data_size = os.path.getsize(writer.data_path)
+        index_size = os.path.getsize(writer.index_path)
+        print(f"raw lyrics {raw_bytes / 1e6:.1f} MB, data file {data_size / 1e6:.1f} MB "
+              f"({data_size / raw_bytes:.0%}), index {index_size / 1e6:.1f} MB")
+        print(f"{(data_size + index_size) / (songs + 1):.0f} bytes per song on disk")
+
+        reader = LyricsStore()
+        timed('open a second store instance', reader.open, path)
+        song_ids = rng.integers(songs, size=lookups)
+
+        started = time.perf_counter()
+        for song_id in song_ids:
+            reader.get(int(song_id))
+        elapsed = time.perf_counter() - started
+        print(f"{str(lookups) + ' random lookups':<45} {elapsed * 1000:10.1f} ms "
+              f"({elapsed / lookups * 1e6:.1f} us each)")
+
+        started = time.perf_counter()
+        for _ in range(lookups):
+            reader.get(songs + 10)
+        elapsed = time.perf_counter() - started
+        print(f"{str(lookups) + ' missing-song lookups':<45} {elapsed * 1000:10.1f} ms "
+              f"({elapsed / lookups * 1e6:.1f} us each)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""Tokenized lyrics on synthetic lyrics
+
+Times tokenizing SONGS synthetic songs into the shared vocabulary, writing
+and reading their token records, and compares the memory of one song as
+tokens against the same song split into Python strings.
+
+Usage:
+    python benchmarks/bench_lyrics_tokens.py
+    python benchmarks/bench_lyrics_tokens.py --songs 50000
+"""
+import os
+import sys
+import time
+import zlib
+
+import click
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.lyrics_tokens import WORD_PATTERN, TokenizedLyrics, tokenize
+from bench_lyrics_store import generate_lyrics
+
+
+def split_lyrics(lyrics: str):
+    """Baseline: lowercase words, their line numbers and normalized lines as Python objects"""
+    words, word_lines, lines = [], [], []
+    for line_number, line in enumerate(line for line in lyrics.split('\n') if line.strip()):
+        line_words = WORD_PATTERN.findall(line.lower())
+        words.extend(line_words)
+        word_lines.extend([line_number + 1] * len(line_words))
+        lines.append(' '.join(line_words))
+    return words, word_lines, lines
+
+def deep_size(value, seen=None) -> int:
+    """Bytes of an object and everything it references, each object counted once"""
+    seen = set() if seen is None else seen
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    size = sys.getsizeof(value)
+    if isinstance(value, (list, tuple)):
+        size += sum(deep_size(item, seen) for item in value)
+    elif isinstance(value, TokenizedLyrics):
+        size += sum(deep_size(getattr(value, name), seen) for name in TokenizedLyrics.__slots__)
+    return size
+
+def timed(label: str, func, items) -> list:
+    started = time.perf_counter()
+    results = [func(item) for item in items]
+    elapsed = time.perf_counter() - started
+    print(f"{label:<45} {elapsed * 1000:10.1f} ms ({len(items) / elapsed:,.0f} songs/s)")
+    return results
+
+
+@click.command()
+@click.option('--songs', default=10_000, show_default=True)
+@click.option('--seed', default=7, show_default=True)
+def main(songs, seed):
+    """Time tokenizing and token records, and compare memory per song"""
+    rng = np.random.default_rng(seed)
+    vocabulary = np.array([f"word{i}" for i in range(5000)])
+    lyrics = [generate_lyrics(rng, vocabulary) for _ in range(songs)]
+
+    timed('split into Python strings', split_lyrics, lyrics)
+    docs = timed('tokenize', tokenize, lyrics)
+    records = timed('serialize token records', TokenizedLyrics.to_bytes, docs)
+    timed('load token records', TokenizedLyrics.from_bytes, records)
+
+    sample = range(0, songs, max(songs // 500, 1))
+    split_size = np.mean([deep_size(split_lyrics(lyrics[i])) for i in sample])
+    token_size = np.mean([deep_size(docs[i]) for i in sample])
+    print(f"{'memory per song, Python strings':<45} {split_size:10,.0f} bytes")
+    print(f"{'memory per song, tokens':<45} {token_size:10,.0f} bytes ({split_size / token_size:.1f}x smaller)")
+
+    lyrics_stored = np.mean([len(zlib.compress(lyrics[i].encode('utf-8'), 6)) for i in sample])
+    tokens_stored = np.mean([len(zlib.compress(records[i], 6)) for i in sample])
+    print(f"{'stored per song, lyrics / tokens (zlib)':<45} {lyrics_stored:10,.0f} / {tokens_stored:,.0f} bytes")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""Ratings search benchmark on a synthetic library
+
+Builds one user's ratings index over SONGS rated songs with titles drawn
+from a small, skewed vocabulary (so common words like "love" match a large
+part of the library), then times index building and typical queries.
+
+Usage:
+    python benchmarks/bench_ratings_search.py
+    python benchmarks/bench_ratings_search.py --songs 100000
+"""
+import os
+import sys
+import time
+
+import click
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.ratings_index import UserRatingsIndex
+
+WORDS = ('love', 'night', 'heart', 'baby', 'time', 'lost', 'long', 'lonely', 'fire', 'dream',
+         'home', 'road', 'rain', 'light', 'blue', 'gold', 'wild', 'young', 'summer', 'river',
+         'dance', 'girl', 'money', 'ghost', 'city', 'world', 'lover', 'lonesome', 'song', 'stars')
+
+QUERIES = ('love', 'lo', 'artist 12', 'love night', 'heart lo', 'album 7', 'zz')
+
+
+def generate_entries(songs: int, artists: int, seed: int):
+    """Synthetic rating entries keyed like the storage engines key them"""
+    rng = np.random.default_rng(seed)
+    popularity = 1.0 / np.arange(1, len(WORDS) + 1) ** 0.7
+    popularity /= popularity.sum()
+    title_words = rng.choice(len(WORDS), size=(songs, 3), p=popularity)
+    title_lengths = rng.integers(1, 4, size=songs)
+    song_artists = rng.integers(artists, size=songs)
+
+    entries = {}
+    for i in range(songs):
+        title = ' '.join(WORDS[word] for word in title_words[i, :title_lengths[i]])
+        song_key = f"song{i}"
+        entries[song_key] = {
+            'song': {
+                'title': f"{title} {i}",
+                'artist': f"Artist {song_artists[i]}",
+                'album': f"Album {i // 12}"
+            },
+            'rating': float(rng.integers(0, 101)) / 10,
+            'updated_at': f"2024-01-01T00:00:{i:08d}"
+        }
+    return entries
+
+def timed(label: str, func, *args, repeat: int = 1, **kwargs):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = func(*args, **kwargs)
+    elapsed = (time.perf_counter() - started) / repeat
+    print(f"{label:<45} {elapsed * 1000:10.3f} ms")
+    return result
+
+
+@click.command()
+@click.option('--songs', default=30_000, show_default=True)
+@click.option('--artists', default=2_000, show_default=True)
+@click.option('--limit', default=20, show_default=True, help='Results per query')
+@click.option('--repeat', default=50, show_default=True, help='Runs averaged per query')
+@click.option('--seed', default=7, show_default=True)
+def main(songs, artists, limit, repeat, seed):
+    """Time search over one user's ratings index"""
+    entries = timed('generate entries', generate_entries, songs, artists, seed)
+    index = timed('build index', UserRatingsIndex, entries)
+
+    for query in QUERIES:
+        results = timed(f"search {query!r}", index.search, query, limit, repeat=repeat)
+        print(f"{'':<4}{len(results)} results")
+
+if __name__ == '__main__':
+    main()
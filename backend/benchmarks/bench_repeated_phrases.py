@@ -0,0 +1,68 @@
+"""Repeated phrase detection on long synthetic lyrics
+
+Builds songs of LINES lines (verses plus a repeated chorus) and times the
+suffix array detector against a naive comparison of every pair of lines.
+
+Usage:
+    python benchmarks/bench_repeated_phrases.py
+    python benchmarks/bench_repeated_phrases.py --lines 5000
+"""
+import os
+import sys
+import time
+
+import click
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.lyrics_phrases import find_repeated_phrases
+from app.services.lyrics_tokens import tokenize
+from bench_lyrics_store import generate_lyrics
+
+
+def long_lyrics(rng: np.random.Generator, vocabulary: np.ndarray, lines: int) -> str:
+    """Concatenate synthetic songs until the text has the requested number of lines"""
+    parts, total = [], 0
+    while total < lines:
+        song = generate_lyrics(rng, vocabulary)
+        parts.append(song)
+        total += song.count('\n') + 1
+    return '\n'.join('\n'.join(parts).split('\n')[:lines])
+
+def naive_repeated_lines(lyrics: str) -> int:
+    """Baseline: compare every pair of lines"""
+    lines = [line.strip().lower() for line in lyrics.split('\n') if line.strip()]
+    repeats = 0
+    for i in range(len(lines)):
+        for j in range(i + 1, len(lines)):
+            if lines[i] == lines[j]:
+                repeats += 1
+    return repeats
+
+def timed(label: str, func, *args, repeat: int = 5):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = func(*args)
+    elapsed = (time.perf_counter() - started) / repeat
+    print(f"{label:<45} {elapsed * 1000:10.1f} ms")
+    return result
+
+
+@click.command()
+@click.option('--lines', default=1000, show_default=True)
+@click.option('--seed', default=7, show_default=True)
+def main(lines, seed):
+    """Time repeated phrase detection on long lyrics"""
+    rng = np.random.default_rng(seed)
+    vocabulary = np.array([f"word{i}" for i in range(5000)])
+    lyrics = long_lyrics(rng, vocabulary, lines)
+    print(f"{lines} lines, {len(lyrics.split())} words")
+
+    phrases = timed('suffix array detector', find_repeated_phrases, tokenize(lyrics))
+    print(f"  {len(phrases)} phrases, top repeats {phrases[0]['count'] if phrases else 0}x")
+    timed('naive pairwise line comparison', naive_repeated_lines, lyrics, repeat=1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""Taste similarity benchmark on a synthetic ratings matrix
+
+Generates USERS x SONGS ratings with a skewed song popularity and a few
+hidden taste groups, then times loading, matrix builds, neighbor queries
+(single and batched) and recommendations.
+
+Usage:
+    python benchmarks/bench_taste_similarity.py
+    python benchmarks/bench_taste_similarity.py --users 2000 --songs 20000
+"""
+import os
+import sys
+import time
+
+import click
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.taste_similarity import TasteSimilarityEngine
+
+
+def generate_ratings(users: int, songs: int, per_user: int, groups: int, seed: int):
+    """Synthetic (user, song, rating) triples where users in a group agree on songs"""
+    rng = np.random.default_rng(seed)
+    popularity = 1.0 / np.arange(1, songs + 1) ** 0.8
+    popularity /= popularity.sum()
+    group_taste = rng.normal(0, 2, size=(groups, songs)).astype(np.float32)
+
+    counts = np.clip(rng.poisson(per_user, size=users), 1, songs)
+    user_rows = np.repeat(np.arange(users), counts)
+    song_cols = rng.choice(songs, size=len(user_rows), p=popularity)
+    user_groups = rng.integers(groups, size=users)
+
+    ratings = 6.0 + group_taste[user_groups[user_rows], song_cols] + rng.normal(0, 1, size=len(user_rows))
+    ratings = np.clip(np.round(ratings, 1), 0.0, 10.0)
+    return user_rows, song_cols, ratings
+
+def timed(label: str, func, *args, **kwargs):
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    elapsed = time.perf_counter() - started
+    print(f"{label:<45} {elapsed * 1000:10.1f} ms")
+    return result
+
+
+@click.command()
+@click.option('--users', default=10_000, show_default=True)
+@click.option('--songs', default=100_000, show_default=True)
+@click.option('--per-user', default=100, show_default=True, help='Mean ratings per user')
+@click.option('--groups', default=20, show_default=True, help='Hidden taste groups')
+@click.option('--seed', default=7, show_default=True)
+def main(users, songs, per_user, groups, seed):
+    """Time the taste similarity engine at scale"""
+    user_rows, song_cols, ratings = timed('generate ratings', generate_ratings, users, songs, per_user, groups, seed)
+    user_ids = [f"user{i}" for i in range(users)]
+    song_ids = [f"song{i}" for i in range(songs)]
+    print(f"{len(ratings)} ratings, {users} users x {songs} songs")
+
+    engine = TasteSimilarityEngine()
+
+    def load():
+        for row, col, rating in zip(user_rows.tolist(), song_cols.tolist(), ratings.tolist()):
+            engine.put(user_ids[row], song_ids[col], rating)
+    timed('load ratings (put per rating)', load)
+    timed('build matrix snapshot', engine._get_snapshot, True)
+
+    timed('similar users, cold (1 user)', engine.similar_users, 'user0', 10)
+    timed('similar users, cached (1 user)', engine.similar_users, 'user0', 10)
+    timed('recommendations (1 user)', engine.recommend, 'user0', 20)
+
+    batch = user_ids[:1000]
+    processed = timed('precompute neighbors, batched (1000 users)', engine.precompute_neighbors, batch)
+    timed('similar users for the batch from cache', lambda: [engine.similar_users(u, 10) for u in batch])
+    print(f"  {processed} users precomputed")
+
+    timed('100 incremental rating writes', lambda: [engine.put(f"user{i}", f"song{i}", 9.0) for i in range(100)])
+    timed('similar users after own write (rebuild)', engine.similar_users, 'user1', 10)
+
+if __name__ == '__main__':
+    main()
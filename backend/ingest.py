@@ -0,0 +1,244 @@
+"""Bulk offline lyrics ingest
+
+Reads a CSV or JSON list of tracks (artist, title and optional spotify_id),
+resolves each one on Genius and writes lyrics bundles to an NDJSON catalog
+that the API server loads at startup (see LYRICS_CATALOG_PATH).
+
+Genius calls go through the regular rate-limited client; HTML parsing,
+cleaning and annotation line matching run in a process pool. Tracks that got
+lyrics are recorded in a checkpoint file, so a killed run resumes where it
+stopped. Misses are not checkpointed: the Genius client reports timeouts and
+rate limiting the same way as a missing song or page, so the next run retries
+them.
+
+Usage:
+    python ingest.py tracks.csv
+    python ingest.py tracks.json --output data/lyrics_catalog.ndjson --workers 4
+    python ingest.py tracks.csv --api-url http://localhost:8000  # local stub server
+"""
+import os
+import sys
+import csv
+import json
+import time
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Any, Iterator
+
+import click
+
+# Add the parent directory to the path so we can import the app module
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.services.genius_client import RateLimitedGeniusClient, parse_lyrics_html
+from app.services.lyrics_cache import (
+    DEFAULT_CATALOG_PATH,
+    calculate_line_numbers,
+    extract_lyrics_from_annotations
+)
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger('ingest')
+
+
+def read_tracks(path: str) -> List[Dict[str, Any]]:
+    """Read (artist, title[, spotify_id]) rows from a CSV, JSON or NDJSON file"""
+    with open(path, 'r', encoding='utf-8') as f:
+        if path.endswith('.csv'):
+            rows = list(csv.DictReader(f))
+        elif path.endswith('.ndjson') or path.endswith('.jsonl'):
+            rows = [json.loads(line) for line in f if line.strip()]
+        else:
+            rows = json.load(f)
+
+    tracks = []
+    for row in rows:
+        artist = (row.get('artist') or '').strip()
+        title = (row.get('title') or '').strip()
+        if not artist or not title:
+            logger.warning(f"Skipping row without artist/title: {row}")
+            continue
+        tracks.append({
+            'artist': artist,
+            'title': title,
+            'spotify_id': (row.get('spotify_id') or '').strip() or None
+        })
+
+    return tracks
+
+def track_key(track: Dict[str, Any]) -> str:
+    """Stable checkpoint key for an input track"""
+    if track.get('spotify_id'):
+        return f"spotify:{track['spotify_id']}"
+    return f"{track['artist'].lower()}\t{track['title'].lower()}"
+
+def load_checkpoint(path: str) -> set:
+    """Load the keys of tracks finished by previous runs"""
+    done = set()
+    if not os.path.exists(path):
+        return done
+
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.rstrip('\n')
+            if line:
+                done.add(line)
+    return done
+
+def build_bundle(song_id: int, song_details: Optional[Dict[str, Any]], html: Optional[bytes],
+                 url: str, annotations: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Parse and clean a song page into a lyrics bundle (runs in a worker process)"""
+    lyrics = parse_lyrics_html(html, url) if html else None
+
+    # Fallback: if lyrics failed but we have annotations, extract from fragments
+    if not lyrics and annotations:
+        lyrics = extract_lyrics_from_annotations(annotations)
+
+    # Calculate line numbers for annotations
+    if lyrics and annotations:
+        annotations = calculate_line_numbers(annotations, lyrics)
+
+    return {
+        'genius_id': song_id,
+        'song_details': song_details,
+        'lyrics': lyrics,
+        'annotations': annotations
+    }
+
+
+class CatalogIngest:
+    """Fetches tracks under the Genius rate limit and parses pages in a process pool"""
+
+    def __init__(self, client: RateLimitedGeniusClient, output_path: str, checkpoint_path: str,
+                 workers: int, max_in_flight: int = 32):
+        self.client = client
+        self.output_path = output_path
+        self.checkpoint_path = checkpoint_path
+        self.workers = workers
+        self.max_in_flight = max_in_flight
+        self.stats = {'ok': 0, 'no_lyrics': 0, 'not_found': 0, 'failed': 0}
+
+    def _fetch(self, track: Dict[str, Any]):
+        """Resolve a track and fetch its details, page HTML and annotations"""
+        match = self.client.find_best_match({'name': track['title'], 'artists': [track['artist']]})
+        if not match:
+            return None, None
+
+        song_details = self.client.get_song_details(match['id'])
+        url = match.get('url') or (song_details or {}).get('url')
+        html = self.client.fetch_song_page(url) if url else None
+        annotations = self.client.get_song_annotations(match['id'])
+        return match, (match['id'], song_details, html, url or '', annotations)
+
+    def _write(self, output, checkpoint, track: Dict[str, Any], match: Optional[Dict[str, Any]],
+               bundle: Optional[Dict[str, Any]]):
+        """Append a catalog record, then mark the track done in the checkpoint if it got lyrics"""
+        if match is None:
+            status = 'not_found'
+        elif bundle and bundle.get('lyrics'):
+            status = 'ok'
+        else:
+            status = 'no_lyrics'
+        self.stats[status] += 1
+
+        record = dict(track, status=status, genius_match=match, bundle=bundle)
+        output.write(json.dumps(record) + '\n')
+        output.flush()
+
+        if status != 'ok':
+            # Possibly a transient failure, leave it for the next run
+            logger.warning(f"No lyrics for '{track['title']}' by '{track['artist']}' ({status}), will retry")
+            return
+
+        # The record must be durable before the checkpoint claims it is done
+        os.fsync(output.fileno())
+        checkpoint.write(track_key(track) + '\n')
+        checkpoint.flush()
+
+    def run(self, tracks: Iterator[Dict[str, Any]], total: int):
+        """Ingest tracks, keeping up to max_in_flight pages parsing at once"""
+        started = time.time()
+        processed = 0
+        in_flight = []
+
+        with open(self.output_path, 'a', encoding='utf-8') as output, \
+                open(self.checkpoint_path, 'a', encoding='utf-8') as checkpoint, \
+                ProcessPoolExecutor(max_workers=self.workers) as pool:
+
+            def drain(limit: int):
+                nonlocal processed
+                # Write finished results right away so a kill loses as little work as possible
+                while in_flight and (len(in_flight) > limit or in_flight[0][2] is None or in_flight[0][2].done()):
+                    track, match, future = in_flight.pop(0)
+                    try:
+                        bundle = future.result() if future else None
+                    except Exception as e:
+                        logger.error(f"Parsing failed for '{track['title']}' by '{track['artist']}': {e}")
+                        self.stats['failed'] += 1
+                        processed += 1
+                        continue
+                    self._write(output, checkpoint, track, match, bundle)
+                    processed += 1
+
+                    if processed % 50 == 0:
+                        rate = processed / max(time.time() - started, 1e-6)
+                        logger.info(f"Progress: {processed}/{total} ({rate:.1f} tracks/s) {self.stats}")
+
+            for track in tracks:
+                try:
+                    match, parse_args = self._fetch(track)
+                except Exception as e:
+                    logger.error(f"Fetching failed for '{track['title']}' by '{track['artist']}': {e}")
+                    self.stats['failed'] += 1
+                    continue
+
+                future = pool.submit(build_bundle, *parse_args) if parse_args else None
+                in_flight.append((track, match, future))
+
+                # Results are written in input order; keep the pool busy but bounded
+                drain(self.max_in_flight)
+
+            drain(0)
+
+        logger.info(f"Ingest finished in {time.time() - started:.1f}s: {self.stats}")
+
+
+@click.command()
+@click.argument('input_path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--output', 'output_path', default=DEFAULT_CATALOG_PATH, show_default=True,
+              help='NDJSON catalog to append bundles to')
+@click.option('--checkpoint', 'checkpoint_path', default=None,
+              help='Checkpoint file (defaults to <output>.checkpoint)')
+@click.option('--workers', default=os.cpu_count() or 2, show_default=True,
+              help='Processes used for HTML parsing and cleaning')
+@click.option('--api-url', default=lambda: os.getenv('GENIUS_API_URL', 'https://api.genius.com'),
+              help='Genius API base URL (point at a stub server for testing)')
+@click.option('--rate', default=lambda: int(os.getenv('GENIUS_REQUESTS_PER_MINUTE', 10)), type=int,
+              help='Genius requests per minute')
+@click.option('--limit', default=None, type=int, help='Only ingest the first N pending tracks')
+def main(input_path, output_path, checkpoint_path, workers, api_url, rate, limit):
+    """Pre-populate the lyrics catalog from a CSV/JSON track list"""
+    access_token = os.getenv('GENIUS_ACCESS_TOKEN')
+    if not access_token:
+        raise click.UsageError('GENIUS_ACCESS_TOKEN must be set')
+
+    checkpoint_path = checkpoint_path or f"{output_path}.checkpoint"
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+
+    tracks = read_tracks(input_path)
+    done = load_checkpoint(checkpoint_path)
+    pending = [track for track in tracks if track_key(track) not in done]
+    if limit is not None:
+        pending = pending[:limit]
+
+    print(f"Ingesting {len(pending)} tracks ({len(tracks) - len(pending)} already done) into {output_path}")
+
+    client = RateLimitedGeniusClient(access_token, requests_per_minute=rate, base_url=api_url)
+    CatalogIngest(client, output_path, checkpoint_path, workers).run(iter(pending), len(pending))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,35 @@
+import os
+import sys
+
+import pytest
+
+# Add the backend directory to the path so tests can import the app module
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def storage(tmp_path):
+    """JSON ratings storage in a temporary directory, used by the app"""
+    from app.services import ratings_storage
+    storage = ratings_storage.RatingsStorage(str(tmp_path / 'ratings.json'))
+    previous = ratings_storage._ratings_storage
+    ratings_storage._ratings_storage = storage
+    yield storage
+    ratings_storage._ratings_storage = previous
+
+
+@pytest.fixture
+def app(storage, tmp_path, monkeypatch):
+    monkeypatch.setenv('SECRET_KEY', 'test')
+    monkeypatch.setenv('PLAYBACK_POLLER_ENABLED', 'False')
+    monkeypatch.setenv('LYRICS_STORE_PATH', str(tmp_path / 'lyrics_store'))
+    monkeypatch.setenv('LYRICS_CATALOG_PATH', str(tmp_path / 'lyrics_catalog.ndjson'))
+    from app import create_app
+    app = create_app()
+    app.config['TESTING'] = True
+    return app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
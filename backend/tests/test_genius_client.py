@@ -0,0 +1,31 @@
+"""Shared Genius rate limit"""
+import threading
+import time
+
+from app.services.genius_client import RateLimitedGeniusClient
+
+
+def test_rate_limit_waits_without_holding_the_lock():
+    client = RateLimitedGeniusClient('token', requests_per_minute=2)
+    client._wait_if_needed()
+    client._wait_if_needed()
+
+    # The budget is used up, so this caller sleeps until the minute is over
+    waiter = threading.Thread(target=client._wait_if_needed, daemon=True)
+    waiter.start()
+    time.sleep(0.2)
+    assert waiter.is_alive()
+
+    # Other callers can still check the budget meanwhile
+    assert client.rate_lock.acquire(timeout=1)
+    client.rate_lock.release()
+    assert client._reserve_slot(client.requests_per_minute)[0] is False
+
+
+def test_requests_are_spaced_out():
+    client = RateLimitedGeniusClient('token')
+    assert client.requests_per_minute == 10
+    started = time.time()
+    for _ in range(3):
+        client._wait_if_needed()
+    assert time.time() - started >= 0.2
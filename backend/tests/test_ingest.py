@@ -0,0 +1,130 @@
+"""ingest.py against a stub Genius server (--api-url)"""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+from click.testing import CliRunner
+
+import ingest
+from app.services.lyrics_cache import LyricsCacheService
+
+SONGS = {
+    1: {'title': 'Empty Road', 'artist': 'The Drifters', 'lyrics': 'Down the empty road\nI walk alone'},
+    2: {'title': 'Rate Limited', 'artist': 'Slow Band', 'lyrics': 'Try again tomorrow\nTry again'},
+}
+
+
+class StubGenius:
+    """Genius API and song pages; the page of song 2 is rate limited once"""
+
+    def __init__(self):
+        self.requests = []
+        self.throttled = {2}
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                stub.requests.append(self.path)
+                status, body = stub.respond(urlparse(self.path))
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json' if body.startswith('{') else 'text/html')
+                self.end_headers()
+                self.wfile.write(body.encode('utf-8'))
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def song(self, song_id: int) -> dict:
+        song = SONGS[song_id]
+        return {'id': song_id, 'title': song['title'], 'url': f"{self.url}/pages/{song_id}",
+                'primary_artist': {'name': song['artist']}}
+
+    def respond(self, url):
+        if url.path == '/search':
+            query = parse_qs(url.query)['q'][0].lower()
+            hits = [{'type': 'song', 'result': self.song(song_id)}
+                    for song_id, song in SONGS.items() if song['title'].lower() in query]
+            return 200, json.dumps({'response': {'hits': hits}})
+        if url.path.startswith('/songs/'):
+            return 200, json.dumps({'response': {'song': self.song(int(url.path.split('/')[-1]))}})
+        if url.path == '/referents':
+            return 200, json.dumps({'response': {'referents': []}})
+        if url.path.startswith('/pages/'):
+            song_id = int(url.path.split('/')[-1])
+            if song_id in self.throttled:
+                self.throttled.discard(song_id)
+                return 429, 'Too Many Requests'
+            lines = SONGS[song_id]['lyrics'].replace('\n', '<br/>')
+            return 200, f'<html><body><div data-lyrics-container="true">{lines}</div></body></html>'
+        return 404, '{}'
+
+    def searched(self, title: str) -> bool:
+        return any(path.startswith('/search') and title.split()[0] in path for path in self.requests)
+
+
+@pytest.fixture
+def genius():
+    stub = StubGenius()
+    yield stub
+    stub.server.shutdown()
+
+
+def run_ingest(genius, tmp_path):
+    tracks = tmp_path / 'tracks.json'
+    tracks.write_text(json.dumps([
+        {'artist': 'The Drifters', 'title': 'Empty Road'},
+        {'artist': 'Slow Band', 'title': 'Rate Limited'},
+        {'artist': 'Nobody', 'title': 'Unknown Song'},
+    ]))
+    result = CliRunner().invoke(ingest.main, [
+        str(tracks), '--output', str(tmp_path / 'catalog.ndjson'), '--workers', '1',
+        '--api-url', genius.url, '--rate', '6000'
+    ], env={'GENIUS_ACCESS_TOKEN': 'test'})
+    assert result.exit_code == 0, result.output
+    return result
+
+
+def load_catalog(tmp_path) -> LyricsCacheService:
+    cache = LyricsCacheService()
+    cache.load_catalog(str(tmp_path / 'catalog.ndjson'))
+    return cache
+
+
+def test_only_tracks_with_lyrics_are_checkpointed(genius, tmp_path):
+    run_ingest(genius, tmp_path)
+
+    checkpoint = (tmp_path / 'catalog.ndjson.checkpoint').read_text().splitlines()
+    assert checkpoint == ['the drifters\tempty road']
+
+    statuses = [json.loads(line)['status'] for line in (tmp_path / 'catalog.ndjson').read_text().splitlines()]
+    assert statuses == ['ok', 'no_lyrics', 'not_found']
+
+
+def test_lyrics_less_bundles_are_not_loaded(genius, tmp_path):
+    run_ingest(genius, tmp_path)
+
+    cache = load_catalog(tmp_path)
+    assert cache.has_bundle(1)
+    assert not cache.has_bundle(2)
+
+
+def test_rerun_resumes_and_retries_misses(genius, tmp_path):
+    run_ingest(genius, tmp_path)
+    genius.requests.clear()
+
+    result = run_ingest(genius, tmp_path)
+    assert 'Ingesting 2 tracks (1 already done)' in result.output
+    assert not genius.searched('Empty Road')
+    assert genius.searched('Unknown Song')
+
+    checkpoint = (tmp_path / 'catalog.ndjson.checkpoint').read_text().splitlines()
+    assert checkpoint == ['the drifters\tempty road', 'slow band\trate limited']
+
+    cache = load_catalog(tmp_path)
+    assert cache.get_cached_lyrics(2) == SONGS[2]['lyrics']
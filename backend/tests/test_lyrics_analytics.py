@@ -0,0 +1,58 @@
+"""Batched lyric analytics agree with counting each song on its own"""
+import random
+
+from app.services.lyrics_analytics import LyricsAnalytics
+from app.services.lyrics_tokens import WORD_PATTERN, TokenizedLyrics, tokenize
+
+WORDS = ('Night', 'road', 'river', "don't", 'heart', 'rain', 'city', 'light', 'dream', 'ghost')
+
+
+def random_song(rng: random.Random) -> str:
+    lines = []
+    for _ in range(rng.randint(1, 12)):
+        roll = rng.random()
+        if roll < 0.15:
+            lines.append(rng.choice(['[Verse 1]', '[Chorus]', '[Verse 2]', '[Bridge: Guest]']))
+        elif roll < 0.3 and any(line[:1] not in ('', '[') for line in lines):
+            # A repeat differing in case and punctuation
+            lines.append(rng.choice([line for line in lines if line[:1] not in ('', '[')]).upper() + '!')
+        elif roll < 0.35:
+            lines.append('')
+        else:
+            lines.append(', '.join(rng.choice(WORDS) for _ in range(rng.randint(1, 6))))
+    return '\n'.join(lines)
+
+
+def count_one(lyrics: str) -> dict:
+    lines = [WORD_PATTERN.findall(line.strip().lower()) for line in lyrics.split('\n')
+             if line.strip() and not line.strip().startswith('[')]
+    words = [word for line in lines for word in line]
+    return {
+        'word_count': len(words),
+        'unique_words': len(set(words)),
+        'line_count': len(lines),
+        'repetition_ratio': round((len(lines) - len(set(map(tuple, lines)))) / len(lines), 3) if lines else 0.0
+    }
+
+
+def test_batch_counts_match_single_songs():
+    rng = random.Random(8)
+    songs = [random_song(rng) for _ in range(60)] + ['', '[Intro]']
+    analytics = LyricsAnalytics()
+    batch = analytics.analyze_batch([tokenize(lyrics) for lyrics in songs] + [TokenizedLyrics()])
+
+    assert len(batch) == len(songs) + 1
+    assert batch[-1]['word_count'] == batch[-1]['line_count'] == 0
+    for lyrics, metrics in zip(songs, batch):
+        assert {key: metrics[key] for key in count_one(lyrics)} == count_one(lyrics)
+        assert metrics == analytics.analyze_batch([tokenize(lyrics)])[0]
+        sections = [line.strip() for line in lyrics.split('\n') if line.strip().startswith('[')]
+        assert sum(metrics['section_counts'].values()) == len(sections)
+
+
+def test_get_many_recomputes_changed_lyrics():
+    analytics = LyricsAnalytics()
+    first = analytics.get_many({1: 'one two\none two', 2: 'three'})
+    assert first[1]['repetition_ratio'] == 0.5
+    assert analytics.get(1, 'one two\none two') is first[1]
+    assert analytics.get(1, 'one two three')['unique_words'] == 3
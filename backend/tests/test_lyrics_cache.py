@@ -0,0 +1,33 @@
+"""Annotations are placed on the lyric line they quote"""
+from app.services.lyrics_cache import calculate_line_numbers
+
+LYRICS = '\n'.join([
+    '[Verse 1]',
+    'Hello, world!',
+    'Walking down the avenue',
+    '',
+    '[Chorus]',
+    'Hello world',
+    'HELLO WORLD?',
+    'We sing it all night long'
+])
+
+
+def annotation(text: str) -> dict:
+    return {'range': {'content': text}}
+
+
+def test_exact_matches_need_the_same_text():
+    annotations = calculate_line_numbers([
+        annotation('hello world'),
+        annotation('Hello world?'),
+        annotation('Hello, World!'),
+        annotation('hello world.'),  # No exact match, but contains line 5
+        annotation('down the avenue'),
+        annotation('We sing it all night long, every night'),
+        {'fragment': ''}
+    ], LYRICS)
+
+    assert [entry['lyrics_line_number'] for entry in annotations] == [5, 6, 2, 5, 3, 7, -1]
+    assert [entry['line_match_method'] for entry in annotations] == \
+        ['matched', 'matched', 'matched', 'matched', 'matched', 'matched', 'no_text']
@@ -0,0 +1,64 @@
+"""Structured lyrics documents place lines, sections and annotations"""
+from app.services.lyrics_cache import calculate_line_numbers
+from app.services.lyrics_document import LyricsDocuments, build_document
+from app.services.lyrics_tokens import tokenize
+
+LYRICS = '\n'.join([
+    'Spoken intro',
+    '',
+    '[Verse 1: Singer]',
+    'Walking down the avenue',
+    'Saffron in the morning',
+    '[Chorus]',
+    'Hold me close',
+    '[Pre-Chorus]',
+    '[Outro]',
+    'Hold me close'
+])
+
+
+def annotation(annotation_id, text: str, **fields) -> dict:
+    return dict({'id': annotation_id, 'range': {'content': text}, 'body': f"About {text}"}, **fields)
+
+
+def test_lines_sections_and_annotations():
+    annotations = calculate_line_numbers([
+        annotation(1, 'Saffron in the morning', votes_total=3),
+        annotation(2, 'Hold me close'),
+        annotation(3, '[Chorus]'),
+        annotation(4, 'not in the song at all'),
+        annotation(4, 'walking down the avenue'),  # Another referent of 4 that matches
+        annotation(5, 'nothing here either'),
+        annotation(None, 'Walking down the avenue')
+    ], LYRICS)
+    document = build_document(LYRICS, annotations, tokenize(LYRICS))
+
+    assert [(line['number'], line['text']) for line in document['lines']] == [
+        (1, 'Spoken intro'), (3, 'Walking down the avenue'), (4, 'Saffron in the morning'),
+        (6, 'Hold me close'), (9, 'Hold me close')
+    ]
+    assert [line['annotation_ids'] for line in document['lines']] == [[], [4], [1], [2], []]
+
+    assert document['sections'] == [
+        {'type': 'verse', 'label': 'Verse 1: Singer', 'header_line': 2, 'first_line': 1, 'line_count': 2},
+        {'type': 'chorus', 'label': 'Chorus', 'header_line': 5, 'first_line': 3, 'line_count': 1},
+        {'type': 'pre-chorus', 'label': 'Pre-Chorus', 'header_line': 7, 'first_line': 4, 'line_count': 0},
+        {'type': 'outro', 'label': 'Outro', 'header_line': 8, 'first_line': 4, 'line_count': 1}
+    ]
+
+    # Matched to a section header, or to nothing; a partly matched annotation counts as placed
+    assert document['unplaced_annotation_ids'] == [3, 5]
+    assert set(document['annotations']) == {1, 2, 3, 4, 5}
+    assert document['annotations'][1]['votes_total'] == 3
+    assert document['annotations'][1]['body'] == 'About Saffron in the morning'
+    assert 'range' not in document['annotations'][1]
+
+
+def test_documents_are_rebuilt_when_line_matches_change():
+    documents = LyricsDocuments()
+    annotations = [annotation(1, 'Hold me close', lyrics_line_number=6)]
+    first = documents.get(770001, LYRICS, annotations)
+    assert documents.get(770001, LYRICS, [dict(annotations[0])]) is first
+
+    moved = documents.get(770001, LYRICS, [dict(annotations[0], lyrics_line_number=9)])
+    assert [line['annotation_ids'] for line in moved['lines']][-2:] == [[], [1]]
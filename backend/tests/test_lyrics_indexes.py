@@ -0,0 +1,74 @@
+"""Local lyrics indexes: match lines and bounded size"""
+import random
+
+import numpy as np
+
+from app.services import lyrics_search as lyrics_search_module
+from app.services.lyrics_search import LyricsSearchIndex
+from app.services.lyrics_similarity import LyricsSimilarityIndex
+from app.services.lyrics_themes import LyricsThemes
+
+WORDS = ('night', 'road', 'river', 'fire', 'heart', 'rain', 'city', 'light', 'dream', 'ghost',
+         'summer', 'stone', 'water', 'gold', 'wire', 'smoke', 'glass', 'crown', 'field', 'storm')
+
+
+def random_lyrics(rng: random.Random, lines: int = 12) -> str:
+    return '\n'.join(' '.join(rng.choice(WORDS) for _ in range(rng.randint(3, 7))) for _ in range(lines))
+
+
+def test_match_line_uses_the_rarest_term_in_each_song():
+    index = LyricsSearchIndex()
+    index.add(880001, 'walking down the avenue\nsaffron in the morning', 'Rare', 'A')
+    for i in range(5):
+        index.add(880010 + i, f"nothing here\nline {i}\nthe morning again", 'Common', 'B')
+
+    results = {result['genius_id']: result for result in index.search('saffron morning')}
+    assert results[880001]['line'] == 2
+    # These songs don't contain "saffron", the rarest query term, so they point at "morning"
+    for i in range(5):
+        assert results[880010 + i]['line'] == 3
+
+
+def test_search_index_evicts_and_compacts(monkeypatch):
+    monkeypatch.setattr(lyrics_search_module, 'MIN_RETIRED_TO_COMPACT', 20)
+    rng = random.Random(5)
+    songs = {870000 + i: random_lyrics(rng) for i in range(200)}
+
+    index = LyricsSearchIndex(max_songs=30)
+    for song_id, lyrics in songs.items():
+        index.add(song_id, lyrics, f"Song {song_id}", 'Artist')
+        assert len(index) <= 30
+        # Retired documents are dropped once they outnumber the live ones
+        assert len(index.doc_lengths) - len(index) <= 30
+
+    assert list(index.song_docs) == list(songs)[-30:]
+    fresh = LyricsSearchIndex()
+    for song_id in list(songs)[-30:]:
+        fresh.add(song_id, songs[song_id], f"Song {song_id}", 'Artist')
+
+    for query in ('night', 'river fire', '"heart rain"', 'gold storm crown', 'missing'):
+        results = index.search(query, limit=50)
+        assert {result['genius_id'] for result in results} <= set(songs)
+        assert sorted(results, key=lambda result: result['genius_id']) == \
+            sorted(fresh.search(query, limit=50), key=lambda result: result['genius_id'])
+
+
+def test_similarity_and_theme_indexes_are_capped():
+    rng = random.Random(6)
+    songs = [(860000 + i, random_lyrics(rng, 20)) for i in range(40)]
+
+    similarity = LyricsSimilarityIndex(max_songs=10)
+    similarity.add_many([(song_id, lyrics, None, None) for song_id, lyrics in songs])
+    assert list(similarity.songs) == [song_id for song_id, _ in songs[-10:]]
+    assert similarity.similar(songs[0][0]) is None
+    bucketed = {song_id for band in similarity.buckets for bucket in band.values() for song_id in bucket}
+    assert bucketed == set(similarity.songs)
+
+    themes = LyricsThemes(max_songs=10)
+    for song_id, lyrics in songs:
+        themes.add(song_id, lyrics)
+    assert list(themes.documents) == [song_id for song_id, _ in songs[-10:]]
+    expected_df = np.zeros(len(themes.terms), dtype=np.int64)
+    for _, ids, _ in themes.documents.values():
+        expected_df[ids] += 1
+    assert np.array_equal(themes.df[:len(themes.terms)], expected_df)
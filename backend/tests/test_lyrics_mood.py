@@ -0,0 +1,81 @@
+"""Line moods, smoothing and their sync with the line timing index"""
+import pytest
+
+from app.services.lyrics_mood import SMOOTHING_WINDOW, lyrics_mood, score_lines
+from app.services.lyrics_timing import lyrics_timing
+from app.services.lyrics_tokens import lyrics_tokens
+
+SONG_ID = 990001
+DURATION_MS = 180_000
+LYRICS = '\n'.join([
+    '[Verse 1]',
+    'The sun will shine and I smile all day',
+    'Happy when you love me, happy when you stay',
+    'Dancing in the morning light',
+    '',
+    '[Chorus]',
+    'Love love love',
+    'Oh oh',
+    '[Verse 2]',
+    'Now I cry alone in the dark',
+    'Lonely and sad, the pain of a broken heart',
+    'Cry cry cry',
+    '[Outro]',
+    'Sad and lonely, sad and lonely'
+])
+
+
+def test_timeline_start_times_come_from_the_timing_index():
+    timing = lyrics_timing.get_index(SONG_ID, LYRICS, DURATION_MS)
+    timeline = lyrics_mood.timeline(SONG_ID, LYRICS, timing)
+
+    starts_ms = dict(zip(timing.lines, timing.starts_ms))
+    assert timeline['lines']
+    for entry in timeline['lines']:
+        assert entry['start_ms'] == starts_ms[entry['line']]
+
+    assert all('start_ms' not in entry for entry in lyrics_mood.timeline(SONG_ID, LYRICS)['lines'])
+
+
+
+def test_versions_of_different_length_keep_their_own_timing():
+    album = lyrics_timing.get_index(SONG_ID, LYRICS, DURATION_MS)
+    radio_edit = lyrics_timing.get_index(SONG_ID, LYRICS, DURATION_MS - 40_000)
+    assert album.starts_ms != radio_edit.starts_ms
+    assert lyrics_timing.get_index(SONG_ID, LYRICS, DURATION_MS) is album
+
+    for progress_ms in range(0, DURATION_MS - 40_000, 1000):
+        assert lyrics_timing.position(SONG_ID, DURATION_MS, progress_ms) == album.position(progress_ms)
+        assert lyrics_timing.position(SONG_ID, DURATION_MS - 40_000, progress_ms) == radio_edit.position(progress_ms)
+    assert lyrics_timing.position(SONG_ID, 1000, 0) == (None, None)
+
+def test_mood_at_the_current_line():
+    timing = lyrics_timing.get_index(SONG_ID, LYRICS, DURATION_MS)
+    timeline = lyrics_mood.timeline(SONG_ID, LYRICS, timing)
+    moods = {entry['line']: entry['mood'] for entry in timeline['lines']}
+    assert {'positive', 'negative'} <= set(moods.values())
+
+    for progress_ms in range(0, DURATION_MS, 250):
+        current_line, _ = lyrics_timing.position(SONG_ID, DURATION_MS, progress_ms)
+        mood = lyrics_mood.mood_at(SONG_ID, current_line)
+        if current_line is None:
+            assert mood is None
+            continue
+
+        # Section headers have no words and keep the mood of the line before them
+        scored_line = max((line for line in moods if line <= current_line), default=min(moods))
+        assert mood['line'] == scored_line
+        assert mood['mood'] == moods[scored_line]
+
+
+@pytest.mark.parametrize('line_count', [1, 2, 3, 4, 5, 9])
+def test_smoothing_keeps_one_value_per_line(line_count):
+    lyrics = '\n'.join(['Happy happy love', 'Sad and lonely', 'Cry cry', 'Smile all day', 'Dark pain'] * 2)
+    lyrics = '\n'.join(lyrics.split('\n')[:line_count])
+    scores = score_lines(lyrics_tokens.get(SONG_ID + line_count, lyrics))
+
+    assert len(scores['lines']) == len(scores['valence']) == len(scores['smoothed']) == line_count
+    # Each line averages the lines within the window around it
+    for i, smoothed in enumerate(scores['smoothed']):
+        window = scores['valence'][max(0, i - SMOOTHING_WINDOW):i + SMOOTHING_WINDOW + 1]
+        assert smoothed == pytest.approx(sum(window) / len(window), abs=1e-3)
@@ -0,0 +1,75 @@
+"""Suffix-array repeats match a brute-force search and stay inside sections"""
+import random
+
+import numpy as np
+import pytest
+
+from app.services.lyrics_phrases import find_repeated_phrases, lcp_array, maximal_repeats, suffix_array
+from app.services.lyrics_tokens import tokenize
+
+
+def brute_force_repeats(tokens: list, min_length: int) -> set:
+    """Repeats whose occurrences can be extended neither to the left nor to the right"""
+    n = len(tokens)
+    occurrences = {}
+    for start in range(n):
+        for end in range(start + min_length, n + 1):
+            occurrences.setdefault(tuple(tokens[start:end]), []).append(start)
+
+    repeats = set()
+    for phrase, starts in occurrences.items():
+        if len(starts) < 2:
+            continue
+        after = {tokens[start + len(phrase)] if start + len(phrase) < n else None for start in starts}
+        before = {tokens[start - 1] if start > 0 else None for start in starts}
+        if (len(after) > 1 or None in after) and (len(before) > 1 or None in before):
+            repeats.add((len(phrase), tuple(starts)))
+    return repeats
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_maximal_repeats_match_brute_force(seed):
+    rng = random.Random(seed)
+    tokens = [rng.randrange(3) for _ in range(rng.randint(2, 40))]
+    # Unique negative separators, the way section headers are marked
+    for position in rng.sample(range(len(tokens)), min(2, len(tokens))):
+        tokens[position] = -1 - position
+
+    sequence = np.array(tokens, dtype=np.int64)
+    sa, ranks = suffix_array(sequence)
+    suffixes = sorted(range(len(tokens)), key=lambda start: tokens[start:])
+    assert sa.tolist() == suffixes
+
+    lcp = lcp_array(sa, ranks).tolist()
+    for i in range(1, len(tokens)):
+        a, b = tokens[suffixes[i - 1]:], tokens[suffixes[i]:]
+        common = next((k for k, (x, y) in enumerate(zip(a, b)) if x != y), min(len(a), len(b)))
+        assert lcp[i] == common
+
+    found = {(length, tuple(starts.tolist())) for length, starts in maximal_repeats(sequence, 2)}
+    assert found == brute_force_repeats(tokens, 2)
+
+
+def test_repeats_do_not_cross_section_headers():
+    verse = 'walking down the river road tonight'
+    chorus = 'hold me close until the morning light\nnever let me go tonight my love'
+    lyrics = '\n'.join(['[Verse 1]', verse, '[Chorus]', chorus, '[Verse 2]', verse, '[Chorus]', chorus,
+                        'hold me close until'])
+    doc = tokenize(lyrics)
+    phrases = find_repeated_phrases(doc)
+
+    # Without the separators, each verse and the chorus after it would be one repeat
+    texts = {phrase['text']: phrase for phrase in phrases}
+    assert set(texts) == {verse, chorus.replace('\n', ' '), 'hold me close until'}
+    assert texts[chorus.replace('\n', ' ')]['kind'] == 'chorus'
+    assert texts[chorus.replace('\n', ' ')]['occurrences'] == [{'start_line': 4, 'end_line': 5},
+                                                                {'start_line': 9, 'end_line': 10}]
+    assert texts[verse]['occurrences'] == [{'start_line': 2, 'end_line': 2}, {'start_line': 7, 'end_line': 7}]
+    # A hook inside the chorus is kept when it's sung more often than the chorus
+    assert texts['hold me close until']['kind'] == 'hook'
+    assert texts['hold me close until']['count'] == 3
+
+    headers = list(doc.section_lines)
+    for phrase in phrases:
+        for occurrence in phrase['occurrences']:
+            assert not any(occurrence['start_line'] < header <= occurrence['end_line'] for header in headers)
@@ -0,0 +1,27 @@
+"""Lyrics routes served from the local indexes"""
+import random
+
+from app.services.lyrics_similarity import lyrics_similarity
+
+WORDS = ('night', 'road', 'river', 'fire', 'heart', 'rain', 'city', 'light', 'dream', 'ghost',
+         'summer', 'stone', 'water', 'gold', 'wire', 'smoke', 'glass', 'crown', 'field', 'storm')
+
+
+def test_similar_lists_every_near_duplicate(client):
+    rng = random.Random(8)
+    lines = [' '.join(rng.choice(WORDS) for _ in range(8)) for _ in range(40)]
+    original = '\n'.join(lines)
+    versions = {
+        850001: original,
+        850002: original + '\n(live) thank you goodnight',
+        850003: '\n'.join(lines[:-1]),
+        850004: '\n'.join(' '.join(rng.choice(WORDS) for _ in range(8)) for _ in range(40))
+    }
+    lyrics_similarity.add_many([(song_id, lyrics, None, None) for song_id, lyrics in versions.items()])
+
+    response = client.get('/lyrics/similar/850001?limit=1')
+    assert response.status_code == 200
+    data = response.get_json()
+    assert len(data['similar']) == 1
+    # Versions beyond the first page of results are still listed
+    assert sorted(data['near_duplicates']) == [850002, 850003]
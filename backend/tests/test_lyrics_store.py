@@ -0,0 +1,61 @@
+"""Memory-mapped lyrics store: batched writes, index swaps and reopening"""
+import os
+
+from app.services.lyrics_store import LyricsStore
+
+
+def open_store(path, name: str = 'lyrics') -> LyricsStore:
+    store = LyricsStore(name, flush_interval=60, reload_interval=0)
+    store.open(str(path))
+    return store
+
+
+def test_readers_pick_up_swapped_indexes(tmp_path):
+    writer = open_store(tmp_path)
+    reader = open_store(tmp_path)
+    assert reader.get(1) is None
+
+    writer.put(1, 'First song\nfirst verse')
+    writer.put(2, 'Second song')
+    assert writer.get(1) == 'First song\nfirst verse'  # Served from the queue before the flush
+    assert reader.get(1) is None
+    assert writer.flush() == 2
+
+    index_inode = os.stat(writer.index_path).st_ino
+    assert reader.get(1) == 'First song\nfirst verse'
+    old_index = reader.index
+
+    writer.put(1, 'First song, edited')
+    writer.put(3, 'Third song')
+    writer.flush()
+    assert os.stat(writer.index_path).st_ino != index_inode
+    assert not os.path.exists(f"{writer.index_path}.tmp")
+
+    assert [reader.get(song_id) for song_id in (1, 2, 3)] == ['First song, edited', 'Second song', 'Third song']
+    # Views into the previous index stay valid after the swap
+    assert old_index['song_id'].tolist() == [1, 2]
+    assert len(reader) == 3
+
+
+def test_reopen_keeps_records_and_stores_duplicates_once(tmp_path):
+    store = open_store(tmp_path)
+    for song_id in range(100, 110):
+        store.put(song_id, 'Same lyrics on every version')
+    store.put(200, 'Other lyrics')
+    store.flush()
+    data_size = os.path.getsize(store.data_path)
+
+    store.put(300, 'Same lyrics on every version')
+    store.flush()
+    assert os.path.getsize(store.data_path) == data_size
+
+    tokens = open_store(tmp_path, 'tokens')
+    tokens.put_bytes(100, b'\x00\x01\x02')
+    tokens.flush()
+
+    reopened = open_store(tmp_path)
+    assert len(reopened) == 12
+    assert all(reopened.get(song_id) == 'Same lyrics on every version' for song_id in [*range(100, 110), 300])
+    assert reopened.get(200) == 'Other lyrics'
+    assert reopened.get(999) is None
+    assert open_store(tmp_path, 'tokens').get_bytes(100) == b'\x00\x01\x02'
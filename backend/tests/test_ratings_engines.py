@@ -0,0 +1,303 @@
+"""The JSON, SQLite and log ratings engines behave the same"""
+import base64
+import json
+import os
+import random
+import threading
+import time
+
+import pytest
+
+from app.services import ratings_storage as ratings_storage_module
+from app.services.ratings_log import LogRatingsStorage
+from app.services.ratings_sqlite import SQLiteRatingsStorage, migrate_json_to_sqlite
+from app.services.ratings_storage import RatingsStorage
+
+ENGINES = ('json', 'sqlite', 'log')
+USER = 'listener'
+
+
+def make_storage(engine: str, directory) -> RatingsStorage:
+    if engine == 'sqlite':
+        return SQLiteRatingsStorage(os.path.join(directory, 'ratings.db'), migrate_from=None)
+    if engine == 'log':
+        return LogRatingsStorage(os.path.join(directory, 'ratings.json'), flush_interval=0)
+    return RatingsStorage(os.path.join(directory, 'ratings.json'))
+
+
+def song(number: int, **fields) -> dict:
+    return dict({
+        'spotify_id': f"sp{number}",
+        'title': f"Song {number:02d}",
+        'artist': f"Artist {number % 3}",
+        'album': 'Album',
+        'image_url': None,
+        'genius_id': str(1000 + number)
+    }, **fields)
+
+
+def import_record(number: int, rating: float, day: int) -> str:
+    return json.dumps({
+        'rating': rating,
+        'song': song(number),
+        'rated_at': f"2024-01-{day:02d}T10:00:00",
+        'updated_at': f"2024-02-{day:02d}T10:00:00"
+    })
+
+
+def without_timestamps(entries):
+    return [{key: value for key, value in entry.items() if key not in ('rated_at', 'updated_at')}
+            for entry in entries]
+
+
+def all_pages(storage: RatingsStorage, sort_by: str, limit: int = 2):
+    pages, cursor = [], None
+    while True:
+        ratings, cursor = storage.get_ratings_page(USER, sort_by, limit, cursor)
+        pages.append(ratings)
+        if cursor is None:
+            return pages
+
+
+def run_sequence(storage: RatingsStorage) -> dict:
+    """Add, re-rate, delete, import and page, recording every observable result"""
+    results = {}
+    for number, rating in ((1, 7.5), (2, 3.0), (3, 9.0), (4, 5.5)):
+        storage.add_rating(USER, song(number), rating)
+    token = storage.get_sync_token(USER)
+
+    rerated = storage.add_rating(USER, song(2, title='Song 02 (Remastered)'), 8.0)
+    results['deleted'] = storage.delete_rating(USER, 'sp3')
+    results['deleted_missing'] = storage.delete_rating(USER, 'sp3')
+
+    results['import'] = storage.import_ratings(USER, [
+        import_record(5, 6.0, 5),
+        '{"rating": 11, "song": {"spotify_id": "bad"}}',
+        '',
+        import_record(6, 4.5, 6),
+        import_record(5, 6.5, 7),
+    ])
+
+    results['rerated'] = {key: rerated[key] for key in ('rating', 'song')}
+    results['get'] = without_timestamps([storage.get_rating(USER, 'sp5')])
+    results['stats'] = storage.get_stats(USER)
+    results['distribution'] = storage.get_distribution(USER)
+    for sort_by in ('title', 'artist', 'rating'):
+        results[f"pages_{sort_by}"] = [without_timestamps(page) for page in all_pages(storage, sort_by)]
+    results['pages_date'] = [[entry['song']['spotify_id'] for entry in page] for page in all_pages(storage, 'date')]
+    results['search'] = without_timestamps(storage.search_ratings(USER, 'song 0'))
+
+    changes = storage.get_changes(USER, token)
+    results['changes'] = {
+        'upserts': sorted(entry['song']['spotify_id'] for entry in changes['upserts']),
+        'deleted': sorted(changes['deleted']),
+        'reset': changes['reset']
+    }
+    return results
+
+
+@pytest.fixture
+def sequences(tmp_path):
+    results = {}
+    for engine in ENGINES:
+        directory = tmp_path / engine
+        directory.mkdir()
+        results[engine] = run_sequence(make_storage(engine, str(directory)))
+    return results
+
+
+def test_engines_agree(sequences):
+    assert sequences['sqlite'] == sequences['json']
+    assert sequences['log'] == sequences['json']
+
+
+def test_sequence_results(sequences):
+    results = sequences['json']
+    assert results['deleted'] and not results['deleted_missing']
+    assert results['import']['imported'] == 2
+    assert results['import']['skipped'] == 1
+    assert results['get'][0]['rating'] == 6.5
+    assert [entry['song']['spotify_id'] for page in results['pages_rating'] for entry in page] == \
+        ['sp2', 'sp1', 'sp5', 'sp4', 'sp6']
+    assert results['changes'] == {'upserts': ['sp2', 'sp5', 'sp6'], 'deleted': ['sp3'], 'reset': False}
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_reopen_keeps_ratings(engine, tmp_path):
+    storage = make_storage(engine, str(tmp_path))
+    run_sequence(storage)
+    expected = storage.get_all_ratings(USER, 'title')
+    if engine == 'log':
+        storage.flush()
+
+    assert make_storage(engine, str(tmp_path)).get_all_ratings(USER, 'title') == expected
+
+
+def test_log_replay_after_compaction(tmp_path):
+    storage = make_storage('log', str(tmp_path))
+    for number in range(1, 6):
+        storage.add_rating(USER, song(number), float(number))
+    storage.delete_rating(USER, 'sp2')
+    storage.flush()
+    storage.compact()
+    assert not os.path.exists(storage.compacting_path)
+
+    # Ops after the compaction only live in the new log
+    storage.add_rating(USER, song(1), 9.5)
+    storage.delete_rating(USER, 'sp4')
+    storage.add_rating(USER, song(7), 2.0)
+    storage.flush()
+    expected = storage.get_all_ratings(USER, 'title')
+
+    with open(storage.storage_path) as f:
+        snapshot = json.load(f)
+    assert sorted(snapshot[USER]) == ['sp1', 'sp3', 'sp4', 'sp5']
+
+    reopened = make_storage('log', str(tmp_path))
+    assert reopened.get_all_ratings(USER, 'title') == expected
+    assert [entry['song']['spotify_id'] for entry in expected] == ['sp1', 'sp3', 'sp5', 'sp7']
+
+
+def test_log_replay_of_interrupted_compaction(tmp_path):
+    storage = make_storage('log', str(tmp_path))
+    for number in range(1, 4):
+        storage.add_rating(USER, song(number), float(number))
+    storage.flush()
+    expected = storage.get_all_ratings(USER, 'title')
+
+    # Crash after rotating the log but before the snapshot was written
+    storage.log_file.close()
+    os.replace(storage.log_path, storage.compacting_path)
+
+    reopened = make_storage('log', str(tmp_path))
+    assert reopened.get_all_ratings(USER, 'title') == expected
+
+
+def test_json_to_sqlite_migration_runs_once(tmp_path):
+    json_storage = make_storage('json', str(tmp_path))
+    run_sequence(json_storage)
+    expected = json_storage.get_all_ratings(USER, 'title')
+
+    db_path = str(tmp_path / 'ratings.db')
+    migrated = SQLiteRatingsStorage(db_path, migrate_from=json_storage.storage_path)
+    assert migrated.get_all_ratings(USER, 'title') == expected
+
+    migrated.delete_rating(USER, 'sp1')
+    assert migrate_json_to_sqlite(json_storage.storage_path, migrated) == 0
+    reopened = SQLiteRatingsStorage(db_path, migrate_from=json_storage.storage_path)
+    assert 'sp1' not in [entry['song']['spotify_id'] for entry in reopened.get_all_ratings(USER, 'title')]
+
+
+def test_concurrent_json_to_sqlite_migrations_import_once(tmp_path, monkeypatch):
+    json_storage = make_storage('json', str(tmp_path))
+    run_sequence(json_storage)
+    db_path = str(tmp_path / 'ratings.db')
+    workers = [SQLiteRatingsStorage(db_path, migrate_from=None) for _ in range(4)]
+
+    # Every worker passes the "already migrated" check before any of them imports
+    barrier = threading.Barrier(len(workers))
+    exists = os.path.exists
+    def exists_after_barrier(path):
+        if path == json_storage.storage_path:
+            barrier.wait()
+        return exists(path)
+
+    imported, errors = [], []
+    def migrate(worker):
+        try:
+            imported.append(migrate_json_to_sqlite(json_storage.storage_path, worker))
+        except Exception as e:
+            errors.append(e)
+
+    monkeypatch.setattr(os.path, 'exists', exists_after_barrier)
+    threads = [threading.Thread(target=migrate, args=(worker,)) for worker in workers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    monkeypatch.undo()
+
+    assert errors == []
+    assert sorted(imported) == [0, 0, 0, len(json_storage.get_all_ratings(USER, 'title'))]
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_concurrent_rerates_keep_indexes_in_sync(engine, tmp_path):
+    storage = make_storage(engine, str(tmp_path))
+    storage.add_rating(USER, song(1), 5.0)
+    storage.get_stats(USER)
+    storage.get_top_songs()
+
+    # Widen the window between the storage write and the index update
+    index_put = storage._index_put
+    def slow_index_put(*args):
+        time.sleep(random.random() / 500)
+        index_put(*args)
+    storage._index_put = slow_index_put
+
+    def rerate(offset: int):
+        for i in range(20):
+            storage.add_rating(USER, song(1), float((offset + i) % 11))
+
+    threads = [threading.Thread(target=rerate, args=(offset,)) for offset in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stored = storage.get_rating(USER, 'sp1')['rating']
+    assert storage.get_all_ratings(USER, 'rating')[0]['rating'] == stored
+    assert storage.get_stats(USER)['average_rating'] == stored
+    assert storage.get_song_summary('sp1')['average_rating'] == stored
+
+
+@pytest.mark.parametrize('engine', ('json', 'sqlite'))
+def test_indexes_see_writes_from_other_processes(engine, tmp_path):
+    worker = make_storage(engine, str(tmp_path))
+    other = make_storage(engine, str(tmp_path))
+    worker.add_rating(USER, song(1), 5.0)
+    worker.get_stats(USER)
+    worker.get_top_songs()
+    worker.get_similar_users(USER)
+
+    other.add_rating(USER, song(2), 9.0)
+    other.delete_rating(USER, 'sp1')
+
+    assert worker.get_stats(USER) == other.get_stats(USER)
+    assert [entry['song']['spotify_id'] for entry in worker.get_all_ratings(USER, 'title')] == ['sp2']
+    assert worker.get_song_summary('sp1') is None
+    assert worker.get_song_summary('sp2')['average_rating'] == 9.0
+
+
+def test_failed_json_write_drops_the_indexes(tmp_path, monkeypatch):
+    storage = make_storage('json', str(tmp_path))
+    storage.add_rating(USER, song(1), 5.0)
+    storage.get_stats(USER)
+    storage.get_top_songs()
+
+    def failing_write(path, data):
+        raise OSError('disk full')
+    monkeypatch.setattr(ratings_storage_module, 'write_json_atomic', failing_write)
+    with pytest.raises(OSError):
+        storage.add_rating(USER, song(1), 9.0)
+    monkeypatch.undo()
+
+    assert storage.get_rating(USER, 'sp1')['rating'] == 5.0
+    assert storage.get_stats(USER)['average_rating'] == 5.0
+    assert storage.get_song_summary('sp1')['average_rating'] == 5.0
+
+
+@pytest.mark.parametrize('sort_by, key', [
+    ('rating', ['x', 1]),
+    ('rating', [True, 'sp1']),
+    ('title', [1, 'sp1']),
+    ('title', ['song', 'sp1', 'extra']),
+    ('date', ['2024-01-01']),
+])
+def test_cursor_keys_must_match_the_sort(sort_by, key, tmp_path):
+    storage = make_storage('json', str(tmp_path))
+    run_sequence(storage)
+    cursor = base64.urlsafe_b64encode(json.dumps({'s': sort_by, 'k': key}).encode()).decode().rstrip('=')
+
+    with pytest.raises(ValueError):
+        storage.get_ratings_page(USER, sort_by, 2, cursor)
@@ -0,0 +1,108 @@
+"""Ratings index search matches a full scan of the library, and aggregates match a rebuild"""
+import random
+from fractions import Fraction
+
+import pytest
+
+from app.services.ratings_index import (
+    MIN_PREFIX_LENGTH,
+    SEARCH_FIELDS,
+    SongRatingsIndex,
+    UserRatingsIndex,
+    search_tokens
+)
+
+WORDS = ('love', 'lover', 'lost', 'long', 'night', 'heart', 'lo', 'night', 'blue', 'love')
+
+
+def entry(rng: random.Random, number: int) -> dict:
+    return {
+        'song': {
+            'title': ' '.join(rng.choice(WORDS) for _ in range(rng.randint(1, 3))),
+            'artist': f"Artist {rng.choice(WORDS)} {number % 7}",
+            'album': f"Album {number % 12}"
+        },
+        'rating': rng.randint(0, 100) / 10,
+        'updated_at': f"2024-01-01T00:00:{number:06d}"
+    }
+
+
+def full_scan(index: UserRatingsIndex, query: str, limit: int) -> list:
+    """Score every song against every query term, the way search ranks them"""
+    terms = search_tokens(query)
+    prefix = terms[-1] if len(terms[-1]) >= MIN_PREFIX_LENGTH else None
+    words = terms[:-1] if prefix else terms
+
+    ranked = []
+    for song_key, rating_entry in index.entries.items():
+        tokens = {}
+        for field, weight in SEARCH_FIELDS:
+            for token in search_tokens(rating_entry['song'].get(field)):
+                tokens[token] = max(weight, tokens.get(token, 0))
+
+        if any(word not in tokens for word in words):
+            continue
+        score = sum(tokens[word] * 5 for word in words)
+        if prefix:
+            prefix_scores = [weight * (5 if token == prefix else 4)
+                             for token, weight in tokens.items() if token.startswith(prefix)]
+            if not prefix_scores:
+                continue
+            score += max(prefix_scores)
+        ranked.append((-score, rating_entry['song']['title'].lower(), song_key))
+
+    return [song_key for _, _, song_key in sorted(ranked)[:limit]]
+
+
+@pytest.mark.parametrize('query', ['love', 'lo', 'l', 'artist 3', 'love lo', 'night love', 'lover', 'album 1',
+                                   'blue night lo', 'love love', 'zz', 'heart zz'])
+def test_search_matches_full_scan(query):
+    rng = random.Random(3)
+    index = UserRatingsIndex({f"song{i}": entry(rng, i) for i in range(400)})
+    # Writes after the initial load keep the postings sorted too
+    for i in rng.sample(range(400), 60):
+        index.remove(f"song{i}")
+    for i in rng.sample(range(400), 60):
+        index.put(f"song{i}", entry(rng, i))
+
+    keys_by_entry = {id(rating_entry): song_key for song_key, rating_entry in index.entries.items()}
+    for limit in (1, 7, 20, 500):
+        results = index.search(query, limit)
+        assert [keys_by_entry[id(rating_entry)] for rating_entry in results] == full_scan(index, query, limit)
+
+
+def test_aggregates_stay_exact_under_churn():
+    rng = random.Random(4)
+    user_indexes = {f"user{u}": UserRatingsIndex() for u in range(5)}
+    songs = SongRatingsIndex()
+    stored = {}  # (user_id, song_key) -> entry
+
+    # Ratings like 0.1 and 0.7 aren't exact in binary, so float sums would drift
+    for step in range(3000):
+        user_id, song_key = f"user{rng.randrange(5)}", f"song{rng.randrange(40)}"
+        if rng.random() < 0.3 and (user_id, song_key) in stored:
+            del stored[(user_id, song_key)]
+            user_indexes[user_id].remove(song_key)
+            songs.remove(user_id, song_key)
+        else:
+            rating_entry = entry(rng, step)
+            stored[(user_id, song_key)] = rating_entry
+            user_indexes[user_id].put(song_key, rating_entry)
+            songs.put(user_id, song_key, rating_entry)
+
+    rebuilt_songs = SongRatingsIndex()
+    for (user_id, song_key), rating_entry in stored.items():
+        rebuilt_songs.put(user_id, song_key, rating_entry)
+    assert songs.leaderboard == rebuilt_songs.leaderboard
+    # Song details come from the latest write, which the rebuild doesn't replay in order
+    for song_key, aggregate in rebuilt_songs.songs.items():
+        assert songs.songs[song_key]['sum'] == aggregate['sum']
+        assert dict(songs.summary(song_key), song=None) == dict(rebuilt_songs.summary(song_key), song=None)
+    assert [dict(song, song=None) for song in songs.top(40)] == \
+        [dict(song, song=None) for song in rebuilt_songs.top(40)]
+
+    for user_id, index in user_indexes.items():
+        rebuilt = UserRatingsIndex({song_key: rating_entry for (owner, song_key), rating_entry in stored.items()
+                                    if owner == user_id})
+        assert index.total == rebuilt.total == sum(Fraction(rating) for rating in rebuilt.ratings.values())
+        assert index.stats() == rebuilt.stats()
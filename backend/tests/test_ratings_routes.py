@@ -0,0 +1,80 @@
+"""Ratings endpoints through the Flask test client"""
+import json
+
+import pytest
+
+SONG = {'spotify_id': 'sp1', 'title': 'Empty Road', 'artist': 'The Drifters', 'album': 'Roads'}
+
+
+def rate(client, song, rating=7.0):
+    return client.post('/ratings/rate', json={'song': song, 'rating': rating})
+
+
+def my_ratings(client):
+    response = client.get('/ratings/my-ratings')
+    assert response.status_code == 200
+    return [entry['song']['spotify_id'] for entry in response.get_json()['ratings']]
+
+
+@pytest.mark.parametrize('field', ['title', 'artist', 'album', 'image_url', 'genius_id'])
+def test_rate_rejects_non_string_song_fields(client, field):
+    response = rate(client, dict(SONG, **{field: 3}))
+    assert response.status_code == 400
+    assert field in response.get_json()['error']
+    assert my_ratings(client) == []
+
+
+def test_import_skips_records_with_non_string_fields(client):
+    lines = '\n'.join([
+        json.dumps({'rating': 6, 'song': {'spotify_id': 'd', 'title': 3}}),
+        json.dumps({'rating': 6, 'song': {'spotify_id': 5, 'title': 'Five'}}),
+        json.dumps({'rating': 8, 'song': SONG}),
+    ])
+    response = client.post('/ratings/import', data=lines, content_type='application/x-ndjson')
+    assert response.status_code == 200
+    result = response.get_json()
+    assert (result['imported'], result['skipped']) == (1, 2)
+
+    assert my_ratings(client) == ['sp1']
+    assert client.get('/ratings/export').status_code == 200
+    assert client.get('/ratings/search?q=empty').status_code == 200
+
+
+def test_failed_index_update_leaves_storage_and_index_in_sync(client, storage, monkeypatch):
+    assert rate(client, SONG).status_code == 200
+    assert my_ratings(client) == ['sp1']
+
+    def broken_put(user_id, song_key, entry):
+        raise RuntimeError('index failure')
+    monkeypatch.setattr(storage, '_index_put', broken_put)
+    assert rate(client, dict(SONG, spotify_id='sp2')).status_code == 500
+    monkeypatch.undo()
+
+    # The write reached storage, and the dropped index is rebuilt from it
+    assert sorted(my_ratings(client)) == ['sp1', 'sp2']
+
+
+def test_themes_resolve_songs_rated_without_a_genius_id(client, monkeypatch):
+    from app.services.lyrics_cache import lyrics_cache
+
+    lyrics = {
+        840001: 'Burning rivers under midnight skies\nBurning rivers carry me home',
+        840002: 'Midnight skies over burning rivers\nCarry me home tonight',
+        840003: 'Burning rivers and midnight skies\nNever carry me home again'
+    }
+    matches = {('The Drifters', 'Empty Road'): {'id': 840001}, ('Luna', 'Night Drive'): {'id': 840002}}
+    monkeypatch.setattr(lyrics_cache, 'get_cached_match',
+                        lambda artist, title: ((artist, title) in matches, matches.get((artist, title))))
+    monkeypatch.setattr(lyrics_cache, 'get_cached_lyrics', lyrics.get)
+
+    assert rate(client, SONG).status_code == 200
+    # Several Spotify artists are stored comma-joined, the match is cached under the first
+    assert rate(client, {'spotify_id': 'sp2', 'title': 'Night Drive', 'artist': 'Luna, Sol'}).status_code == 200
+    assert rate(client, {'spotify_id': 'sp3', 'title': 'Third', 'genius_id': '840003'}).status_code == 200
+    assert rate(client, {'spotify_id': 'sp4', 'title': 'Unknown Song', 'artist': 'Nobody'}).status_code == 200
+
+    response = client.get('/ratings/themes')
+    assert response.status_code == 200
+    themes = response.get_json()
+    assert (themes['songs_analyzed'], themes['songs_without_lyrics']) == (3, 1)
+    assert 'burning rivers' in [phrase['term'] for phrase in themes['phrases']]
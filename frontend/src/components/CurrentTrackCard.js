@@ -15,7 +15,7 @@ import { PlayArrow, Pause, Album } from '@mui/icons-material';
 import RatingStars from './RatingStars';
 import apiService from '../services/apiService';
 
-const CurrentTrackCard = ({ track, onRefresh, autoRefresh, onAutoRefreshChange }) => {
+const CurrentTrackCard = ({ track, rating, geniusMatch, onRefresh, autoRefresh, onAutoRefreshChange }) => {
   const [currentRating, setCurrentRating] = useState(0);
   const formatDuration = (ms) => {
     const minutes = Math.floor(ms / 60000);
@@ -27,8 +27,13 @@ const CurrentTrackCard = ({ track, onRefresh, autoRefresh, onAutoRefreshChange }
     ? (track.progress_ms / track.duration_ms) * 100
     : 0;
 
-  // Load existing rating when track changes
+  // Load existing rating when track changes, unless the parent already has it
   useEffect(() => {
+    if (rating !== undefined) {
+      setCurrentRating(rating);
+      return;
+    }
+
     const loadRating = async () => {
       if (!track?.id) return;
 
@@ -46,13 +51,14 @@ const CurrentTrackCard = ({ track, onRefresh, autoRefresh, onAutoRefreshChange }
     };
 
     loadRating();
-  }, [track?.id]);
+  }, [track?.id, rating]);
 
   const handleRating = async (rating) => {
     try {
       const songData = {
         spotify_id: track.id,
-        genius_id: track.genius_id,
+        // Ratings store the Genius id as a string; lyric themes are looked up by it
+        genius_id: geniusMatch?.id != null ? String(geniusMatch.id) : null,
         title: track.name,
         artist: track.artists.join(', '),
         album: track.album?.name || track.album,
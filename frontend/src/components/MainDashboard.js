@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import {
   Box,
   Grid,
@@ -25,6 +25,9 @@ const MainDashboard = () => {
   const [rateLimited, setRateLimited] = useState(false);
   const [refreshInterval, setRefreshInterval] = useState(30000); // 30 seconds default
   const [fetchingTrack, setFetchingTrack] = useState(false);
+  const [trackRating, setTrackRating] = useState(0);
+  // Track whose lyrics are loaded; read from interval callbacks, so kept in a ref
+  const lyricsTrackId = useRef(null);
 
   // Auto-refresh current track with smart interval
   useEffect(() => {
@@ -39,26 +42,40 @@ const MainDashboard = () => {
     fetchCurrentTrack();
   }, []);
 
-  const fetchCurrentTrack = async (forceRefresh = false) => {
+  const fetchCurrentTrack = async (forceRefresh = false, reloadLyrics = false) => {
     // Prevent duplicate simultaneous requests
     if (fetchingTrack) return;
 
     try {
       setFetchingTrack(true);
       setError(null);
-      const response = await apiService.getCurrentTrack(forceRefresh);
 
-      if (response.success && response.playing) {
-        setCurrentTrack(response.track);
+      // One request for playback, lyrics, rating and stats; lyrics are skipped
+      // by the server while the track hasn't changed
+      const knownTrackId = reloadLyrics ? null : lyricsTrackId.current;
+      if (reloadLyrics) setLoading(true);
+      const response = await apiService.getDashboard(forceRefresh, knownTrackId);
+      const playback = response.playback || {};
+
+      if (response.success && playback.playing) {
+        setCurrentTrack(playback.track);
+        setTrackRating(response.rating ? response.rating.rating : 0);
         setRateLimited(false); // Reset rate limit flag on success
 
-        // If track changed, fetch new lyrics
-        if (!lyricsData || lyricsData.spotify_track?.id !== response.track.id) {
-          fetchCurrentLyrics();
+        if (response.lyrics) {
+          if (response.lyrics.success) {
+            setLyricsData(response.lyrics);
+            lyricsTrackId.current = playback.track.id;
+          } else {
+            setLyricsData(null);
+            lyricsTrackId.current = null;
+            setError(response.lyrics.error || 'Failed to get lyrics for current track');
+          }
         }
       } else {
         setCurrentTrack(null);
         setLyricsData(null);
+        lyricsTrackId.current = null;
       }
     } catch (err) {
       console.error('Error fetching current track:', err);
@@ -78,36 +95,12 @@ const MainDashboard = () => {
       }
     } finally {
       setFetchingTrack(false);
-    }
-  };
-
-  const fetchCurrentLyrics = async () => {
-    try {
-      setLoading(true);
-      setError(null);
-
-      const response = await apiService.getCurrentLyrics();
-
-      if (response.success) {
-        setLyricsData(response);
-      } else {
-        setLyricsData(null);
-        setError(response.error || 'Failed to get lyrics for current track');
-      }
-    } catch (err) {
-      console.error('Error fetching lyrics:', err);
-      setLyricsData(null);
-      setError('Failed to get lyrics. The song might not be available on Genius.');
-    } finally {
       setLoading(false);
     }
   };
 
   const handleRefresh = () => {
-    fetchCurrentTrack(true); // Force refresh bypasses cache
-    if (currentTrack) {
-      fetchCurrentLyrics();
-    }
+    fetchCurrentTrack(true, true); // Force refresh bypasses cache and reloads lyrics
   };
 
   return (
@@ -185,6 +178,8 @@ const MainDashboard = () => {
           <Grid item xs={12} md={4}>
             <CurrentTrackCard
               track={currentTrack}
+              rating={trackRating}
+              geniusMatch={lyricsData?.spotify_track?.id === currentTrack.id ? lyricsData.genius_match : null}
               onRefresh={handleRefresh}
               autoRefresh={autoRefresh}
               onAutoRefreshChange={setAutoRefresh}
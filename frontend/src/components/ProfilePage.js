@@ -17,18 +17,43 @@ import {
   CircularProgress,
   Stack,
   Chip,
-  Divider
+  Divider,
+  TextField
 } from '@mui/material';
 import { Sort, MusicNote, Delete } from '@mui/icons-material';
 import apiService from '../services/apiService';
 import RatingStars from './RatingStars';
 import LyricsViewer from './LyricsViewer';
 
+const RATINGS_PAGE_SIZE = 60;
+const SEARCH_DELAY_MS = 150;
+const THEME_TERMS = 15;
+
+// Client-side version of the backend listing orders, used when merging changes
+const compareRatings = (sortBy) => (a, b) => {
+  switch (sortBy) {
+    case 'artist':
+      return (a.song.artist || '').toLowerCase().localeCompare((b.song.artist || '').toLowerCase());
+    case 'rating':
+      return b.rating - a.rating;
+    case 'date':
+      return b.updated_at.localeCompare(a.updated_at);
+    default:
+      return (a.song.title || '').toLowerCase().localeCompare((b.song.title || '').toLowerCase());
+  }
+};
+
 const ProfilePage = () => {
   const [ratings, setRatings] = useState([]);
   const [stats, setStats] = useState(null);
+  const [themes, setThemes] = useState(null);
   const [sortBy, setSortBy] = useState('title');
   const [loading, setLoading] = useState(true);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [syncToken, setSyncToken] = useState(null);
+  const [searchQuery, setSearchQuery] = useState('');
+  const [searchResults, setSearchResults] = useState(null);
   const [error, setError] = useState(null);
   const [selectedSong, setSelectedSong] = useState(null);
   const [lyricsData, setLyricsData] = useState(null);
@@ -38,15 +63,48 @@ const ProfilePage = () => {
     fetchRatings();
   }, [sortBy]);
 
+  useEffect(() => {
+    fetchThemes();
+  }, []);
+
+  // Search on the server as the user types, so large libraries aren't downloaded to filter
+  useEffect(() => {
+    if (!searchQuery.trim()) {
+      setSearchResults(null);
+      return undefined;
+    }
+
+    let cancelled = false;
+    const timer = setTimeout(async () => {
+      try {
+        const response = await apiService.searchMyRatings(searchQuery, RATINGS_PAGE_SIZE);
+        if (!cancelled && response.success) {
+          setSearchResults(response.ratings);
+        }
+      } catch (err) {
+        console.error('Error searching ratings:', err);
+      }
+    }, SEARCH_DELAY_MS);
+
+    return () => {
+      cancelled = true;
+      clearTimeout(timer);
+    };
+  }, [searchQuery]);
+
+  const visibleRatings = searchResults ?? ratings;
+
   const fetchRatings = async () => {
     try {
       setLoading(true);
       setError(null);
-      const response = await apiService.getMyRatings(sortBy);
+      const response = await apiService.getMyRatings(sortBy, RATINGS_PAGE_SIZE);
 
       if (response.success) {
         setRatings(response.ratings);
         setStats(response.stats);
+        setNextCursor(response.next_cursor);
+        setSyncToken(response.sync_token);
       }
     } catch (err) {
       setError('Failed to load ratings');
@@ -56,6 +114,74 @@ const ProfilePage = () => {
     }
   };
 
+  // Cached on the server until the ratings change, so refetching after a sync is cheap
+  const fetchThemes = async () => {
+    try {
+      const response = await apiService.getRatingThemes(THEME_TERMS);
+      if (response.success) {
+        setThemes(response);
+      }
+    } catch (err) {
+      console.error('Error loading themes:', err);
+    }
+  };
+
+  const fetchMoreRatings = async () => {
+    if (!nextCursor) return;
+
+    try {
+      setLoadingMore(true);
+      const response = await apiService.getMyRatings(sortBy, RATINGS_PAGE_SIZE, nextCursor);
+
+      if (response.success) {
+        setRatings((previous) => [...previous, ...response.ratings]);
+        setStats(response.stats);
+        setNextCursor(response.next_cursor);
+      }
+    } catch (err) {
+      setError('Failed to load more ratings');
+      console.error(err);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
+  // Apply only what changed since the last sync instead of reloading every rating
+  const syncRatings = async () => {
+    if (!syncToken) {
+      fetchRatings();
+      return;
+    }
+
+    const response = await apiService.getRatingChanges(syncToken);
+    if (!response.success || response.reset) {
+      fetchRatings();
+      return;
+    }
+
+    const deleted = new Set(response.deleted);
+    const upserts = new Map(response.upserts.map((entry) => [entry.song.spotify_id, entry]));
+
+    setRatings((previous) => {
+      const merged = previous
+        .filter((entry) => !deleted.has(entry.song.spotify_id))
+        .map((entry) => {
+          const updated = upserts.get(entry.song.spotify_id);
+          upserts.delete(entry.song.spotify_id);
+          return updated || entry;
+        });
+
+      // New ratings can only be placed correctly once every page is loaded
+      if (!nextCursor) {
+        merged.push(...upserts.values());
+      }
+      return merged.sort(compareRatings(sortBy));
+    });
+    setStats(response.stats);
+    setSyncToken(response.sync_token);
+    fetchThemes();
+  };
+
   const handleSongClick = async (rating) => {
     setSelectedSong(rating);
     setLoadingLyrics(true);
@@ -87,7 +213,7 @@ const ProfilePage = () => {
 
     try {
       await apiService.deleteSongRating(songId);
-      fetchRatings(); // Refresh the list
+      await syncRatings(); // Refresh the list
 
       // Clear selected song if it was deleted
       if (selectedSong?.song?.spotify_id === songId) {
@@ -173,6 +299,31 @@ const ProfilePage = () => {
         </Paper>
       )}
 
+      {/* Themes */}
+      {themes && (themes.terms.length > 0 || themes.phrases.length > 0) && (
+        <Paper sx={{ p: 3, mb: 3 }}>
+          <Typography variant="h6" gutterBottom>
+            Themes in Your Songs
+          </Typography>
+          <Typography variant="body2" color="text.secondary" gutterBottom>
+            Words and phrases that stand out in the lyrics you rated, weighted by your ratings
+            ({themes.songs_analyzed} song{themes.songs_analyzed !== 1 ? 's' : ''} with lyrics)
+          </Typography>
+          <Box display="flex" flexWrap="wrap" gap={1} mt={1}>
+            {themes.terms.map((theme) => (
+              <Chip key={theme.term} label={theme.term} color="primary" variant="outlined" size="small" />
+            ))}
+          </Box>
+          {themes.phrases.length > 0 && (
+            <Box display="flex" flexWrap="wrap" gap={1} mt={1.5}>
+              {themes.phrases.map((theme) => (
+                <Chip key={theme.term} label={theme.term} color="secondary" variant="outlined" size="small" />
+              ))}
+            </Box>
+          )}
+        </Paper>
+      )}
+
       {/* Controls */}
       <Box display="flex" justifyContent="space-between" alignItems="center" mb={3}>
         <FormControl size="small" sx={{ minWidth: 200 }}>
@@ -190,8 +341,16 @@ const ProfilePage = () => {
           </Select>
         </FormControl>
 
+        <TextField
+          size="small"
+          label="Search ratings"
+          value={searchQuery}
+          onChange={(e) => setSearchQuery(e.target.value)}
+          sx={{ minWidth: 240 }}
+        />
+
         <Typography variant="body2" color="text.secondary">
-          {ratings.length} song{ratings.length !== 1 ? 's' : ''} rated
+          {stats?.total_ratings ?? ratings.length} song{(stats?.total_ratings ?? ratings.length) !== 1 ? 's' : ''} rated
         </Typography>
       </Box>
 
@@ -210,7 +369,7 @@ const ProfilePage = () => {
       )}
 
       {/* Empty State */}
-      {!loading && ratings.length === 0 && (
+      {!loading && visibleRatings.length === 0 && (
         <Paper sx={{ p: 6, textAlign: 'center' }}>
           <MusicNote sx={{ fontSize: 60, color: 'text.secondary', mb: 2 }} />
           <Typography variant="h6" gutterBottom>
@@ -223,9 +382,9 @@ const ProfilePage = () => {
       )}
 
       {/* Ratings Grid */}
-      {!loading && ratings.length > 0 && (
+      {!loading && visibleRatings.length > 0 && (
         <Grid container spacing={2}>
-          {ratings.map((rating) => (
+          {visibleRatings.map((rating) => (
             <Grid item xs={12} sm={6} md={4} key={rating.song.spotify_id}>
               <Card sx={{ height: '100%', display: 'flex', flexDirection: 'column' }}>
                 <CardActionArea onClick={() => handleSongClick(rating)} sx={{ flexGrow: 1 }}>
@@ -280,6 +439,15 @@ const ProfilePage = () => {
         </Grid>
       )}
 
+      {/* Load More */}
+      {!loading && !searchResults && nextCursor && (
+        <Box display="flex" justifyContent="center" mt={3}>
+          <Button variant="outlined" onClick={fetchMoreRatings} disabled={loadingMore}>
+            {loadingMore ? <CircularProgress size={20} /> : 'Load More'}
+          </Button>
+        </Box>
+      )}
+
       {/* Loading Lyrics Overlay */}
       {selectedSong && loadingLyrics && (
         <Box
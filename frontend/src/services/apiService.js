@@ -202,6 +202,15 @@ const apiService = {
     return response.data;
   },
 
+  async getDashboard(forceRefresh = false, knownTrackId = null) {
+    const params = {};
+    if (forceRefresh) params.force_refresh = 'true';
+    if (knownTrackId) params.known_track = knownTrackId;
+
+    const response = await api.get('/dashboard/current', { params });
+    return response.data;
+  },
+
   async getPlaybackState() {
     const response = await api.get('/spotify/playback-state');
     return response.data;
@@ -212,9 +221,10 @@ const apiService = {
     return response.data;
   },
 
-  async searchSpotifyTracks(query, limit = 10) {
+  async searchSpotifyTracks(query, limit = 10, cursor = null) {
+    // A cursor from a previous page already encodes the query and page size
     const response = await api.get('/spotify/search', {
-      params: { q: query, limit }
+      params: cursor ? { cursor } : { q: query, limit }
     });
     return response.data;
   },
@@ -283,9 +293,18 @@ const apiService = {
     return response.data;
   },
 
-  async getMyRatings(sortBy = 'title') {
-    const response = await api.get('/ratings/my-ratings', {
-      params: { sort: sortBy }
+  async getMyRatings(sortBy = 'title', limit = null, cursor = null) {
+    const params = { sort: sortBy };
+    if (limit) params.limit = limit;
+    if (cursor) params.cursor = cursor;
+
+    const response = await api.get('/ratings/my-ratings', { params });
+    return response.data;
+  },
+
+  async searchMyRatings(query, limit = 20) {
+    const response = await api.get('/ratings/search', {
+      params: { q: query, limit }
     });
     return response.data;
   },
@@ -305,6 +324,65 @@ const apiService = {
     return response.data;
   },
 
+  async getSongRatingSummary(songId) {
+    const response = await api.get(`/ratings/song/${songId}/summary`);
+    return response.data;
+  },
+
+  async getTopRatedSongs(limit = 10) {
+    const response = await api.get('/ratings/top', {
+      params: { limit }
+    });
+    return response.data;
+  },
+
+  async getSimilarListeners(limit = 10) {
+    const response = await api.get('/ratings/similar-listeners', {
+      params: { limit }
+    });
+    return response.data;
+  },
+
+  async getRecommendations(limit = 20) {
+    const response = await api.get('/ratings/recommendations', {
+      params: { limit }
+    });
+    return response.data;
+  },
+
+  async getRatingThemes(limit = 20) {
+    const response = await api.get('/ratings/themes', {
+      params: { limit }
+    });
+    return response.data;
+  },
+
+  async getRatingChanges(since) {
+    const response = await api.get('/ratings/changes', {
+      params: { since }
+    });
+    return response.data;
+  },
+
+  async exportRatings() {
+    const response = await api.get('/ratings/export', { responseType: 'blob' });
+    return response.data;
+  },
+
+  async importRatings(ndjson) {
+    const response = await api.post('/ratings/import', ndjson, {
+      headers: { 'Content-Type': 'application/x-ndjson' }
+    });
+    return response.data;
+  },
+
+  async getRatingDistribution(binSize = 1.0) {
+    const response = await api.get('/ratings/distribution', {
+      params: { bin_size: binSize }
+    });
+    return response.data;
+  },
+
   // Exposed initialization function for manual control
   initialize: initializeApiService,
 };